@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self) -> None:
+        import core.checks  # noqa F401
+        import core.db_pool.checks  # noqa F401
+        from core.profiling import install_serializer_timing
+
+        install_serializer_timing()
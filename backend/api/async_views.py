@@ -0,0 +1,230 @@
+"""Асинхронные представления API для запуска через ASGI.
+
+Подключаются в `api.urls` при `ASYNC_VIEWS = True` (по умолчанию -
+при `SERVER_MODE=asgi`) перед маршрутами роутера, с теми же именами.
+Лента и рецепт, поиск ингридиентов и выгрузка списка покупок читают БД
+асинхронным ORM, поэтому медленный клиент или ожидание БД не занимают
+поток воркера. Выборка (`get_queryset`), сериализаторы, пагинатор
+и права доступа - общие с синхронными вьюсетами.
+
+Остальные запросы передаются синхронному представлению DRF:
+изменяющие методы, keyset-пагинация (`?cursor=`), browsable API,
+ошибки заголовка `Authorization` и согласования формата ответа.
+"""
+from typing import Awaitable, Callable
+
+from api.authentication import check_token
+from api.views import IngredientViewSet, RecipeViewSet
+from asgiref.sync import sync_to_async
+from core.cache import catalog_timeout
+from core.enums import UrlQueries
+from core.services import acreate_shoping_list
+from core.tokens import aget_token
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404, HttpRequest, HttpResponse
+from django.http.response import StreamingHttpResponse
+from django.utils.http import parse_etags
+from recipes.models import Recipe
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST
+from rest_framework.viewsets import GenericViewSet
+
+AsyncHandler = Callable[..., Awaitable[HttpResponse | Response | None]]
+
+ASYNC_METHODS = ("GET", "HEAD")
+
+
+async def authenticate(request: HttpRequest) -> tuple | None:
+    """Асинхронная проверка токена как в `CachedTokenAuthentication`.
+
+    Returns:
+        tuple | None:
+            Пользователь и токен, `(AnonymousUser, None)` без заголовка
+            `Authorization` или `None`, если токен не принят -
+            ответ с ошибкой сформирует синхронное представление.
+    """
+    auth = get_authorization_header(request).split()
+    keyword = TokenAuthentication.keyword.lower().encode()
+    if not auth or auth[0].lower() != keyword:
+        return AnonymousUser(), None
+    if len(auth) != 2:
+        return None
+
+    try:
+        return check_token(await aget_token(auth[1].decode()))
+    except (AuthenticationFailed, UnicodeError):
+        return None
+
+
+async def initial(
+    viewset: type[GenericViewSet],
+    request: HttpRequest,
+    action: str,
+    initkwargs: dict,
+    kwargs: dict,
+) -> GenericViewSet | None:
+    """Создаёт вьюсет и выполняет проверки `initial()` DRF.
+
+    Returns:
+        GenericViewSet | None:
+            Вьюсет или `None`, если запрос не прошёл проверки,
+            либо запрошен browsable API.
+    """
+    credentials = await authenticate(request)
+    if credentials is None:
+        return None
+
+    drf_request = Request(request)
+    drf_request.user, drf_request.auth = credentials
+    view = viewset(
+        request=drf_request,
+        args=(),
+        kwargs=kwargs,
+        format_kwarg=None,
+        action=action,
+        **initkwargs,
+    )
+    view.headers = view.default_response_headers
+    try:
+        view.initial(drf_request, **kwargs)
+    except APIException:
+        return None
+    if isinstance(drf_request.accepted_renderer, BrowsableAPIRenderer):
+        return None
+    return view
+
+
+def async_view(
+    handler: AsyncHandler,
+    viewset: type[GenericViewSet],
+    action: str,
+    fallback: Callable,
+) -> Callable:
+    """Создаёт async-представление для действия вьюсета.
+
+    Представление готовит вьюсет так же, как `dispatch` DRF
+    (запрос, пользователь, `initial()` с согласованием формата и правами),
+    и вызывает `handler(view, **kwargs)`. Ответ обработчика проходит
+    `finalize_response`, исключения API - `handle_exception`.
+    Если обработчик вернул `None`, запрос выполняет `fallback`.
+    Параметры `@action` (`renderer_classes`, `permission_classes`)
+    применяются к вьюсету, как при регистрации в роутере.
+
+    Args:
+        handler (AsyncHandler): Асинхронный обработчик действия.
+        viewset (type[GenericViewSet]): Класс вьюсета.
+        action (str): Имя действия вьюсета.
+        fallback (Callable): Синхронное представление того же адреса.
+
+    Returns:
+        Callable: Асинхронное представление Django.
+    """
+    initkwargs = getattr(getattr(viewset, action), "kwargs", {})
+    run_sync = sync_to_async(fallback)
+
+    async def view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if request.method not in ASYNC_METHODS:
+            return await run_sync(request, *args, **kwargs)
+
+        drf_view = await initial(viewset, request, action, initkwargs, kwargs)
+        if drf_view is None:
+            return await run_sync(request, *args, **kwargs)
+
+        try:
+            response = await handler(drf_view, **kwargs)
+        except (APIException, Http404) as exc:
+            response = drf_view.handle_exception(exc)
+        if response is None:
+            return await run_sync(request, *args, **kwargs)
+
+        response = drf_view.finalize_response(drf_view.request, response)
+        if isinstance(response, Response):
+            response.render()
+        return response
+
+    # `csrf_exempt` из Django 4.1 скрывает, что функция асинхронная.
+    view.csrf_exempt = True
+    return view
+
+
+async def recipe_list(view: RecipeViewSet) -> Response | None:
+    """Лента рецептов с постраничной пагинацией."""
+    paginator = view.paginator
+    if paginator.cursor_query_param in view.request.query_params:
+        return None
+
+    queryset = view.filter_queryset(view.get_queryset())
+    page = await paginator.apaginate_queryset(queryset, view.request, view)
+    if page is None:
+        recipes = [recipe async for recipe in queryset]
+        return Response(view.get_serializer(recipes, many=True).data)
+    return paginator.get_paginated_response(
+        view.get_serializer(page, many=True).data
+    )
+
+
+async def recipe_detail(view: RecipeViewSet, pk: int) -> Response:
+    """Рецепт по `id`."""
+    queryset = view.filter_queryset(view.get_queryset())
+    try:
+        recipe = await queryset.aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise Http404
+    view.check_object_permissions(view.request, recipe)
+    return Response(view.get_serializer(recipe).data)
+
+
+async def ingredient_list(view: IngredientViewSet) -> Response:
+    """Поиск ингридиентов с кэшем и `ETag`, как у `CatalogCacheMixin`."""
+    key, etag = await sync_to_async(view._cache_key)(view.request)
+    headers = {"ETag": etag}
+    if etag in parse_etags(view.request.headers.get("If-None-Match", "")):
+        return Response(status=HTTP_304_NOT_MODIFIED, headers=headers)
+
+    data = await cache.aget(key)
+    if data is not None:
+        return Response(data, headers=headers)
+
+    name = view.request.query_params.get(UrlQueries.SEARCH_ING_NAME)
+    if name and settings.INGREDIENT_SEARCH_BACKEND != "database":
+        # Индекс в памяти при изменении справочника перестраивается из БД.
+        ingredients = await sync_to_async(view.get_queryset)()
+    else:
+        ingredients = [obj async for obj in view.get_queryset()]
+
+    data = view.get_serializer(ingredients, many=True).data
+    await cache.aset(key, data, catalog_timeout())
+    return Response(data, headers=headers)
+
+
+async def download_shopping_cart(
+    view: RecipeViewSet,
+) -> Response | StreamingHttpResponse | None:
+    """Список покупок в формате из `?format=` или `Accept`."""
+    user = view.request.user
+    if user.is_anonymous:
+        return None
+    if not await user.carts.aexists():
+        return Response(status=HTTP_400_BAD_REQUEST)
+
+    renderer = view.request.accepted_renderer
+    filename = f"{user.username}_shopping_list.{renderer.format}"
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type += f"; charset={renderer.charset}"
+
+    response = StreamingHttpResponse(
+        await acreate_shoping_list(user, renderer.format),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
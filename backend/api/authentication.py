@@ -0,0 +1,32 @@
+"""Аутентификация по токену с кэшем `core.tokens`."""
+from core.tokens import get_token, token_expired
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def check_token(token: Token | None) -> tuple:
+    """Проверяет токен как `TokenAuthentication.authenticate_credentials`.
+
+    Raises:
+        AuthenticationFailed:
+            Токена нет, он просрочен или пользователь заблокирован.
+
+    Returns:
+        tuple: Пользователь и токен.
+    """
+    if token is None:
+        raise AuthenticationFailed(_("Invalid token."))
+    if token_expired(token):
+        raise AuthenticationFailed("Срок действия токена истёк.")
+    if not token.user.is_active:
+        raise AuthenticationFailed(_("User inactive or deleted."))
+    return token.user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` без запроса к БД при попадании в кэш."""
+
+    def authenticate_credentials(self, key: str) -> tuple:
+        return check_token(get_token(key))
@@ -0,0 +1,28 @@
+"""Поля сериализаторов.
+"""
+from core.images import check_image_file, decode_base64_image
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework.fields import ImageField
+
+
+class Base64ImageField(ImageField):
+    """Изображение, переданное строкой base64 или файлом `multipart`.
+
+    В отличие от `drf_extra_fields.fields.Base64ImageField`, строка
+    декодируется блоками во временный файл, а формат и размеры
+    проверяются по заголовку до проверки изображения в `ImageField`.
+    Django открывает временный файл по пути и переносит его в хранилище
+    без копирования в память.
+    """
+
+    EMPTY_VALUES = (None, "", [], (), {})
+
+    def to_internal_value(self, data: str | UploadedFile) -> UploadedFile:
+        if data in self.EMPTY_VALUES:
+            return None
+
+        if isinstance(data, str):
+            data = decode_base64_image(data)
+        if isinstance(data, UploadedFile):
+            data.name = check_image_file(data)
+        return super().to_internal_value(data)
@@ -1,39 +1,155 @@
 """Модуль содержит дополнительные классы
 для настройки основных классов приложения.
 """
-from django.db.models import Model, Q
-from django.db.utils import IntegrityError
+from functools import wraps
+from hashlib import md5
+from typing import Callable
+
+from api.serializers import RelationIdsSerializer
+from core.cache import catalog_key, catalog_timeout
+from core.enums import RelationStatus
+from core.services import delete_links, insert_links
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Model, QuerySet
+from django.db.transaction import atomic
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer
 from rest_framework.status import (
+    HTTP_200_OK,
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
+    HTTP_304_NOT_MODIFIED,
     HTTP_400_BAD_REQUEST,
+    HTTP_409_CONFLICT,
+    HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Отметка в кэше о выполняющемся запросе с `Idempotency-Key`.
+IN_PROGRESS = "in-progress"
+
+
+def idempotent(method: Callable[..., Response]) -> Callable[..., Response]:
+    """Повторяет ответ на запрос с тем же заголовком `Idempotency-Key`.
+
+    Ответ (кроме `5xx`) хранится в кэше `IDEMPOTENCY_KEY_TIMEOUT`
+    секунд по ключу, методу, пути и пользователю. Повтор получает
+    сохранённый ответ с заголовком `Idempotent-Replayed`, повтор
+    во время выполнения исходного запроса - `409`.
+    Без заголовка запрос выполняется как обычно.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs) -> Response:
+        request = self.request
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return method(self, *args, **kwargs)
+
+        scope = f"{request.user.pk}:{request.method}:{request.path}:{key}"
+        digest = md5(scope.encode(), usedforsecurity=False).hexdigest()
+        cache_key = f"idempotency:{digest}"
+        timeout = settings.IDEMPOTENCY_KEY_TIMEOUT
+        if not cache.add(cache_key, IN_PROGRESS, timeout):
+            saved = cache.get(cache_key)
+            if saved is None or saved == IN_PROGRESS:
+                return Response(
+                    {"error": "Запрос с этим ключом ещё выполняется."},
+                    status=HTTP_409_CONFLICT,
+                )
+            status, data = saved
+            return Response(
+                data, status=status, headers={"Idempotent-Replayed": "true"}
+            )
+
+        try:
+            response = method(self, *args, **kwargs)
+        except BaseException:
+            cache.delete(cache_key)
+            raise
+        if response.status_code < HTTP_500_INTERNAL_SERVER_ERROR:
+            cache.set(
+                cache_key, (response.status_code, response.data), timeout
+            )
+        else:
+            cache.delete(cache_key)
+        return response
+
+    return wrapper
+
 
 class AddDelViewMixin:
     """
     Добавляет во Viewset дополнительные методы.
 
     Содержит методы для добавления или удаления объекта связи
-    Many-to-Many между моделями.
-    Требует определения атрибутов `add_serializer` и `link_model`.
+    Many-to-Many между моделями, по одному или пакетом.
+    Требует определения атрибутов `add_serializer`, `link_model`
+    и `link_field` - поля `link_model`, ссылающегося на объект.
+    Для поддержки связанных данных (например, денормализованных сумм)
+    переопределяется метод `_relations_changed`.
 
     Example:
         class ExampleViewSet(ModelViewSet, AddDelViewMixin)
             ...
             add_serializer = ExamplSerializer
             link_model = M2M_Model
+            link_field = "example"
     """
 
     add_serializer: ModelSerializer | None = None
     link_model: Model | None = None
+    link_field: str | None = None
+
+    def _relations_changed(self, obj_ids: list[int], created: bool) -> None:
+        """Вызывается после создания/удаления связей в той же транзакции.
 
+        Args:
+            obj_ids (list[int]): `id` объектов без повторов.
+            created (bool): `True` - связи созданы, `False` - удалены.
+        """
+
+    def _relation_targets(self, obj_ids: list[int]) -> QuerySet:
+        """Объекты, с которыми пользователь может создать связь."""
+        return self.queryset.filter(pk__in=obj_ids)
+
+    def _relation_ids(self, allow_all: bool = False) -> list[int] | None:
+        """`id` объектов из тела запроса без повторов, в исходном порядке.
+
+        Args:
+            allow_all (bool): Разрешить `{"all": true}` вместо `ids`.
+
+        Raises:
+            ValidationError:
+                Тело запроса не объект, список не передан, пуст
+                или слишком длинный.
+
+        Returns:
+            list[int] | None: `id` объектов, `None` - все объекты.
+        """
+        serializer = RelationIdsSerializer(
+            data=self.request.data, context={"allow_all": allow_all}
+        )
+        serializer.is_valid(raise_exception=True)
+        if serializer.validated_data["all"]:
+            return None
+        return list(dict.fromkeys(serializer.validated_data["ids"]))
+
+    @idempotent
     def _create_relation(self, obj_id: int | str) -> Response:
         """Добавляет связь M2M между объектами.
 
+        Связь создаётся одним запросом (`insert_links`), повторное
+        или одновременное добавление не вызывает ошибку БД. Объект
+        для ответа читается только после успешной вставки, при отказе
+        проверяется лишь его существование (404 или 400).
+
         Args:
             obj_id (int | str):
                 `id` объекта, с которым требуется создать связь.
@@ -41,37 +157,203 @@ class AddDelViewMixin:
         Returns:
             Responce: Статус подтверждающий/отклоняющий действие.
         """
-        obj = get_object_or_404(self.queryset, pk=obj_id)
         try:
-            self.link_model(None, obj.pk, self.request.user.pk).save()
-        except IntegrityError:
+            obj_id = int(obj_id)
+        except ValueError:
+            raise Http404
+        with atomic():
+            created = insert_links(
+                self.link_model,
+                self.link_field,
+                self._relation_targets([obj_id]),
+                user=self.request.user,
+            )
+            if created:
+                self._relations_changed(created, created=True)
+
+        if not created:
+            if not self.queryset.filter(pk=obj_id).exists():
+                raise Http404
             return Response(
                 {"error": "Действие выполнено ранее."},
                 status=HTTP_400_BAD_REQUEST,
             )
 
-        serializer: ModelSerializer = self.add_serializer(obj)
+        obj = get_object_or_404(self.queryset, pk=obj_id)
+        serializer: ModelSerializer = self.add_serializer(
+            obj, context=self.get_serializer_context()
+        )
         return Response(serializer.data, status=HTTP_201_CREATED)
 
-    def _delete_relation(self, q: Q) -> Response:
-        """Удаляет связь M2M между объектами.
+    @idempotent
+    def _delete_relation(self, obj_id: int | str) -> Response:
+        """Удаляет связь M2M между объектами одним запросом (`delete_links`).
 
         Args:
-            q (Q):
-                Условие фильтрации объектов.
+            obj_id (int | str):
+                `id` объекта, связь с которым требуется удалить.
 
         Returns:
             Responce: Статус подтверждающий/отклоняющий действие.
         """
-        deleted, _ = (
-            self.link_model.objects.filter(q & Q(user=self.request.user))
-            .first()
-            .delete()
+        try:
+            obj_id = int(obj_id)
+        except ValueError:
+            raise Http404
+        relations = self.link_model.objects.filter(
+            user=self.request.user, **{self.link_field: obj_id}
         )
+        with atomic():
+            deleted = delete_links(relations, self.link_field)
+            if deleted:
+                self._relations_changed(deleted, created=False)
+
         if not deleted:
             return Response(
                 {"error": f"{self.link_model.__name__} не существует"},
                 status=HTTP_400_BAD_REQUEST,
             )
-
         return Response(status=HTTP_204_NO_CONTENT)
+
+    @idempotent
+    def _create_relations(self) -> Response:
+        """Добавляет связи с объектами из списка `ids` тела запроса.
+
+        Связи создаются одним запросом (`insert_links`), для `id`
+        без новой связи вторым запросом проверяется, есть ли объект.
+
+        Returns:
+            Responce: Результат (`RelationStatus`) для каждого `id`.
+        """
+        obj_ids = self._relation_ids()
+        with atomic():
+            created = insert_links(
+                self.link_model,
+                self.link_field,
+                self._relation_targets(obj_ids),
+                user=self.request.user,
+            )
+            if created:
+                self._relations_changed(created, created=True)
+
+        statuses = dict.fromkeys(created, RelationStatus.CREATED)
+        rest = [pk for pk in obj_ids if pk not in statuses]
+        if rest:
+            found = self._relation_targets(rest).values_list("pk", flat=True)
+            statuses.update(dict.fromkeys(found, RelationStatus.EXISTS))
+        return self._relation_results(obj_ids, statuses)
+
+    @idempotent
+    def _delete_relations(self, allow_all: bool = False) -> Response:
+        """Удаляет связи с объектами из списка `ids` тела запроса.
+
+        Связи удаляются одним запросом (`delete_links`).
+
+        Args:
+            allow_all (bool):
+                Разрешить удаление всех связей пользователя телом
+                `{"all": true}` (например, очистку корзины).
+
+        Returns:
+            Responce: Результат (`RelationStatus`) для каждого `id`.
+        """
+        relations = self.link_model.objects.filter(user=self.request.user)
+        obj_ids = self._relation_ids(allow_all)
+        if obj_ids is not None:
+            relations = relations.filter(**{f"{self.link_field}__in": obj_ids})
+
+        with atomic():
+            deleted = delete_links(relations, self.link_field)
+            if deleted:
+                self._relations_changed(deleted, created=False)
+
+        return self._relation_results(
+            deleted if obj_ids is None else obj_ids,
+            dict.fromkeys(deleted, RelationStatus.DELETED),
+        )
+
+    @staticmethod
+    def _relation_results(
+        obj_ids: list[int], statuses: dict[int, RelationStatus]
+    ) -> Response:
+        """Ответ пакетной операции: статус для каждого `id` запроса.
+
+        Args:
+            obj_ids (list[int]): `id` объектов в порядке запроса.
+            statuses (dict[int, RelationStatus]):
+                Статусы найденных объектов, остальные - `NOT_FOUND`.
+        """
+        return Response(
+            [
+                {
+                    "id": pk,
+                    "status": statuses.get(pk, RelationStatus.NOT_FOUND),
+                }
+                for pk in obj_ids
+            ]
+        )
+
+
+class CatalogCacheMixin:
+    """
+    Кэширует ответы `list` и `retrieve` справочника.
+
+    Ключ кэша содержит версию справочника (см. `core.cache`), полный путь
+    запроса и формат ответа. Тот же ключ служит `ETag`, поэтому на запрос
+    с совпадающим `If-None-Match` отдаётся `304` без обращения к БД.
+    Требует определения атрибута `queryset`.
+
+    Example:
+        class ExampleViewSet(CatalogCacheMixin, ReadOnlyModelViewSet)
+            ...
+            queryset = Model.objects.all()
+    """
+
+    def list(self, request: WSGIRequest, *args, **kwargs) -> Response:
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request: WSGIRequest, *args, **kwargs) -> Response:
+        return self._cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def _cache_key(self, request: WSGIRequest) -> tuple[str, str]:
+        """Ключ кэша и `ETag` ответа на запрос.
+
+        Returns:
+            tuple[str, str]: Ключ кэша и значение заголовка `ETag`.
+        """
+        key = catalog_key(
+            self.queryset.model,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return key, '"%s"' % key.split(":", 2)[2].replace(":", "-")
+
+    def _cached_response(
+        self, handler: Callable, request: WSGIRequest, *args, **kwargs
+    ) -> Response:
+        """Отдаёт ответ из кэша или кэширует ответ обработчика.
+
+        Args:
+            handler (Callable): Метод вьюсета, формирующий ответ.
+            request (WSGIRequest): Объект запроса.
+
+        Returns:
+            Response: `304`, закэшированные или свежие данные.
+        """
+        key, etag = self._cache_key(request)
+        headers = {"ETag": etag}
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, headers=headers)
+
+        response: Response = handler(request, *args, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            cache.set(key, response.data, catalog_timeout())
+            response["ETag"] = etag
+        return response
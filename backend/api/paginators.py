@@ -1,9 +1,211 @@
+"""Пагинаторы API.
+
+По умолчанию используется постраничная пагинация (`?page=&limit=`).
+Если в запросе передан параметр `cursor` (в том числе пустой), страница
+выбирается по ключу последнего объекта предыдущей страницы (keyset).
+Такой запрос не выполняет `COUNT(*)` и не использует `OFFSET`, поэтому
+любая страница ленты стоит столько же, сколько первая.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from hashlib import md5
+
+from core.enums import Limits
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Model, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CachedCountPaginator(Paginator):
+    """Кэширует количество объектов на `PAGINATION_COUNT_CACHE_TIMEOUT`.
+
+    Ключ кэша - хэш SQL-запроса с параметрами. При нулевом времени
+    хранения количество считается при каждом запросе.
+    """
+
+    def _cache_key(self) -> str:
+        sql, params = self.object_list.query.sql_with_params()
+        return (
+            "pagination-count:%s"
+            % md5(f"{sql}{params}".encode(), usedforsecurity=False).hexdigest()
+        )
+
+    @cached_property
+    def count(self) -> int:
+        timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        if not timeout or not isinstance(self.object_list, QuerySet):
+            return super().count
+
+        key = self._cache_key()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, timeout)
+        return count
+
+    async def acount(self) -> int:
+        """Считает объекты асинхронно и запоминает в `count`.
+
+        После вызова `page()` не обращается к БД за количеством.
+        """
+        timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        key = self._cache_key() if timeout else None
+        count = await cache.aget(key) if key else None
+        if count is None:
+            count = await self.object_list.acount()
+            if key:
+                await cache.aset(key, count, timeout)
+        self.count = count
+        return count
 
 
 class PageLimitPagination(PageNumberPagination):
     """Стандартный пагинатор с определением атрибута
     `page_size_query_param`, для вывода запрошенного количества страниц.
+
+    С параметром `cursor` переключается в режим keyset-пагинации.
+    Порядок задаётся атрибутом вьюсета `cursor_ordering`
+    (по умолчанию `("-pub_date", "-id")`), последнее поле должно быть
+    уникальным. Курсор - закодированные значения этих полей у последнего
+    объекта страницы. Ответ не содержит `count` и `previous`.
     """
 
+    django_paginator_class = CachedCountPaginator
     page_size_query_param = "limit"
+    cursor_query_param = "cursor"
+    cursor_ordering = ("-pub_date", "-id")
+    cursor_page_size = Limits.CURSOR_PAGE_SIZE.value
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view=None
+    ) -> list | None:
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        ordering = getattr(view, "cursor_ordering", self.cursor_ordering)
+        page_size = self.get_page_size(request) or self.cursor_page_size
+        cursor = request.query_params[self.cursor_query_param]
+
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            queryset = queryset.filter(
+                self._after(
+                    ordering,
+                    self._decode_cursor(cursor, queryset.model, ordering),
+                )
+            )
+
+        page = list(queryset[: page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self._encode_cursor(page[-1], ordering)
+        return page
+
+    async def apaginate_queryset(
+        self, queryset: QuerySet, request: Request, view=None
+    ) -> list | None:
+        """Асинхронная постраничная пагинация для async-представлений.
+
+        Количество и страница загружаются асинхронным ORM.
+        Keyset-режим не поддерживается, такие запросы обрабатываются
+        синхронным представлением.
+        """
+        self.cursor_mode = False
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        await paginator.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+
+        self.request = request
+        return [obj async for obj in self.page.object_list]
+
+    def get_paginated_response(self, data: list) -> Response:
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_next_link(self) -> str | None:
+        if not self.cursor_mode:
+            return super().get_next_link()
+
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor
+        )
+
+    @staticmethod
+    def _after(ordering: tuple[str, ...], values: list) -> Q:
+        """Условие `(a, b, ...) > (x, y, ...)` с учётом направлений.
+
+        Ведущее условие `a >= x` (`a <= x` для убывания) позволяет БД
+        выбрать диапазон по индексу на первом поле.
+        """
+        keys = [
+            (field.lstrip("-"), "lt" if field[0] == "-" else "gt", value)
+            for field, value in zip(ordering, values)
+        ]
+
+        field, lookup, value = keys[-1]
+        condition = Q(**{f"{field}__{lookup}": value})
+        for field, lookup, value in reversed(keys[:-1]):
+            condition = Q(**{f"{field}__{lookup}": value}) | (
+                Q(**{field: value}) & condition
+            )
+
+        field, lookup, value = keys[0]
+        return Q(**{f"{field}__{lookup}e": value}) & condition
+
+    @staticmethod
+    def _encode_cursor(obj: Model, ordering: tuple[str, ...]) -> str:
+        # `value_to_string` сохраняет дату с микросекундами.
+        values = [
+            obj._meta.get_field(field.lstrip("-")).value_to_string(obj)
+            for field in ordering
+        ]
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(
+        cursor: str, model: type[Model], ordering: tuple[str, ...]
+    ) -> list:
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            # `to_python` полей падает с `TypeError` на списках и словарях.
+            if not all(isinstance(value, (str, int)) for value in values):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (BinasciiError, TypeError, ValueError, ValidationError):
+            raise NotFound("Неверный курсор.")
@@ -0,0 +1,37 @@
+"""Рендереры для выгрузки списка покупок.
+
+Сам документ формирует `core.services.create_shoping_list`,
+рендереры нужны для выбора формата по `?format=` или заголовку `Accept`
+и для вывода сообщений об ошибках.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class PlainTextRenderer(BaseRenderer):
+    media_type = "text/plain"
+    format = "txt"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return str(data).encode()
+
+
+class CSVRenderer(PlainTextRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class PDFRenderer(PlainTextRenderer):
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+
+
+SHOPPING_LIST_RENDERERS = (
+    PlainTextRenderer,
+    CSVRenderer,
+    JSONRenderer,
+    PDFRenderer,
+)
@@ -1,28 +1,68 @@
 from collections import OrderedDict
 
-from core.services import recipe_ingredients_set
+from api.fields import Base64ImageField
+from core.enums import Limits, UrlQueries
+from core.images import image_srcset
+from core.services import (
+    prefetch_author_recipes,
+    recipe_ingredient_amounts,
+    recipe_ingredients_changed,
+    recipe_ingredients_set,
+)
+from core.tokens import tokens_expired_before
 from core.validators import ingredients_validator, tags_exist_validator
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db.models import F, QuerySet
+from django.db.models import Prefetch, prefetch_related_objects
 from django.db.transaction import atomic
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import Ingredient, Recipe, Tag
-from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from djoser.serializers import TokenCreateSerializer as BaseTokenCreate
+from recipes.models import AmountIngredient, Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from rest_framework.serializers import (
+    BooleanField,
+    IntegerField,
+    ListField,
+    ListSerializer,
+    ModelSerializer,
+    Serializer,
+    SerializerMethodField,
+)
 
 User = get_user_model()
 
+# Ингридиенты рецепта с количеством, в порядке названий ингридиентов.
+RECIPE_INGREDIENTS_PREFETCH = Prefetch(
+    "ingredient",
+    queryset=AmountIngredient.objects.select_related("ingredients").order_by(
+        "ingredients__name"
+    ),
+)
+
 
 class ShortRecipeSerializer(ModelSerializer):
     """Сериализатор для модели Recipe.
     Определён укороченный набор полей для некоторых эндпоинтов.
     """
 
+    image_srcset = SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = "id", "name", "image", "cooking_time"
+        fields = "id", "name", "image", "image_srcset", "cooking_time"
         read_only_fields = ("__all__",)
 
+    def get_image_srcset(self, recipe: Recipe) -> str:
+        """`srcset` из WebP-вариантов изображения.
+
+        Args:
+            recipe (Recipe): Запрошенный рецепт.
+
+        Returns:
+            str: Пустая строка, пока изображение не обработано.
+        """
+        return image_srcset(recipe.image_variants, self.context.get("request"))
+
 
 class UserSerializer(ModelSerializer):
     """Сериализатор для использования с моделью User."""
@@ -60,6 +100,10 @@ class UserSerializer(ModelSerializer):
         if user.is_anonymous or (user == obj):
             return False
 
+        is_subscribed: bool | None = getattr(obj, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
+
         return user.subscriptions.filter(author=obj).exists()
 
     def create(self, validated_data: dict) -> User:
@@ -82,11 +126,40 @@ class UserSerializer(ModelSerializer):
         return user
 
 
+class TokenCreateSerializer(BaseTokenCreate):
+    """Вход по email и паролю.
+
+    Просроченный токен (`TOKEN_TTL`) удаляется,
+    чтобы djoser выдал вместо него новый.
+    """
+
+    def validate(self, attrs: dict) -> dict:
+        attrs = super().validate(attrs)
+        expired_before = tokens_expired_before()
+        if expired_before is not None:
+            Token.objects.filter(
+                user=self.user, created__lt=expired_before
+            ).delete()
+        return attrs
+
+
+class UserSubscribeListSerializer(ListSerializer):
+    """Предзагружает рецепты всех авторов страницы одним запросом."""
+
+    def to_representation(self, data) -> list:
+        authors = list(data.all() if hasattr(data, "all") else data)
+        prefetch_author_recipes(authors, self.child.get_recipes_limit())
+        return super().to_representation(authors)
+
+
 class UserSubscribeSerializer(UserSerializer):
-    """Сериализатор вывода авторов на которых подписан текущий пользователь."""
+    """Сериализатор вывода авторов на которых подписан текущий пользователь.
+
+    Количество рецептов каждого автора ограничивается параметром запроса
+    `recipes_limit`, общее количество берётся из счётчика `recipes_count`.
+    """
 
     recipes = ShortRecipeSerializer(many=True, read_only=True)
-    recipes_count = SerializerMethodField()
 
     class Meta:
         model = User
@@ -101,6 +174,34 @@ class UserSubscribeSerializer(UserSerializer):
             "recipes_count",
         )
         read_only_fields = ("__all__",)
+        list_serializer_class = UserSubscribeListSerializer
+
+    def get_recipes_limit(self) -> int | None:
+        """Получает значение параметра `recipes_limit`.
+
+        Raises:
+            ValidationError: Значение не является неотрицательным числом.
+
+        Returns:
+            int | None: Ограничение количества рецептов или `None`.
+        """
+        request = self.context.get("request")
+        if request is None:
+            return None
+
+        limit: str = request.query_params.get(UrlQueries.RECIPES_LIMIT, "")
+        if not limit:
+            return None
+        if not limit.isdigit():
+            raise DRFValidationError(
+                {UrlQueries.RECIPES_LIMIT.value: "Ожидается целое число."}
+            )
+        return int(limit)
+
+    def to_representation(self, author: User) -> dict:
+        if "recipes" not in getattr(author, "_prefetched_objects_cache", {}):
+            prefetch_author_recipes((author,), self.get_recipes_limit())
+        return super().to_representation(author)
 
     def get_is_subscribed(*args) -> bool:
         """Проверка подписки пользователей.
@@ -113,17 +214,6 @@ class UserSubscribeSerializer(UserSerializer):
         """
         return True
 
-    def get_recipes_count(self, obj: User) -> int:
-        """Показывает общее количество рецептов у каждого автора.
-
-        Args:
-            obj (User): Запрошенный пользователь.
-
-        Returns:
-            int: Количество рецептов созданных запрошенным пользователем.
-        """
-        return obj.recipes.count()
-
 
 class TagSerializer(ModelSerializer):
     """Сериализатор для вывода тэгов."""
@@ -166,6 +256,7 @@ class RecipeSerializer(ModelSerializer):
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
     image = Base64ImageField()
+    image_srcset = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -178,6 +269,7 @@ class RecipeSerializer(ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_srcset",
             "text",
             "cooking_time",
         )
@@ -186,19 +278,33 @@ class RecipeSerializer(ModelSerializer):
             "is_shopping_cart",
         )
 
-    def get_ingredients(self, recipe: Recipe) -> QuerySet[dict]:
+    def get_ingredients(self, recipe: Recipe) -> list[dict]:
         """Получает список ингридиентов для рецепта.
 
+        Использует предзагруженные `RECIPE_INGREDIENTS_PREFETCH` объекты.
+        Если рецепт получен не из `RecipeViewSet.get_queryset`
+        (например, только что создан), догружает их одним запросом.
+
         Args:
             recipe (Recipe): Запрошенный рецепт.
 
         Returns:
-            QuerySet[dict]: Список ингридиентов в рецепте.
+            list[dict]: Список ингридиентов в рецепте.
         """
-        ingredients = recipe.ingredients.values(
-            "id", "name", "measurement_unit", amount=F("recipe__amount")
-        )
-        return ingredients
+        if "ingredient" not in getattr(
+            recipe, "_prefetched_objects_cache", {}
+        ):
+            prefetch_related_objects((recipe,), RECIPE_INGREDIENTS_PREFETCH)
+
+        return [
+            {
+                "id": amount.ingredients.id,
+                "name": amount.ingredients.name,
+                "measurement_unit": amount.ingredients.measurement_unit,
+                "amount": amount.amount,
+            }
+            for amount in recipe.ingredient.all()
+        ]
 
     def get_is_favorited(self, recipe: Recipe) -> bool:
         """Проверка - находится ли рецепт в избранном.
@@ -215,6 +321,10 @@ class RecipeSerializer(ModelSerializer):
         if user.is_anonymous:
             return False
 
+        is_favorited: bool | None = getattr(recipe, "is_favorited", None)
+        if is_favorited is not None:
+            return is_favorited
+
         return user.favorites.filter(recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, recipe: Recipe) -> bool:
@@ -232,8 +342,14 @@ class RecipeSerializer(ModelSerializer):
         if user.is_anonymous:
             return False
 
+        in_cart: bool | None = getattr(recipe, "is_in_shopping_cart", None)
+        if in_cart is not None:
+            return in_cart
+
         return user.carts.filter(recipe=recipe).exists()
 
+    get_image_srcset = ShortRecipeSerializer.get_image_srcset
+
     def validate(self, data: OrderedDict) -> OrderedDict:
         """Проверка вводных данных при создании/редактировании рецепта.
 
@@ -285,6 +401,9 @@ class RecipeSerializer(ModelSerializer):
     def update(self, recipe: Recipe, validated_data: dict):
         """Обновляет рецепт.
 
+        Изменение ингридиентов учитывается в корзинах покупок,
+        содержащих рецепт.
+
         Args:
             recipe (Recipe): Рецепт для изменения.
             validated_data (dict): Изменённые данные.
@@ -304,8 +423,56 @@ class RecipeSerializer(ModelSerializer):
             recipe.tags.set(tags)
 
         if ingredients:
+            old_amounts = recipe_ingredient_amounts((recipe.pk,))
             recipe.ingredients.clear()
             recipe_ingredients_set(recipe, ingredients)
+            recipe_ingredients_changed(
+                recipe,
+                old_amounts,
+                {ing.pk: amount for ing, amount in ingredients.values()},
+            )
 
         recipe.save()
         return recipe
+
+
+class RecipeImageSerializer(ModelSerializer):
+    """Сериализатор для замены изображения рецепта файлом `multipart`.
+    Отвечает укороченным представлением рецепта.
+    """
+
+    image = Base64ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ("image",)
+
+    def to_representation(self, recipe: Recipe) -> dict:
+        return ShortRecipeSerializer(recipe, context=self.context).data
+
+
+class RelationIdsSerializer(Serializer):
+    """`id` объектов для пакетного добавления/удаления связей.
+
+    `{"all": true}` вместо `ids` выбирает все связи пользователя,
+    если это разрешено в контексте (`allow_all`).
+    """
+
+    ids = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=Limits.MAX_BATCH_RELATIONS.value,
+        required=False,
+    )
+    all = BooleanField(default=False)
+
+    def validate(self, attrs: dict) -> dict:
+        if not attrs["all"]:
+            if "ids" not in attrs:
+                raise DRFValidationError({"ids": "Обязательное поле."})
+            return attrs
+        if not self.context.get("allow_all"):
+            raise DRFValidationError({"all": "Выберите связи списком `ids`."})
+        if "ids" in attrs:
+            raise DRFValidationError("Передайте либо `ids`, либо `all`.")
+        return attrs
@@ -1,3 +1,10 @@
+from api.async_views import (
+    async_view,
+    download_shopping_cart,
+    ingredient_list,
+    recipe_detail,
+    recipe_list,
+)
 from api.views import (
     BaseAPIRootView,
     IngredientViewSet,
@@ -5,6 +12,7 @@ from api.views import (
     TagViewSet,
     UserViewSet,
 )
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -27,3 +35,40 @@ urlpatterns = (
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
 )
+
+if settings.ASYNC_VIEWS:
+    # Async-представления перекрывают маршруты роутера с теми же именами,
+    # остальные запросы к этим адресам передаются синхронным вьюсетам.
+    sync_views = {url.name: url.callback for url in router.urls}
+
+    def async_path(route, handler, viewset, action, name):
+        view = async_view(handler, viewset, action, sync_views[name])
+        return path(route, view, name=name)
+
+    urlpatterns = (
+        async_path(
+            "recipes/", recipe_list, RecipeViewSet, "list", "recipes-list"
+        ),
+        async_path(
+            "recipes/download_shopping_cart/",
+            download_shopping_cart,
+            RecipeViewSet,
+            "download_shopping_cart",
+            "recipes-download-shopping-cart",
+        ),
+        async_path(
+            "recipes/<int:pk>/",
+            recipe_detail,
+            RecipeViewSet,
+            "retrieve",
+            "recipes-detail",
+        ),
+        async_path(
+            "ingredients/",
+            ingredient_list,
+            IngredientViewSet,
+            "list",
+            "ingredients-list",
+        ),
+        *urlpatterns,
+    )
@@ -1,4 +1,4 @@
-from api.mixins import AddDelViewMixin
+from api.mixins import AddDelViewMixin, CatalogCacheMixin
 from api.paginators import PageLimitPagination
 from api.permissions import (
     AdminOrReadOnly,
@@ -6,22 +6,34 @@ from api.permissions import (
     DjangoModelPermissions,
     IsAuthenticated,
 )
+from api.renderers import SHOPPING_LIST_RENDERERS
 from api.serializers import (
+    RECIPE_INGREDIENTS_PREFETCH,
     IngredientSerializer,
+    RecipeImageSerializer,
     RecipeSerializer,
     ShortRecipeSerializer,
     TagSerializer,
     UserSubscribeSerializer,
 )
 from core.enums import Tuples, UrlQueries
-from core.services import create_shoping_list, maybe_incorrect_layout
+from core.search import ingredient_index, search_ingredients, search_recipes
+from core.services import (
+    cart_recipes_changed,
+    change_counters,
+    create_shoping_list,
+    filter_recipes_by_tags,
+    maybe_incorrect_layout,
+)
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.handlers.wsgi import WSGIRequest
-from django.db.models import Q, QuerySet
-from django.http.response import HttpResponse
+from django.db.models import Exists, OuterRef, Prefetch, QuerySet
+from django.http.response import StreamingHttpResponse
 from djoser.views import UserViewSet as DjoserUserViewSet
 from recipes.models import Carts, Favorites, Ingredient, Recipe, Tag
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.routers import APIRootView
 from rest_framework.status import HTTP_400_BAD_REQUEST
@@ -48,6 +60,21 @@ class UserViewSet(DjoserUserViewSet, AddDelViewMixin):
     permission_classes = (DjangoModelPermissions,)
     add_serializer = UserSubscribeSerializer
     link_model = Subscriptions
+    link_field = "author"
+    cursor_ordering = ("username", "id")
+
+    def _relations_changed(self, obj_ids: list[int], created: bool) -> None:
+        """Изменяет счётчики подписчиков авторов."""
+        change_counters(
+            User.objects.filter(pk__in=obj_ids),
+            subscribers_count=1 if created else -1,
+        )
+
+    def _relation_targets(self, obj_ids: list[int]) -> QuerySet:
+        """Авторы для подписки - все, кроме самого пользователя."""
+        return (
+            super()._relation_targets(obj_ids).exclude(pk=self.request.user.pk)
+        )
 
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def subscribe(self, request: WSGIRequest, id: int | str) -> Response:
@@ -75,7 +102,7 @@ class UserViewSet(DjoserUserViewSet, AddDelViewMixin):
     def delete_subscribe(
         self, request: WSGIRequest, id: int | str
     ) -> Response:
-        return self._delete_relation(Q(author__id=id))
+        return self._delete_relation(id)
 
     @action(
         methods=("get",), detail=False, permission_classes=(IsAuthenticated,)
@@ -84,6 +111,10 @@ class UserViewSet(DjoserUserViewSet, AddDelViewMixin):
         """Список подписок пользоваетеля.
 
         Вызов метода через url: */user/<int:id>/subscribtions/.
+        Поддерживает постраничную (`?page=&limit=`) и keyset (`?cursor=`)
+        пагинацию.
+        Количество рецептов каждого автора ограничивается параметром
+        `recipes_limit`, рецепты всей страницы загружаются одним запросом.
 
         Args:
             request (WSGIRequest): Объект запроса.
@@ -93,17 +124,42 @@ class UserViewSet(DjoserUserViewSet, AddDelViewMixin):
                 401 - для неавторизованного пользователя.
                 Список подписок для авторизованного пользователя.
         """
-        pages = self.paginate_queryset(
-            User.objects.filter(subscribers__user=self.request.user)
+        queryset = User.objects.filter(subscribers__user=self.request.user)
+        pages = self.paginate_queryset(queryset)
+        serializer = UserSubscribeSerializer(
+            queryset if pages is None else pages,
+            many=True,
+            context=self.get_serializer_context(),
         )
-        serializer = UserSubscribeSerializer(pages, many=True)
+        if pages is None:
+            return Response(serializer.data)
         return self.get_paginated_response(serializer.data)
 
+    @subscriptions.mapping.post
+    def subscribe_many(self, request: WSGIRequest) -> Response:
+        """Подписывается на авторов из списка `ids`.
 
-class TagViewSet(ReadOnlyModelViewSet):
+        Вызов метода через url: */user/subscriptions/.
+
+        Args:
+            request (WSGIRequest): Объект запроса с `{"ids": [...]}`.
+
+        Returns:
+            Responce: Список `{"id", "status"}` по каждому автору.
+        """
+        return self._create_relations()
+
+    @subscriptions.mapping.delete
+    def unsubscribe_many(self, request: WSGIRequest) -> Response:
+        """Отписывается от авторов из списка `ids`."""
+        return self._delete_relations()
+
+
+class TagViewSet(CatalogCacheMixin, ReadOnlyModelViewSet):
     """Работает с тэгами.
 
     Изменение и создание тэгов разрешено только админам.
+    Ответы кэшируются до изменения любого тэга.
     """
 
     queryset = Tag.objects.all()
@@ -111,10 +167,11 @@ class TagViewSet(ReadOnlyModelViewSet):
     permission_classes = (AdminOrReadOnly,)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, ReadOnlyModelViewSet):
     """Работет с игридиентами.
 
     Изменение и создание ингридиентов разрешено только админам.
+    Ответы кэшируются до изменения любого ингридиента.
     """
 
     queryset = Ingredient.objects.all()
@@ -130,6 +187,8 @@ class IngredientViewSet(ReadOnlyModelViewSet):
         преобразуются в кириллицу (для стандартной раскладки).
         Также прописные буквы преобразуются в строчные,
         так как все ингридиенты в базе записаны в нижнем регистре.
+        Поиск выполняется по индексу в памяти процесса, без запросов к БД,
+        либо запросом к БД, если `INGREDIENT_SEARCH_BACKEND = "database"`.
 
         Returns:
             list[Ingredient]: Список найденых ингридиентов.
@@ -141,12 +200,10 @@ class IngredientViewSet(ReadOnlyModelViewSet):
             return queryset
 
         name = maybe_incorrect_layout(name)
-        start_queryset = queryset.filter(name__istartswith=name)
-        start_names = (ing.name for ing in start_queryset)
-        contain_queryset = queryset.filter(name__icontains=name).exclude(
-            name__in=start_names
-        )
-        return list(start_queryset) + list(contain_queryset)
+        if settings.INGREDIENT_SEARCH_BACKEND == "database":
+            return search_ingredients(queryset, name)
+
+        return ingredient_index.search(name)
 
 
 class RecipeViewSet(ModelViewSet, AddDelViewMixin):
@@ -158,6 +215,7 @@ class RecipeViewSet(ModelViewSet, AddDelViewMixin):
     Для авторизованных пользователей — возможность добавить
     рецепт в избранное и в список покупок.
     Изменять рецепт может только автор или админы.
+    Лента поддерживает keyset-пагинацию по `(pub_date, id)`: `?cursor=`.
     """
 
     queryset = Recipe.objects.select_related("author")
@@ -165,41 +223,95 @@ class RecipeViewSet(ModelViewSet, AddDelViewMixin):
     permission_classes = (AuthorStaffOrReadOnly,)
     pagination_class = PageLimitPagination
     add_serializer = ShortRecipeSerializer
+    link_field = "recipe"
 
     def get_queryset(self) -> QuerySet[Recipe]:
         """Получает queryset в соответствии с параметрами запроса.
 
+        Фильтр по тэгам (`?tags=`) отбирает рецепты с любым из тэгов,
+        с `?tags_mode=all` - со всеми тэгами.
+        Тэги и ингридиенты предзагружаются, а признаки избранного,
+        списка покупок и подписки на автора вычисляются подзапросами
+        `EXISTS`. Количество запросов к БД не зависит от размера страницы.
+
         Returns:
             QuerySet[Recipe]: Список запрошенных объектов.
         """
-        queryset = self.queryset
+        queryset = self.queryset.prefetch_related(
+            "tags", RECIPE_INGREDIENTS_PREFETCH
+        )
 
         tags: list = self.request.query_params.getlist(UrlQueries.TAGS.value)
         if tags:
-            queryset = queryset.filter(tags__slug__in=tags).distinct()
+            mode: str = self.request.query_params.get(UrlQueries.TAGS_MODE)
+            queryset = filter_recipes_by_tags(
+                queryset, tags, all_tags=mode == "all"
+            )
 
         author: str = self.request.query_params.get(UrlQueries.AUTHOR.value)
         if author:
             queryset = queryset.filter(author=author)
 
+        query: str = self.request.query_params.get(
+            UrlQueries.SEARCH.value
+        ) or self.request.query_params.get(UrlQueries.SEARCH_ING_NAME.value)
+        if query:
+            queryset = search_recipes(queryset, query)
+
         # Следующие фильтры только для авторизованного пользователя
         if self.request.user.is_anonymous:
             return queryset
 
+        user = self.request.user
+        queryset = (
+            queryset.select_related(None)
+            .prefetch_related(
+                Prefetch(
+                    "author",
+                    queryset=User.objects.annotate(
+                        is_subscribed=Exists(
+                            Subscriptions.objects.filter(
+                                author=OuterRef("pk"), user=user
+                            )
+                        )
+                    ),
+                )
+            )
+            .annotate(
+                is_favorited=Exists(
+                    Favorites.objects.filter(recipe=OuterRef("pk"), user=user)
+                ),
+                is_in_shopping_cart=Exists(
+                    Carts.objects.filter(recipe=OuterRef("pk"), user=user)
+                ),
+            )
+        )
+
         is_in_cart: str = self.request.query_params.get(UrlQueries.SHOP_CART)
         if is_in_cart in Tuples.SYMBOL_TRUE_SEARCH.value:
-            queryset = queryset.filter(in_carts__user=self.request.user)
+            queryset = queryset.filter(is_in_shopping_cart=True)
         elif is_in_cart in Tuples.SYMBOL_FALSE_SEARCH.value:
-            queryset = queryset.exclude(in_carts__user=self.request.user)
+            queryset = queryset.filter(is_in_shopping_cart=False)
 
         is_favorite: str = self.request.query_params.get(UrlQueries.FAVORITE)
         if is_favorite in Tuples.SYMBOL_TRUE_SEARCH.value:
-            queryset = queryset.filter(in_favorites__user=self.request.user)
+            queryset = queryset.filter(is_favorited=True)
         if is_favorite in Tuples.SYMBOL_FALSE_SEARCH.value:
-            queryset = queryset.exclude(in_favorites__user=self.request.user)
+            queryset = queryset.filter(is_favorited=False)
 
         return queryset
 
+    def _relations_changed(self, obj_ids: list[int], created: bool) -> None:
+        """Изменяет счётчики рецептов и ингридиенты корзины покупок."""
+        delta = 1 if created else -1
+        recipes = Recipe.objects.filter(pk__in=obj_ids)
+        if self.link_model is Favorites:
+            change_counters(recipes, favorites_count=delta)
+            return
+
+        change_counters(recipes, carts_count=delta)
+        cart_recipes_changed(self.request.user.pk, obj_ids, added=created)
+
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def favorite(self, request: WSGIRequest, pk: int | str) -> Response:
         """Добавляет/удалет рецепт в `избранное`.
@@ -227,7 +339,33 @@ class RecipeViewSet(ModelViewSet, AddDelViewMixin):
         self, request: WSGIRequest, pk: int | str
     ) -> Response:
         self.link_model = Favorites
-        return self._delete_relation(Q(recipe__id=pk))
+        return self._delete_relation(pk)
+
+    @action(
+        methods=("post",),
+        detail=False,
+        url_path="favorite",
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorites(self, request: WSGIRequest) -> Response:
+        """Добавляет в `избранное` рецепты из списка `ids`.
+
+        Вызов метода через url: */recipe/favorite/.
+        `DELETE` удаляет рецепты из списка `ids`.
+
+        Args:
+            request (WSGIRequest): Объект запроса с `{"ids": [...]}`.
+
+        Returns:
+            Responce: Список `{"id", "status"}` по каждому рецепту.
+        """
+        self.link_model = Favorites
+        return self._create_relations()
+
+    @favorites.mapping.delete
+    def remove_favorites(self, request: WSGIRequest) -> Response:
+        self.link_model = Favorites
+        return self._delete_relations()
 
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request: WSGIRequest, pk: int | str) -> Response:
@@ -254,30 +392,97 @@ class RecipeViewSet(ModelViewSet, AddDelViewMixin):
         self, request: WSGIRequest, pk: int | str
     ) -> Response:
         self.link_model = Carts
-        return self._delete_relation(Q(recipe__id=pk))
+        return self._delete_relation(pk)
+
+    @action(
+        methods=("post",),
+        detail=False,
+        url_path="shopping_cart",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_carts(self, request: WSGIRequest) -> Response:
+        """Добавляет в `список покупок` рецепты из списка `ids`.
+
+        Вызов метода через url: */recipe/shopping_cart/.
+        `DELETE` удаляет рецепты из списка `ids`, с `{"all": true}` -
+        очищает список покупок.
+
+        Args:
+            request (WSGIRequest): Объект запроса с `{"ids": [...]}`.
+
+        Returns:
+            Responce: Список `{"id", "status"}` по каждому рецепту.
+        """
+        self.link_model = Carts
+        return self._create_relations()
 
-    @action(methods=("get",), detail=False)
+    @shopping_carts.mapping.delete
+    def clear_shopping_cart(self, request: WSGIRequest) -> Response:
+        self.link_model = Carts
+        return self._delete_relations(allow_all=True)
+
+    @action(
+        methods=("put",),
+        detail=True,
+        parser_classes=(MultiPartParser, FormParser),
+    )
+    def image(self, request: WSGIRequest, pk: int | str) -> Response:
+        """Заменяет изображение рецепта файлом из `multipart`-формы.
+
+        Файл больше `FILE_UPLOAD_MAX_MEMORY_SIZE` Django принимает сразу
+        во временный файл, без копии в памяти и без base64.
+        Вызов метода через url: */recipes/<int:pk>/image/.
+
+        Args:
+            request (WSGIRequest): Объект запроса с файлом в поле `image`.
+            pk (int): id рецепта.
+
+        Returns:
+            Responce: Рецепт в укороченном представлении.
+        """
+        serializer = RecipeImageSerializer(
+            self.get_object(),
+            data=request.data,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS,
+    )
     def download_shopping_cart(self, request: WSGIRequest) -> Response:
-        """Загружает файл *.txt со списком покупок.
+        """Загружает файл со списком покупок.
 
         Считает сумму ингредиентов в рецептах выбранных для покупки.
-        Возвращает текстовый файл со списком ингредиентов.
+        Возвращает файл со списком ингредиентов в формате, указанном
+        в `?format=` (`txt`, `csv`, `json`, `pdf`), по умолчанию - `txt`.
+        Файл формируется и отдаётся по частям.
         Вызов метода через url:  */recipes/download_shopping_cart/.
 
         Args:
             request (WSGIRequest): Объект запроса..
 
         Returns:
-            Responce: Ответ с текстовым файлом.
+            Responce: Ответ с файлом.
         """
         user = self.request.user
         if not user.carts.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        filename = f"{user.username}_shopping_list.txt"
-        shopping_list = create_shoping_list(user)
-        response = HttpResponse(
-            shopping_list, content_type="text.txt; charset=utf-8"
+        renderer = request.accepted_renderer
+        filename = f"{user.username}_shopping_list.{renderer.format}"
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+
+        response = StreamingHttpResponse(
+            create_shoping_list(user, renderer.format),
+            content_type=content_type,
         )
         response["Content-Disposition"] = f"attachment; filename={filename}"
         return response
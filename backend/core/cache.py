@@ -0,0 +1,96 @@
+"""Версионированный кэш ответов для справочников (тэги, ингридиенты).
+
+Для каждой модели-справочника в кэше хранится номер версии.
+Ключи закэшированных ответов содержат этот номер, поэтому сигналы
+`post_save`/`post_delete` (см. `core.signals`) инвалидируют все ответы
+модели одним увеличением версии, без перебора ключей.
+
+Кэш в памяти процесса (`locmem`) у каждого воркера свой, и увеличение
+версии видит только воркер, сохранивший объект. Поэтому с ним версии
+и ответы хранятся `CATALOG_LOCAL_CACHE_TIMEOUT` секунд: устаревший
+ответ в других воркерах живёт не дольше этого срока.
+"""
+from hashlib import md5
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Model
+
+
+def cache_is_shared() -> bool:
+    """Проверяет, что кэш по умолчанию общий для всех процессов.
+
+    Returns:
+        bool: `False` для кэша в памяти процесса (`LocMemCache`).
+    """
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def catalog_timeout() -> int:
+    """Время хранения ответов справочников в секундах."""
+    if cache_is_shared():
+        return settings.CATALOG_CACHE_TIMEOUT
+    return settings.CATALOG_LOCAL_CACHE_TIMEOUT
+
+
+def _version_timeout() -> int | None:
+    return None if cache_is_shared() else catalog_timeout()
+
+
+def _version_key(model: type[Model]) -> str:
+    return f"catalog:{model._meta.label_lower}:version"
+
+
+def catalog_version(model: type[Model]) -> int:
+    """Получает текущую версию справочника.
+
+    Если версии в кэше нет (кэш очищен или запись вытеснена),
+    создаёт новую на основе текущего времени, чтобы не совпасть
+    с версиями ранее закэшированных ответов.
+
+    Args:
+        model (type[Model]): Модель справочника.
+
+    Returns:
+        int: Номер версии.
+    """
+    key = _version_key(model)
+    version: int | None = cache.get(key)
+    if version is None:
+        version = time_ns()
+        if not cache.add(key, version, timeout=_version_timeout()):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_catalog_version(model: type[Model]) -> None:
+    """Увеличивает версию справочника, делая устаревшими его ответы.
+
+    Args:
+        model (type[Model]): Изменённая модель справочника.
+    """
+    try:
+        cache.incr(_version_key(model))
+    except ValueError:
+        cache.set(
+            _version_key(model), time_ns(), timeout=_version_timeout()
+        )
+
+
+def catalog_key(model: type[Model], *parts: str) -> str:
+    """Формирует ключ кэша для ответа справочника.
+
+    Args:
+        model (type[Model]): Модель справочника.
+        *parts (str): Параметры запроса, от которых зависит ответ.
+
+    Returns:
+        str: Ключ, включающий текущую версию справочника.
+    """
+    digest = md5(":".join(parts).encode(), usedforsecurity=False).hexdigest()
+    return (
+        f"catalog:{model._meta.label_lower}:"
+        f"{catalog_version(model)}:{digest}"
+    )
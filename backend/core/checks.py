@@ -0,0 +1,24 @@
+"""Проверки настроек развёртывания (`manage.py check`)."""
+from core.cache import cache_is_shared
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_shared_cache(app_configs=None, **kwargs) -> list[Warning]:
+    """Предупреждает о кэше в памяти процесса при нескольких воркерах.
+
+    Инвалидация кэша справочников и токенов авторизации с таким кэшем
+    доходит только до воркера, обработавшего изменение.
+    """
+    if settings.DEBUG or settings.WEB_CONCURRENCY < 2 or cache_is_shared():
+        return []
+    return [
+        Warning(
+            f"Кэш в памяти процесса при {settings.WEB_CONCURRENCY} "
+            "воркерах: изменения справочников видны в других воркерах "
+            f"через {settings.CATALOG_LOCAL_CACHE_TIMEOUT} с.",
+            hint="Укажите CACHE_BACKEND=redis (см. infra/docker-compose.yml).",
+            id="foodgram.W003",
+        )
+    ]
@@ -0,0 +1,40 @@
+"""Денормализованные счётчики моделей.
+
+Счётчики изменяются только выражениями `F()` (`core.services.
+change_counters`). Полное сохранение экземпляра, загруженного до такого
+изменения, записало бы в строку устаревшее значение счётчика, поэтому
+`CountersModelMixin` исключает счётчики из `save()` существующих строк.
+"""
+
+
+class CountersModelMixin:
+    """Не записывает поля `counter_fields` при сохранении строки.
+
+    Для существующей строки без явного `update_fields` сохраняются
+    все загруженные поля, кроме счётчиков. При создании строки
+    счётчики записываются со значениями по умолчанию.
+
+    Attributes:
+        counter_fields (tuple[str, ...]): Поля счётчиков.
+    """
+
+    counter_fields: tuple[str, ...] = ()
+
+    def save(self, *args, **kwargs) -> None:
+        if (
+            not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and kwargs.get("using", self._state.db) == self._state.db
+            and not self._state.adding
+        ):
+            kwargs["update_fields"] = self._fields_without_counters()
+        super().save(*args, **kwargs)
+
+    def _fields_without_counters(self) -> list[str]:
+        skipped = self.get_deferred_fields().union(self.counter_fields)
+        return [
+            field.attname
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname not in skipped
+        ]
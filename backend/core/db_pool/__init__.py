@@ -0,0 +1,7 @@
+"""Бэкенд PostgreSQL с пулом соединений в памяти процесса.
+
+Подключается настройкой `DB_POOL` (`ENGINE = "core.db_pool"`).
+Django при `CONN_MAX_AGE = 0` закрывает соединение в конце запроса,
+бэкенд вместо закрытия возвращает его в пул. Параметры пула - ключ
+`POOL` настроек БД: `SIZE`, `TIMEOUT`, `CHECK_AFTER`.
+"""
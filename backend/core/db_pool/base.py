@@ -0,0 +1,66 @@
+from functools import partial
+
+from core.db_pool.pool import ConnectionPool, get_pool
+from django.db.backends.postgresql import base
+from psycopg2 import Error as DatabaseError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+def is_usable(connection) -> bool:
+    """Проверяет соединение запросом `SELECT 1`."""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        if connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except DatabaseError:
+        return False
+    return True
+
+
+def reset(connection) -> bool:
+    """Откатывает незавершённую транзакцию перед возвратом в пул.
+
+    Returns:
+        bool: `True` - соединение можно выдавать повторно.
+    """
+    if connection.closed:
+        return False
+    try:
+        if connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except DatabaseError:
+        return False
+    return connection.get_transaction_status() == TRANSACTION_STATUS_IDLE
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL, соединения которого берутся из пула процесса."""
+
+    connection_pool: ConnectionPool | None = None
+
+    def get_new_connection(self, conn_params: dict):
+        options = self.settings_dict["POOL"]
+        self.connection_pool = get_pool(
+            (self.alias, repr(sorted(conn_params.items()))),
+            name=self.alias,
+            connect=partial(super().get_new_connection, conn_params),
+            is_usable=is_usable,
+            size=options["SIZE"],
+            timeout=options["TIMEOUT"],
+            check_after=options["CHECK_AFTER"],
+        )
+        connection = self.connection_pool.checkout()
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.connection_pool.checkin(
+                    self.connection, reset(self.connection)
+                )
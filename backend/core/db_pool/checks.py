@@ -0,0 +1,42 @@
+"""Проверка числа соединений с БД всех воркеров (`manage.py check`)."""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_connections_limit(app_configs=None, **kwargs) -> list[Warning]:
+    """Сравнивает соединения всех воркеров с `DB_MAX_CONNECTIONS`.
+
+    Без пула воркер держит соединение на каждый поток: потоки запросов
+    и фоновой обработки изображений. В режиме ASGI без пула число
+    соединений не ограничено.
+    """
+    if settings.DB_ENGINE != "django.db.backends.postgresql":
+        return []
+    if settings.SERVER_MODE == "asgi" and not settings.DB_POOL:
+        return [
+            Warning(
+                "В режиме ASGI без пула число соединений с БД "
+                "не ограничено.",
+                hint="Включите DB_POOL.",
+                id="foodgram.W001",
+            )
+        ]
+
+    per_worker = (
+        settings.DB_POOL_SIZE
+        if settings.DB_POOL
+        else settings.GUNICORN_THREADS + settings.IMAGE_PROCESSING_WORKERS
+    )
+    total = per_worker * settings.WEB_CONCURRENCY
+    if total <= settings.DB_MAX_CONNECTIONS:
+        return []
+    return [
+        Warning(
+            f"Воркеры могут открыть {total} соединений с БД "
+            f"({settings.WEB_CONCURRENCY} x {per_worker}), "
+            f"больше DB_MAX_CONNECTIONS = {settings.DB_MAX_CONNECTIONS}.",
+            hint="Уменьшите DB_POOL_SIZE или WEB_CONCURRENCY.",
+            id="foodgram.W002",
+        )
+    ]
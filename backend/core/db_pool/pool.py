@@ -0,0 +1,190 @@
+"""Пул соединений с БД в памяти процесса.
+
+Пул не зависит от драйвера БД: соединение создаёт переданная функция,
+проверку перед выдачей выполняет `is_usable`. Общий для всех потоков
+процесса, размер ограничивает число открытых соединений воркера.
+Метрики пула отдаются вместе с остальными в `/metrics`.
+"""
+import logging
+from threading import Condition, Lock
+from time import monotonic, perf_counter
+from typing import Any, Callable, Hashable
+
+from core.profiling import metrics
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+metrics.counter(
+    "foodgram_db_pool_checkouts_total", "Выдачи соединений из пула."
+)
+metrics.counter(
+    "foodgram_db_pool_timeouts_total",
+    "Запросы соединения, не дождавшиеся свободного места в пуле.",
+)
+metrics.counter(
+    "foodgram_db_pool_connects_total", "Новые соединения, открытые пулом."
+)
+metrics.counter(
+    "foodgram_db_pool_discarded_total",
+    "Соединения, закрытые пулом как неисправные.",
+)
+metrics.histogram(
+    "foodgram_db_pool_wait_seconds",
+    "Ожидание свободного соединения в пуле.",
+    WAIT_BUCKETS,
+)
+metrics.gauge(
+    "foodgram_db_pool_connections",
+    "Соединения пула: выданные (in_use) и свободные (idle).",
+)
+
+
+class PoolTimeout(OperationalError):
+    """Свободное соединение не появилось за время ожидания."""
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений.
+
+    Свободные соединения выдаются в обратном порядке (LIFO): редко
+    используемые дольше простаивают и закрываются сервером первыми,
+    не мешая остальным. Соединение, простоявшее больше `check_after`
+    секунд, перед выдачей проверяется `is_usable`.
+
+    Args:
+        name (str): Имя пула в метриках (алиас БД).
+        connect (Callable): Открывает новое соединение.
+        is_usable (Callable): Проверяет соединение перед выдачей.
+        size (int): Максимум соединений, выданных и свободных.
+        timeout (float): Сколько секунд ждать свободного соединения.
+        check_after (float): Простой, после которого нужна проверка.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[], Any],
+        is_usable: Callable[[Any], bool],
+        size: int,
+        timeout: float,
+        check_after: float,
+    ) -> None:
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.check_after = check_after
+        self._connect = connect
+        self._is_usable = is_usable
+        self._idle: list[tuple[Any, float]] = []
+        self._in_use = 0
+        self._condition = Condition()
+        self._labels = (("alias", name),)
+
+    def _available(self) -> bool:
+        return bool(self._idle) or self._in_use < self.size
+
+    def _report(self) -> None:
+        for state, value in (
+            ("in_use", self._in_use),
+            ("idle", len(self._idle)),
+        ):
+            metrics.set(
+                "foodgram_db_pool_connections",
+                (*self._labels, ("state", state)),
+                value,
+            )
+
+    def checkout(self) -> Any:
+        """Выдаёт свободное соединение или открывает новое.
+
+        Raises:
+            PoolTimeout: Все соединения заняты дольше `timeout` секунд.
+        """
+        started = perf_counter()
+        with self._condition:
+            if not self._condition.wait_for(self._available, self.timeout):
+                metrics.inc("foodgram_db_pool_timeouts_total", self._labels)
+                raise PoolTimeout(
+                    f"Нет свободного соединения с БД `{self.name}` "
+                    f"за {self.timeout} с (размер пула {self.size})."
+                )
+            connection, returned_at = (
+                self._idle.pop() if self._idle else (None, 0.0)
+            )
+            self._in_use += 1
+            self._report()
+        metrics.observe(
+            "foodgram_db_pool_wait_seconds",
+            self._labels,
+            perf_counter() - started,
+        )
+        metrics.inc("foodgram_db_pool_checkouts_total", self._labels)
+
+        if connection is not None and (
+            monotonic() - returned_at > self.check_after
+            and not self._is_usable(connection)
+        ):
+            self._discard(connection)
+            connection = None
+        if connection is not None:
+            return connection
+
+        try:
+            connection = self._connect()
+        except BaseException:
+            self._release()
+            raise
+        metrics.inc("foodgram_db_pool_connects_total", self._labels)
+        return connection
+
+    def checkin(self, connection: Any, reusable: bool = True) -> None:
+        """Возвращает соединение в пул, неисправное - закрывает."""
+        if not reusable:
+            self._discard(connection)
+        self._release(connection if reusable else None)
+
+    def _release(self, connection: Any = None) -> None:
+        with self._condition:
+            self._in_use -= 1
+            if connection is not None:
+                self._idle.append((connection, monotonic()))
+            self._report()
+            self._condition.notify()
+
+    def _discard(self, connection: Any) -> None:
+        metrics.inc("foodgram_db_pool_discarded_total", self._labels)
+        try:
+            connection.close()
+        except Exception:
+            logger.debug("Ошибка закрытия соединения", exc_info=True)
+
+    def close(self) -> None:
+        """Закрывает свободные соединения."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._report()
+        for connection, _ in idle:
+            connection.close()
+
+
+_pools: dict[Hashable, ConnectionPool] = {}
+_pools_lock = Lock()
+
+
+def get_pool(key: Hashable, **kwargs) -> ConnectionPool:
+    """Пул процесса для ключа (алиас и параметры подключения).
+
+    Args:
+        key (Hashable): Ключ пула.
+        **kwargs: Аргументы `ConnectionPool` для нового пула.
+
+    Returns:
+        ConnectionPool: Созданный ранее или новый пул.
+    """
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(**kwargs)
+        return _pools[key]
@@ -35,11 +35,22 @@ class Limits(IntEnum):
     MIN_AMOUNT_INGREDIENTS = 1
     # Максимальное количество ингридиентов для рецепта
     MAX_AMOUNT_INGREDIENTS = 32
+    # Размер страницы keyset-пагинации, если не передан `limit`
+    CURSOR_PAGE_SIZE = 6
+    # Максимальный размер загружаемого изображения в байтах
+    MAX_IMAGE_FILE_SIZE = 10 * 1024 * 1024
+    # Максимальное количество пикселей загружаемого изображения
+    MAX_IMAGE_PIXELS = 40_000_000
+    # Максимальное количество `id` в пакетном добавлении/удалении связей
+    MAX_BATCH_RELATIONS = 100
 
 
 class UrlQueries(str, Enum):
-    # Параметр для поиска ингридиентов по вхождению значения в название
+    # Параметр для поиска ингридиентов и рецептов по вхождению значения
+    # в название
     SEARCH_ING_NAME = "name"
+    # Параметр для поиска рецептов по названию и описанию
+    SEARCH = "search"
     # Параметр для поиска объектов в списке "избранное"
     FAVORITE = "is_favorited"
     # Параметр для поиска объектов в списке "покупки"
@@ -48,3 +59,16 @@ class UrlQueries(str, Enum):
     AUTHOR = "author"
     # Параметр для поиска объектов по тэгам
     TAGS = "tags"
+    # Режим поиска по тэгам: "any" - любой из тэгов (по умолчанию),
+    # "all" - все тэги
+    TAGS_MODE = "tags_mode"
+    # Параметр для ограничения количества рецептов в подписках
+    RECIPES_LIMIT = "recipes_limit"
+
+
+class RelationStatus(str, Enum):
+    # Результаты пакетного добавления/удаления связей по каждому `id`
+    CREATED = "created"
+    EXISTS = "exists"
+    DELETED = "deleted"
+    NOT_FOUND = "not_found"
@@ -0,0 +1,386 @@
+"""Загрузка и фоновая обработка изображений рецептов.
+
+Изображение в base64 декодируется блоками во временный файл, формат
+и размеры проверяются по заголовку до декодирования пикселей.
+
+Запрос только сохраняет загруженный файл и ставит рецепт в очередь
+после фиксации транзакции. WebP-варианты для `srcset` и уменьшение
+до `Tuples.RECIPE_IMAGE_SIZE` готовятся в пуле потоков (Pillow
+освобождает GIL при декодировании и масштабировании). Пока обработка
+не завершена, отдаётся оригинал.
+
+Готовое изображение сохраняется новым файлом, затем поля `image`
+и `image_variants` переключаются на новые файлы, а ссылки на старые
+снимаются (файлы удаляет `manage.py cleanup_media`, см. `core.storage`).
+В `image_hash` записывается SHA-256 итогового файла: повторное
+сохранение рецепта с тем же файлом обработку не запускает.
+"""
+import logging
+from base64 import b64decode
+from binascii import Error as BinasciiError
+from concurrent.futures import Future, ThreadPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+from pathlib import PurePosixPath
+from threading import Lock
+from typing import IO
+from uuid import uuid4
+
+from core.enums import Limits, Tuples
+from core.storage import release_files, retain_files
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Размер блока при чтении файла для хэширования.
+HASH_CHUNK_SIZE = 64 * 1024
+# WebP-варианты изображения рецепта: название -> ограничивающий размер.
+IMAGE_VARIANTS: dict[str, tuple[int, int]] = {
+    "card": (320, 320),
+    "detail": (640, 640),
+    "retina": (1280, 1280),
+}
+IMAGE_VARIANTS_QUALITY = 80
+# Размер блока base64 при декодировании, кратен 4.
+BASE64_CHUNK_SIZE = 64 * 1024
+# Допустимые форматы загружаемых изображений и расширения их файлов.
+UPLOAD_FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif"}
+# Сигнатуры файлов допустимых форматов.
+UPLOAD_SIGNATURES = (
+    b"\xff\xd8\xff",
+    b"\x89PNG\r\n\x1a\n",
+    b"GIF87a",
+    b"GIF89a",
+)
+INVALID_IMAGE_MESSAGE = "Загрузите правильное изображение."
+
+# Pillow отказывается открывать изображения больше двух таких пределов,
+# в том числе при фоновой обработке файлов, загруженных мимо API.
+Image.MAX_IMAGE_PIXELS = Limits.MAX_IMAGE_PIXELS.value
+
+
+def file_hash(file: IO[bytes]) -> str:
+    """Считает SHA-256 содержимого файла, читая его блоками.
+
+    Args:
+        file (IO[bytes]): Открытый файл.
+
+    Returns:
+        str: Хэш в шестнадцатеричном виде.
+    """
+    digest = sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _write_base64(data: str, start: int, file: IO[bytes]) -> int:
+    """Декодирует base64 из `data[start:]` в файл блоками.
+
+    Raises:
+        ValidationError:
+            Строка не base64, файл не изображение допустимого формата
+            или больше `Limits.MAX_IMAGE_FILE_SIZE`.
+
+    Returns:
+        int: Размер записанных данных.
+    """
+    size = 0
+    rest = ""
+    for pos in range(start, len(data), BASE64_CHUNK_SIZE):
+        chunk = "".join((rest + data[pos:pos + BASE64_CHUNK_SIZE]).split())
+        cut = len(chunk) - len(chunk) % 4
+        chunk, rest = chunk[:cut], chunk[cut:]
+        try:
+            decoded = b64decode(chunk, validate=True)
+        except (BinasciiError, ValueError):
+            raise ValidationError(INVALID_IMAGE_MESSAGE)
+
+        if not size and not decoded.startswith(UPLOAD_SIGNATURES):
+            raise ValidationError(INVALID_IMAGE_MESSAGE)
+        size += len(decoded)
+        if size > Limits.MAX_IMAGE_FILE_SIZE:
+            raise ValidationError("Слишком большой файл изображения.")
+        file.write(decoded)
+
+    if rest or not size:
+        raise ValidationError(INVALID_IMAGE_MESSAGE)
+    return size
+
+
+def decode_base64_image(data: str) -> TemporaryUploadedFile:
+    """Декодирует изображение из base64 во временный файл.
+
+    Строка декодируется блоками по `BASE64_CHUNK_SIZE` символов, так что
+    в памяти нет полной копии файла. Принимается как чистый base64,
+    так и data URL (`data:image/png;base64,...`). По первому блоку
+    проверяется сигнатура формата, чтобы не декодировать до конца
+    то, что не является изображением.
+
+    Args:
+        data (str): Изображение в base64.
+
+    Raises:
+        ValidationError: Строка не содержит допустимого изображения.
+
+    Returns:
+        TemporaryUploadedFile: Файл, удаляемый после закрытия.
+    """
+    content_type = None
+    start = data.find(";base64,", 0, 256)
+    if start >= 0:
+        if data.startswith("data:"):
+            content_type = data[5:start]
+        start += len(";base64,")
+    else:
+        start = 0
+
+    file = TemporaryUploadedFile("image", content_type, 0, None)
+    try:
+        file.size = _write_base64(data, start, file)
+    except ValidationError:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+def check_image_file(file: UploadedFile) -> str:
+    """Проверяет формат и размеры изображения по заголовку файла.
+
+    Pillow читает только заголовок, пиксели не декодируются, поэтому
+    изображения-бомбы (маленький файл с огромными размерами)
+    отклоняются до распаковки.
+
+    Args:
+        file (UploadedFile): Загруженный файл.
+
+    Raises:
+        ValidationError:
+            Файл не изображение допустимого формата или в нём больше
+            `Limits.MAX_IMAGE_PIXELS` пикселей.
+
+    Returns:
+        str: Имя файла со случайной основой и расширением по формату.
+    """
+    if file.size > Limits.MAX_IMAGE_FILE_SIZE:
+        raise ValidationError("Слишком большой файл изображения.")
+
+    file.seek(0)
+    try:
+        with Image.open(file, formats=tuple(UPLOAD_FORMATS)) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(INVALID_IMAGE_MESSAGE)
+    finally:
+        file.seek(0)
+
+    if width * height > Limits.MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            "Слишком большое изображение: не более "
+            f"{Limits.MAX_IMAGE_PIXELS.value} пикселей."
+        )
+    return f"{uuid4()}.{UPLOAD_FORMATS[image_format]}"
+
+
+def _save_image(filename: str, content: bytes) -> str:
+    Recipe = apps.get_model("recipes", "Recipe")
+    name = Recipe._meta.get_field("image").generate_filename(None, filename)
+    return default_storage.save(name, ContentFile(content))
+
+
+def _save_variants(image: Image.Image, name: str) -> dict[str, dict]:
+    """Сохраняет уменьшенные копии изображения в WebP.
+
+    Размеры берутся из `IMAGE_VARIANTS`, копии не увеличиваются.
+    Варианты, совпадающие по ширине с предыдущим, не сохраняются.
+
+    Args:
+        image (Image.Image): Исходное изображение.
+        name (str): Имя исходного файла в хранилище.
+
+    Returns:
+        dict[str, dict]:
+            Вариант -> `{"name": имя файла, "width": ширина}`.
+    """
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    stem = PurePosixPath(name).stem
+    variants = {}
+    previous_width = None
+    for variant, size in IMAGE_VARIANTS.items():
+        copy = image.copy()
+        copy.thumbnail(size)
+        if copy.width == previous_width:
+            continue
+        previous_width = copy.width
+
+        buffer = BytesIO()
+        copy.save(buffer, format="WEBP", quality=IMAGE_VARIANTS_QUALITY)
+        variants[variant] = {
+            "name": _save_image(f"{stem}_{variant}.webp", buffer.getvalue()),
+            "width": copy.width,
+        }
+    return variants
+
+
+def recipe_image_names(name: str, variants: dict[str, dict]) -> list[str]:
+    """Имена файлов изображения рецепта и его вариантов.
+
+    Args:
+        name (str): Имя файла изображения, пустая строка - без него.
+        variants (dict[str, dict]): Значение `Recipe.image_variants`.
+
+    Returns:
+        list[str]: Имена файлов в хранилище.
+    """
+    names = [variant["name"] for variant in variants.values()]
+    if name:
+        names.append(name)
+    return names
+
+
+def image_srcset(variants: dict[str, dict], request=None) -> str:
+    """Собирает значение атрибута `srcset` из вариантов изображения.
+
+    Args:
+        variants (dict[str, dict]): Значение `Recipe.image_variants`.
+        request (Request | None): Запрос для построения абсолютных ссылок.
+
+    Returns:
+        str:
+            Строка вида `url 320w, url 640w`. Пустая, пока изображение
+            не обработано.
+    """
+    urls = []
+    for variant in sorted(variants.values(), key=lambda v: v["width"]):
+        url = default_storage.url(variant["name"])
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        urls.append(f"{url} {variant['width']}w")
+    return ", ".join(urls)
+
+
+def process_recipe_image(recipe_id: int) -> None:
+    """Готовит изображение рецепта, если оно изменилось.
+
+    Сохраняет WebP-варианты (`IMAGE_VARIANTS`) и уменьшает основное
+    изображение до `Tuples.RECIPE_IMAGE_SIZE` в исходном формате -
+    оно остаётся запасным вариантом для клиентов без WebP.
+
+    Args:
+        recipe_id (int): `id` рецепта.
+    """
+    Recipe = apps.get_model("recipes", "Recipe")
+    row = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values_list("image", "image_hash", "image_variants")
+        .first()
+    )
+    if row is None:
+        return
+
+    name, image_hash, old_variants = row
+    content = None
+    with default_storage.open(name, "rb") as file:
+        digest = file_hash(file)
+        if digest == image_hash and old_variants:
+            return
+
+        with Image.open(file) as image:
+            variants = _save_variants(image, name)
+            if (
+                image.width > Tuples.RECIPE_IMAGE_SIZE[0]
+                or image.height > Tuples.RECIPE_IMAGE_SIZE[1]
+            ):
+                image_format = image.format
+                image.thumbnail(Tuples.RECIPE_IMAGE_SIZE)
+                buffer = BytesIO()
+                image.save(buffer, format=image_format)
+                content = buffer.getvalue()
+
+    fields = {"image_hash": digest, "image_variants": variants}
+    new_name = ""
+    if content is not None:
+        new_name = _save_image(PurePosixPath(name).name, content)
+        fields.update(image=new_name, image_hash=sha256(content).hexdigest())
+
+    with transaction.atomic():
+        updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+            **fields
+        )
+        # Если изображение заменили во время обработки, новые файлы
+        # остаются без ссылок, их удалит `cleanup_media`.
+        if updated:
+            retain_files(recipe_image_names(new_name, variants))
+            release_files(
+                recipe_image_names(name if new_name else "", old_variants)
+            )
+
+
+class ImageQueue:
+    """Очередь обработки изображений в пуле потоков процесса.
+
+    При `IMAGE_PROCESSING_WORKERS = 0` изображения обрабатываются
+    синхронно (например, в тестах или management-командах).
+    Задачи, не выполненные до остановки процесса, дообрабатывает
+    `manage.py process_recipe_images`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                    thread_name_prefix="recipe-images",
+                )
+            return self._executor
+
+    @staticmethod
+    def _run(recipe_id: int) -> None:
+        try:
+            process_recipe_image(recipe_id)
+        except Exception:
+            logger.exception("Ошибка обработки изображения %s", recipe_id)
+        finally:
+            close_old_connections()
+
+    def submit(self, recipe_id: int) -> Future | None:
+        """Обрабатывает изображение рецепта в фоне.
+
+        Args:
+            recipe_id (int): `id` рецепта.
+
+        Returns:
+            Future | None: Задача пула, `None` при синхронной обработке.
+        """
+        if not settings.IMAGE_PROCESSING_WORKERS:
+            process_recipe_image(recipe_id)
+            return None
+        return self._get_executor().submit(self._run, recipe_id)
+
+    def schedule(self, recipe_id: int) -> None:
+        """Ставит рецепт в очередь после фиксации текущей транзакции.
+
+        Args:
+            recipe_id (int): `id` рецепта.
+        """
+        transaction.on_commit(lambda: self.submit(recipe_id))
+
+
+image_queue = ImageQueue()
@@ -0,0 +1,35 @@
+"""Индексы, создаваемые только в PostgreSQL.
+"""
+from django.contrib.postgres.indexes import GinIndex
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.models import Model
+
+
+class PostgresGinIndex(GinIndex):
+    """GIN-индекс, который в остальных БД не создаётся.
+
+    SQLite меняет таблицу, пересоздавая её вместе со всеми индексами
+    из `Meta.indexes`, а синтаксис GIN-индексов не поддерживает.
+    Для остальных БД индекс формирует пустой SQL.
+    """
+
+    def create_sql(
+        self,
+        model: type[Model],
+        schema_editor: BaseDatabaseSchemaEditor,
+        using: str = "",
+        **kwargs,
+    ) -> str:
+        if schema_editor.connection.vendor != "postgresql":
+            return ""
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+    def remove_sql(
+        self,
+        model: type[Model],
+        schema_editor: BaseDatabaseSchemaEditor,
+        **kwargs,
+    ) -> str:
+        if schema_editor.connection.vendor != "postgresql":
+            return ""
+        return super().remove_sql(model, schema_editor, **kwargs)
@@ -0,0 +1,29 @@
+"""Операции миграций, применяемые только к PostgreSQL.
+"""
+from django.db.migrations import AddIndex
+
+
+class PostgresAddIndex(AddIndex):
+    """Создаёт индекс только в PostgreSQL.
+
+    Индексы GIN и классы операторов `pg_trgm` есть только в PostgreSQL,
+    в остальных БД (например, SQLite в тестах) операция пропускается.
+    Состояние моделей меняется всегда, поэтому `makemigrations`
+    не видит расхождений с `Meta.indexes`.
+    """
+
+    def database_forwards(
+        self, app_label, schema_editor, from_state, to_state
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(
+        self, app_label, schema_editor, from_state, to_state
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
@@ -0,0 +1,644 @@
+"""Профилирование запросов: SQL, время БД и сериализации, метрики.
+
+`ProfilingMiddleware` для доли запросов `PROFILING_SAMPLE_RATE` считает
+запросы к БД и их время, время сериализации ответа и повторяющиеся
+запросы (N+1): запросы с одинаковым отпечатком (`fingerprint`) больше
+`PROFILING_DUPLICATE_THRESHOLD` раз записываются в лог `core.profiling`.
+Результат добавляется в заголовок `Server-Timing` и в метрики.
+
+Метрики всех запросов в формате Prometheus отдаёт `metrics_view`
+(`/metrics`) сотруднику (`is_staff`) или по заголовку
+`Authorization: Bearer <METRICS_TOKEN>`. Метрики хранятся в памяти
+процесса, у каждого воркера gunicorn - свои. Адрес не проксируется
+nginx, метрики собираются напрямую с `backend:8000`.
+
+`RequestProfilerMiddleware` профилирует отдельный запрос сотрудника
+(`is_staff`) с параметром `?__profile=` или заголовком `X-Profile`
+и вместо ответа возвращает профиль, см. `PROFILE_FORMATS`.
+"""
+import asyncio
+import cProfile
+import hmac
+import logging
+import marshal
+import pstats
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from random import random
+from threading import Lock
+from time import perf_counter
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+)
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PROFILE_PARAM = "__profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+# `text` (или `1`) - самые затратные функции cProfile текстом,
+# `pstats` - файл cProfile для snakeviz, flameprof и т.п.,
+# `html` - флеймграф семплирующего профилировщика pyinstrument.
+PROFILE_FORMATS = ("text", "pstats", "html")
+# Сколько функций выводится в формате `text`.
+PROFILE_TEXT_LINES = 60
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)")
+
+_LABEL_ESCAPES = re.compile(r'[\\"\n]')
+
+_profile: ContextVar["RequestProfile | None"] = ContextVar(
+    "profile", default=None
+)
+
+
+def fingerprint(sql: str) -> str:
+    """Отпечаток SQL-запроса без значений.
+
+    Литералы заменяются на `?`, списки `IN (%s, %s, ...)` любой
+    длины - на `IN (...)`. Запросы, отличающиеся только параметрами,
+    получают одинаковый отпечаток.
+
+    Args:
+        sql (str): Текст запроса.
+
+    Returns:
+        str: Отпечаток запроса.
+    """
+    sql = _LITERALS.sub("?", sql)
+    return _IN_LISTS.sub("IN (...)", sql)
+
+
+def _escape(match: re.Match) -> str:
+    return "\\n" if match.group() == "\n" else "\\" + match.group()
+
+
+class MetricsRegistry:
+    """Счётчики, текущие значения и гистограммы в памяти процесса."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._help: dict[str, tuple[str, str]] = {}
+        self._counters: dict[str, Counter] = defaultdict(Counter)
+        self._gauges: dict[str, dict] = defaultdict(dict)
+        self._histograms: dict[str, dict] = {}
+        self._buckets: dict[str, tuple] = {}
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._help[name] = ("counter", help_text)
+
+    def gauge(self, name: str, help_text: str) -> None:
+        self._help[name] = ("gauge", help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple) -> None:
+        self._help[name] = ("histogram", help_text)
+        self._buckets[name] = buckets
+        self._histograms[name] = {}
+
+    def inc(self, name: str, labels: tuple, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name][labels] += value
+
+    def set(self, name: str, labels: tuple, value: float) -> None:
+        with self._lock:
+            self._gauges[name][labels] = value
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        buckets = self._buckets[name]
+        with self._lock:
+            series = self._histograms[name].setdefault(
+                labels, [[0] * (len(buckets) + 1), 0.0]
+            )
+            series[0][bisect_left(buckets, value)] += 1
+            series[1] += value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            for series in self._histograms.values():
+                series.clear()
+
+    @staticmethod
+    def _labels(labels: tuple, extra: str = "") -> str:
+        parts = [
+            f'{key}="{_LABEL_ESCAPES.sub(_escape, str(value))}"'
+            for key, value in labels
+        ]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._help.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind != "histogram":
+                    values = (
+                        self._counters[name]
+                        if kind == "counter"
+                        else self._gauges[name]
+                    )
+                    for labels, value in values.items():
+                        lines.append(f"{name}{self._labels(labels)} {value}")
+                    continue
+                for labels, (counts, total) in self._histograms[name].items():
+                    cumulative = 0
+                    bounds = (*self._buckets[name], "+Inf")
+                    for bound, count in zip(bounds, counts):
+                        cumulative += count
+                        le = self._labels(labels, f'le="{bound}"')
+                        lines.append(f"{name}_bucket{le} {cumulative}")
+                    lines.append(
+                        f"{name}_sum{self._labels(labels)} {round(total, 6)}"
+                    )
+                    lines.append(
+                        f"{name}_count{self._labels(labels)} {cumulative}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.counter("foodgram_requests_total", "Обработанные запросы.")
+metrics.histogram(
+    "foodgram_request_duration_seconds",
+    "Время обработки запроса.",
+    LATENCY_BUCKETS,
+)
+metrics.counter(
+    "foodgram_profiled_requests_total", "Запросы с профилированием SQL."
+)
+metrics.histogram(
+    "foodgram_db_queries",
+    "Запросы к БД на один запрос (профилируемые запросы).",
+    QUERIES_BUCKETS,
+)
+metrics.histogram(
+    "foodgram_db_duration_seconds",
+    "Время запросов к БД (профилируемые запросы).",
+    LATENCY_BUCKETS,
+)
+metrics.histogram(
+    "foodgram_serializer_duration_seconds",
+    "Время сериализации ответа (профилируемые запросы).",
+    LATENCY_BUCKETS,
+)
+metrics.counter(
+    "foodgram_duplicate_queries_total",
+    "Повторы запросов с одинаковым отпечатком (N+1).",
+)
+
+
+class RequestProfile:
+    """Запросы к БД и время сериализации одного HTTP-запроса.
+
+    Экземпляр - обёртка `connection.execute_wrapper`.
+    """
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.fingerprints: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def wrap_connections(self) -> ExitStack:
+        """Подключает обёртку к соединениям всех БД текущего потока."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    def recording(self) -> ExitStack:
+        """Контекст, в котором учитываются запросы ко всем БД."""
+        stack = self.wrap_connections()
+        token = _profile.set(self)
+        stack.callback(_profile.reset, token)
+        return stack
+
+    def duplicates(self, threshold: int) -> dict[str, int]:
+        """Отпечатки, повторившиеся не менее `threshold` раз."""
+        return {
+            sql: count
+            for sql, count in self.fingerprints.items()
+            if count >= threshold
+        }
+
+    def server_timing(self, total: float) -> str:
+        """Значение заголовка `Server-Timing`, время в миллисекундах."""
+        repeated = sum(count - 1 for count in self.fingerprints.values())
+        return ", ".join(
+            (
+                f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} '
+                'queries"',
+                f"ser;dur={self.serializer_time * 1000:.2f}",
+                f'dup;desc="{repeated}"',
+                f"total;dur={total * 1000:.2f}",
+            )
+        )
+
+
+def install_serializer_timing() -> None:
+    """Учитывает время `serializer.data` в профиле текущего запроса.
+
+    Оборачивает свойство `BaseSerializer.data` DRF. Вложенные вызовы
+    (сериализатор внутри `SerializerMethodField`) не учитываются
+    повторно.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+    if getattr(original.fget, "profiled", False):
+        return
+
+    def data(self):
+        profile = _profile.get()
+        if profile is None or profile.serializing:
+            return original.fget(self)
+        profile.serializing = True
+        started = perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            profile.serializer_time += perf_counter() - started
+            profile.serializing = False
+
+    data.profiled = True
+    BaseSerializer.data = property(data)
+
+
+def _view_name(request: HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "unresolved"
+
+
+class AsyncCapableMiddleware(ABC):
+    """Middleware, работающий в синхронном и асинхронном режимах.
+
+    При асинхронной цепочке (ASGI) вызов передаётся в `__acall__`,
+    чтобы не переключаться в поток на каждый запрос. Наследники
+    реализуют оба метода: `call` и `__acall__`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так же `MiddlewareMixin` Django 4.1 помечает себя корутиной.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if getattr(self, "_is_coroutine", None):
+            return self.__acall__(request)
+        return self.call(request)
+
+    @abstractmethod
+    def call(self, request: HttpRequest) -> HttpResponse:
+        """Обрабатывает запрос в синхронной цепочке (WSGI)."""
+
+    @abstractmethod
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        """Обрабатывает запрос в асинхронной цепочке (ASGI)."""
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """Замеряет время запросов и профилирует SQL части из них.
+
+    Должен быть первым в `MIDDLEWARE`, чтобы учитывать работу
+    остальных middleware. В режиме ASGI асинхронный ORM выполняет
+    запросы в отдельном потоке, обёртка подключается к его соединениям.
+    """
+
+    def call(self, request: HttpRequest) -> HttpResponse:
+        started = perf_counter()
+        if random() >= settings.PROFILING_SAMPLE_RATE:
+            response = self.get_response(request)
+            self.finish(request, response, started)
+            return response
+
+        profile = RequestProfile()
+        with profile.recording():
+            response = self.get_response(request)
+        if response.streaming:
+            # Потоковый ответ формируется после выхода из middleware.
+            response.streaming_content = self.stream(
+                response.streaming_content,
+                request,
+                response,
+                started,
+                profile,
+                profile.recording,
+            )
+            return response
+
+        total = self.finish(request, response, started, profile)
+        response["Server-Timing"] = profile.server_timing(total)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        started = perf_counter()
+        if random() >= settings.PROFILING_SAMPLE_RATE:
+            response = await self.get_response(request)
+            self.finish(request, response, started)
+            return response
+
+        profile = RequestProfile()
+        # Соединения БД - в потоке `sync_to_async` текущего запроса.
+        wrappers = await sync_to_async(profile.wrap_connections)()
+        token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+            await sync_to_async(wrappers.close)()
+        if response.streaming:
+            # Async-представления читают БД до начала ответа.
+            response.streaming_content = self.stream(
+                response.streaming_content,
+                request,
+                response,
+                started,
+                profile,
+                nullcontext,
+            )
+            return response
+
+        total = self.finish(request, response, started, profile)
+        response["Server-Timing"] = profile.server_timing(total)
+        return response
+
+    def stream(self, content, request, response, started, profile, record):
+        with record():
+            yield from content
+        self.finish(request, response, started, profile)
+
+    @staticmethod
+    def finish(
+        request: HttpRequest,
+        response: HttpResponse,
+        started: float,
+        profile: RequestProfile | None = None,
+    ) -> float:
+        """Записывает метрики запроса.
+
+        Returns:
+            float: Время обработки запроса, секунд.
+        """
+        total = perf_counter() - started
+        view = _view_name(request)
+        labels = (("view", view),)
+        metrics.inc(
+            "foodgram_requests_total",
+            (
+                *labels,
+                ("method", request.method),
+                ("status", response.status_code),
+            ),
+        )
+        metrics.observe("foodgram_request_duration_seconds", labels, total)
+        if profile is None:
+            return total
+
+        metrics.inc("foodgram_profiled_requests_total", labels)
+        metrics.observe("foodgram_db_queries", labels, profile.queries)
+        metrics.observe(
+            "foodgram_db_duration_seconds", labels, profile.db_time
+        )
+        metrics.observe(
+            "foodgram_serializer_duration_seconds",
+            labels,
+            profile.serializer_time,
+        )
+        duplicates = profile.duplicates(settings.PROFILING_DUPLICATE_THRESHOLD)
+        for sql, count in duplicates.items():
+            metrics.inc("foodgram_duplicate_queries_total", labels, count - 1)
+            logger.warning(
+                "Повторяющийся запрос (%s раз) в %s %s: %s",
+                count,
+                request.method,
+                view,
+                sql,
+            )
+        return total
+
+
+def _metrics_token_valid(request: HttpRequest) -> bool:
+    """Проверяет заголовок `Authorization: Bearer <METRICS_TOKEN>`."""
+    if not settings.METRICS_TOKEN:
+        return False
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    return hmac.compare_digest(
+        header.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+    )
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Метрики процесса в формате Prometheus.
+
+    Доступны по токену `METRICS_TOKEN` (для Prometheus) или сотруднику.
+    """
+    if not _metrics_token_valid(request) and not _is_staff(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+def _is_staff(request: HttpRequest) -> bool:
+    """Проверяет, что запрос от сотрудника, по сессии или токену.
+
+    Аутентификация DRF выполняется во view, поэтому токен проверяется
+    классами `DEFAULT_AUTHENTICATION_CLASSES` заранее.
+    """
+    from rest_framework.exceptions import APIException
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+
+    drf_request = Request(request)
+    for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication().authenticate(drf_request)
+        except APIException:
+            return False
+        if result is not None:
+            return result[0].is_staff
+    return False
+
+
+def _consume(response: HttpResponse) -> None:
+    """Формирует тело потокового ответа внутри профилировщика."""
+    if response.streaming:
+        response.streaming_content = [b"".join(response.streaming_content)]
+
+
+class RequestProfilerMiddleware(AsyncCapableMiddleware):
+    """Профилирует запрос сотрудника по `?__profile=` или `X-Profile`.
+
+    Вместо ответа возвращается профиль, код исходного ответа - в заголовке
+    `X-Profiled-Status`. С `PROFILE_REQUESTS_DIR` профиль также
+    сохраняется в этот каталог, имя файла - в заголовке `X-Profile-File`.
+    Должен стоять после `AuthenticationMiddleware`. В режиме ASGI
+    профилируется цикл событий: запросы асинхронного ORM выполняются
+    в потоке и видны в профиле как ожидание.
+    """
+
+    def call(self, request: HttpRequest) -> HttpResponse:
+        output = self.requested(request)
+        if not output or not _is_staff(request):
+            return self.get_response(request)
+
+        error = self.check(output)
+        if error is not None:
+            return error
+        profiler = self.start(output)
+        try:
+            response = self.get_response(request)
+            _consume(response)
+        finally:
+            content = self.stop(profiler, output)
+        return self.result(request, response, output, content)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        output = self.requested(request)
+        if not output or not await sync_to_async(_is_staff)(request):
+            return await self.get_response(request)
+
+        error = self.check(output)
+        if error is not None:
+            return error
+        profiler = self.start(output)
+        try:
+            response = await self.get_response(request)
+            _consume(response)
+        finally:
+            content = self.stop(profiler, output)
+        return self.result(request, response, output, content)
+
+    @staticmethod
+    def requested(request: HttpRequest) -> str | None:
+        """Запрошенный формат профиля, `1` - текстовый."""
+        output = request.GET.get(PROFILE_PARAM) or request.META.get(
+            PROFILE_HEADER
+        )
+        return "text" if output == "1" else output
+
+    @staticmethod
+    def check(output: str) -> HttpResponse | None:
+        """Ответ `400`, если профиль в этом формате не получить."""
+        if output not in PROFILE_FORMATS:
+            return HttpResponseBadRequest(
+                f"Формат профиля: {', '.join(PROFILE_FORMATS)}."
+            )
+        if output == "html" and SamplingProfiler is None:
+            return HttpResponseBadRequest("pyinstrument не установлен.")
+        return None
+
+    @staticmethod
+    def start(output: str):
+        if output == "html":
+            profiler = SamplingProfiler()
+            profiler.start()
+            return profiler
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    @staticmethod
+    def stop(profiler, output: str) -> str | bytes:
+        """Останавливает профилировщик и формирует профиль."""
+        if output == "html":
+            profiler.stop()
+            return profiler.output_html()
+
+        profiler.disable()
+        if output == "pstats":
+            profiler.create_stats()
+            return marshal.dumps(profiler.stats)
+        buffer = StringIO()
+        stats = pstats.Stats(profiler, stream=buffer)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(
+            PROFILE_TEXT_LINES
+        )
+        return buffer.getvalue()
+
+    def result(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        output: str,
+        content: str | bytes,
+    ) -> HttpResponse:
+        """Ответ с профилем вместо ответа представления."""
+        result = HttpResponse(
+            content,
+            content_type=(
+                "text/html; charset=utf-8"
+                if output == "html"
+                else "text/plain; charset=utf-8"
+            ),
+        )
+        result["X-Profiled-Status"] = response.status_code
+        name = "{}-{}.{}".format(
+            _view_name(request).replace(":", "-"),
+            datetime.now().strftime("%Y%m%d-%H%M%S-%f"),
+            "html" if output == "html" else "prof",
+        )
+        if output == "pstats":
+            result["Content-Type"] = "application/octet-stream"
+            result["Content-Disposition"] = f'attachment; filename="{name}"'
+        if settings.PROFILE_REQUESTS_DIR:
+            self.save(name, content, request)
+            result["X-Profile-File"] = name
+        return result
+
+    @staticmethod
+    def save(name: str, content: str | bytes, request: HttpRequest) -> None:
+        path = Path(settings.PROFILE_REQUESTS_DIR) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, bytes):
+            path.write_bytes(content)
+        else:
+            path.write_text(content, encoding="utf-8")
+        logger.info(
+            "Профиль %s %s сохранён в %s", request.method, request.path, path
+        )
@@ -0,0 +1,194 @@
+"""Модуль поиска ингридиентов и рецептов.
+"""
+from bisect import bisect_left
+from threading import Lock
+from typing import NamedTuple
+
+from core.cache import catalog_version
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    Q,
+    QuerySet,
+    Value,
+    When,
+)
+from recipes.models import RECIPE_TEXT_VECTOR, Ingredient, Recipe
+
+# Символ больше любого символа в названиях - верхняя граница для префикса.
+_MAX_CHAR = chr(0x10FFFF)
+
+
+class _IndexData(NamedTuple):
+    version: int
+    # Названия в нижнем регистре, отсортированы.
+    keys: list[str]
+    # (id, name, measurement_unit) в том же порядке, что и `keys`.
+    rows: list[tuple[int, str, str]]
+    # Триграмма -> возрастающий список позиций в `keys`.
+    trigrams: dict[str, list[int]]
+
+
+def _trigrams(value: str) -> set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class IngredientIndex:
+    """Индекс ингридиентов в памяти процесса для автодополнения.
+
+    Совпадения в начале названия ищутся бинарным поиском по
+    отсортированному списку, совпадения в середине - по триграммам
+    (для запросов короче трёх символов - перебором).
+    Индекс строится при первом поиске и перестраивается, когда меняется
+    версия справочника ингридиентов в кэше (её увеличивают сигналы
+    `post_save`/`post_delete`, см. `core.signals`). С общим кэшем
+    (redis) индексы всех процессов перестраиваются после изменения.
+    В кэше процесса (`locmem`) версия живёт
+    `CATALOG_LOCAL_CACHE_TIMEOUT` секунд, затем индекс строится заново,
+    поэтому изменения из других воркеров видны не позже этого срока.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._data: _IndexData | None = None
+
+    def _build(self, version: int) -> _IndexData:
+        rows = sorted(
+            Ingredient.objects.values_list("id", "name", "measurement_unit"),
+            key=lambda row: (row[1].lower(), row[0]),
+        )
+        keys = [name.lower() for _, name, _ in rows]
+        trigrams: dict[str, list[int]] = {}
+        for position, key in enumerate(keys):
+            for trigram in _trigrams(key):
+                trigrams.setdefault(trigram, []).append(position)
+        return _IndexData(version, keys, rows, trigrams)
+
+    def _get_data(self) -> _IndexData:
+        version = catalog_version(Ingredient)
+        data = self._data
+        if data is not None and data.version == version:
+            return data
+
+        with self._lock:
+            if self._data is None or self._data.version != version:
+                self._data = self._build(version)
+            return self._data
+
+    def _contains(self, data: _IndexData, name: str) -> list[int]:
+        if len(name) < 3:
+            return [pos for pos, key in enumerate(data.keys) if name in key]
+
+        postings = sorted(
+            (data.trigrams.get(trigram, ()) for trigram in _trigrams(name)),
+            key=len,
+        )
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return sorted(pos for pos in candidates if name in data.keys[pos])
+
+    def search(self, name: str) -> list[Ingredient]:
+        """Ищет ингридиенты по названию.
+
+        Args:
+            name (str): Искомая строка в нижнем регистре.
+
+        Returns:
+            list[Ingredient]:
+                Сначала ингридиенты, название которых начинается с `name`,
+                затем содержащие `name` в середине. Внутри групп -
+                в порядке названий.
+        """
+        data = self._get_data()
+        start = bisect_left(data.keys, name)
+        stop = bisect_left(data.keys, name + _MAX_CHAR, lo=start)
+        positions = list(range(start, stop))
+        positions.extend(
+            pos
+            for pos in self._contains(data, name)
+            if not start <= pos < stop
+        )
+        return [
+            Ingredient(id=pk, name=ing_name, measurement_unit=unit)
+            for pk, ing_name, unit in map(data.rows.__getitem__, positions)
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def search_ingredients(
+    queryset: QuerySet[Ingredient], name: str
+) -> QuerySet[Ingredient]:
+    """Ищет ингридиенты одним запросом к БД.
+
+    Порядок тот же, что у `IngredientIndex.search`: сначала совпадения
+    в начале названия, затем в середине. В PostgreSQL `ILIKE` использует
+    триграммный индекс, а совпадения в середине упорядочиваются
+    по триграммному сходству. В остальных БД - по названию.
+
+    Args:
+        queryset (QuerySet[Ingredient]): Исходный набор ингридиентов.
+        name (str): Искомая строка в нижнем регистре.
+
+    Returns:
+        QuerySet[Ingredient]: Найденные ингридиенты.
+    """
+    queryset = queryset.filter(name__icontains=name).annotate(
+        is_contained=Case(
+            When(name__istartswith=name, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    )
+    if connection.vendor != "postgresql":
+        return queryset.order_by("is_contained", "name")
+
+    return queryset.annotate(
+        similarity=TrigramSimilarity("name", name)
+    ).order_by("is_contained", "-similarity", "name")
+
+
+def search_recipes(queryset: QuerySet[Recipe], query: str) -> QuerySet[Recipe]:
+    """Ищет рецепты по названию и описанию.
+
+    В PostgreSQL название сравнивается по триграммам (сходство запроса
+    со словами названия), описание - полнотекстовым поиском с русской
+    и английской конфигурациями. Оба условия используют GIN-индексы.
+    Результаты упорядочены по сумме триграммного сходства и ранга.
+    В остальных БД (SQLite) - поиск вхождения подстроки без ранжирования.
+
+    Args:
+        queryset (QuerySet[Recipe]): Исходный набор рецептов.
+        query (str): Поисковый запрос.
+
+    Returns:
+        QuerySet[Recipe]: Найденные рецепты.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+
+    search_query = SearchQuery(
+        query, config="russian", search_type="websearch"
+    ) | SearchQuery(query, config="english", search_type="websearch")
+    return (
+        queryset.annotate(
+            search=RECIPE_TEXT_VECTOR,
+            similarity=TrigramWordSimilarity(query, "name"),
+        )
+        .filter(Q(name__trigram_word_similar=query) | Q(search=search_query))
+        .annotate(
+            relevance=F("similarity")
+            + SearchRank(RECIPE_TEXT_VECTOR, search_query)
+        )
+        .order_by("-relevance", *Recipe._meta.ordering)
+    )
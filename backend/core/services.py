@@ -1,18 +1,42 @@
 """Модуль вспомогательных функций.
 """
+import csv
+import json
 from datetime import datetime as dt
-from typing import TYPE_CHECKING
+from io import BytesIO
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
 from urllib.parse import unquote
 
-from django.apps import apps
-from django.db.models import F, Sum
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    Model,
+    OuterRef,
+    Prefetch,
+    QuerySet,
+    Sum,
+    Value,
+    When,
+    Window,
+    prefetch_related_objects,
+)
+from django.db.models.constants import OnConflict
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, RowNumber
 from foodgram.settings import DATE_TIME_FORMAT
-from recipes.models import AmountIngredient, Recipe
+from recipes.models import AmountIngredient, CartIngredient, Carts, Recipe
 
 if TYPE_CHECKING:
     from recipes.models import Ingredient
     from users.models import MyUser
 
+# Количество строк, читаемых из БД за раз при формировании списка покупок.
+SHOPPING_LIST_CHUNK_SIZE = 500
+
 
 def recipe_ingredients_set(
     recipe: Recipe, ingredients: dict[int, tuple["Ingredient", int]]
@@ -40,56 +64,511 @@ def recipe_ingredients_set(
     AmountIngredient.objects.bulk_create(objs)
 
 
-def create_shoping_list(user: "MyUser") -> str:
-    """Сфомировать список ингридкетов для покупки.
+def change_counters(queryset: QuerySet, **deltas: int) -> None:
+    """Изменяет денормализованные счётчики одним запросом `UPDATE`.
+
+    Значения изменяются выражениями `F()`, поэтому параллельные
+    изменения не теряются. Счётчик не опускается ниже нуля.
 
     Args:
-        user (MyUser):
-            Пользователь, для которго будет создаваться список.
+        queryset (QuerySet): Объекты, счётчики которых изменяются.
+        **deltas (int): Поле счётчика -> на сколько изменить.
+
+    Example:
+        change_counters(Recipe.objects.filter(pk=1), favorites_count=1)
+    """
+    queryset.update(
+        **{
+            field: Greatest(F(field) + delta, Value(0))
+            for field, delta in deltas.items()
+        }
+    )
+
+
+def insert_links(
+    link_model: type[Model], field: str, targets: QuerySet, **values
+) -> list:
+    """Создаёт связи с объектами `targets` одним запросом.
+
+    `INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING`: строки
+    вставляются только для существующих объектов, уже существующие связи
+    (в том числе созданные параллельным запросом) пропускаются без ошибки
+    и без отката транзакции. Первичный ключ `link_model` - автоинкремент.
+
+    Args:
+        link_model (type[Model]): Модель связи.
+        field (str): Поле `link_model`, ссылающееся на объекты `targets`.
+        targets (QuerySet): Объекты, с которыми создаются связи.
+        **values: Значения остальных полей, например `user=user`.
 
     Returns:
-        str:
-            Список продуктов с указанием необходимого количества.
+        list: `id` объектов, связи с которыми созданы.
+
+    Example:
+        insert_links(Favorites, "recipe", Recipe.objects.filter(pk=1), user=u)
     """
-    shopping_list = [
-        f"Список покупок для:\n\n{user.first_name}\n"
-        f"{dt.now().strftime(DATE_TIME_FORMAT)}\n"
-    ]
-    Ingredient = apps.get_model("recipes", "Ingredient")
-    ingredients = (
-        Ingredient.objects.filter(recipe__recipe__in_carts__user=user)
-        .values("name", measurement=F("measurement_unit"))
-        .annotate(amount=Sum("recipe__amount"))
+    connection = connections[router.db_for_write(link_model)]
+    quote = connection.ops.quote_name
+    relation = link_model(**values)
+    target_field = link_model._meta.get_field(field)
+
+    columns, select, params = [], [], []
+    for model_field in link_model._meta.concrete_fields:
+        if model_field.primary_key:
+            continue
+        columns.append(quote(model_field.column))
+        if model_field is target_field:
+            select.append(quote("target_id"))
+            continue
+        select.append("%s")
+        params.append(
+            model_field.get_db_prep_save(
+                model_field.pre_save(relation, add=True), connection
+            )
+        )
+
+    targets_sql, targets_params = (
+        targets.order_by()
+        .values(target_id=F("pk"))
+        .query.get_compiler(connection=connection)
+        .as_sql()
     )
-    ing_list = (
-        f'{ing["name"]}: {ing["amount"]} {ing["measurement"]}'
-        for ing in ingredients
+    sql = (
+        f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} "
+        f"{quote(link_model._meta.db_table)} ({', '.join(columns)}) "
+        f"SELECT {', '.join(select)} FROM ({targets_sql}) {quote('target')} "
+        + connection.ops.on_conflict_suffix_sql(
+            None, OnConflict.IGNORE, None, None
+        )
+        + f" RETURNING {quote(target_field.column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*params, *targets_params))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_links(queryset: QuerySet, field: str) -> list:
+    """Удаляет связи одним запросом `DELETE ... RETURNING`.
+
+    Сигналы удаления не отправляются, как у `QuerySet.update()`.
+
+    Args:
+        queryset (QuerySet): Удаляемые связи.
+        field (str): Поле связи, значения которого нужно вернуть.
+
+    Returns:
+        list: Значения `field` удалённых связей.
+    """
+    model = queryset.model
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    pk_column = quote(model._meta.pk.column)
+    subquery, params = (
+        queryset.order_by()
+        .values("pk")
+        .query.get_compiler(connection=connection)
+        .as_sql()
+    )
+    sql = (
+        f"DELETE FROM {quote(model._meta.db_table)} "
+        f"WHERE {pk_column} IN ({subquery}) "
+        f"RETURNING {quote(model._meta.get_field(field).column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def recipe_ingredient_amounts(recipe_ids: Iterable[int]) -> dict[int, int]:
+    """Суммирует количество ингридиентов в рецептах.
+
+    Args:
+        recipe_ids (Iterable[int]): `id` рецептов.
+
+    Returns:
+        dict[int, int]: `id` ингридиента -> суммарное количество.
+    """
+    return dict(
+        AmountIngredient.objects.filter(recipe__in=recipe_ids)
+        .values("ingredients")
+        .annotate(total=Sum("amount"))
+        .order_by()
+        .values_list("ingredients", "total")
     )
-    shopping_list.extend(ing_list)
 
+
+def change_cart_totals(
+    user_ids: Iterable[int], deltas: dict[int, int]
+) -> None:
+    """Изменяет количество ингридиентов в корзинах пользователей.
+
+    Недостающие строки `CartIngredient` создаются, затем все количества
+    изменяются одним запросом `UPDATE`. Строки с нулевым количеством
+    удаляются.
+
+    Args:
+        user_ids (Iterable[int]): `id` владельцев корзин.
+        deltas (dict[int, int]):
+            `id` ингридиента -> на сколько изменить количество.
+    """
+    deltas = {ing_id: delta for ing_id, delta in deltas.items() if delta}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+
+    CartIngredient.objects.bulk_create(
+        (
+            CartIngredient(user_id=user_id, ingredient_id=ing_id)
+            for user_id in user_ids
+            for ing_id, delta in deltas.items()
+            if delta > 0
+        ),
+        ignore_conflicts=True,
+    )
+    totals = CartIngredient.objects.filter(
+        user__in=user_ids, ingredient__in=deltas
+    )
+    totals.update(
+        amount=Greatest(
+            F("amount")
+            + Case(
+                *(
+                    When(ingredient=ing_id, then=Value(delta))
+                    for ing_id, delta in deltas.items()
+                ),
+                default=Value(0),
+            ),
+            Value(0),
+        )
+    )
+    totals.filter(amount=0).delete()
+
+
+def cart_recipes_changed(
+    user_id: int, recipe_ids: Iterable[int], added: bool
+) -> None:
+    """Учитывает добавление/удаление рецептов в корзине пользователя.
+
+    Args:
+        user_id (int): `id` владельца корзины.
+        recipe_ids (Iterable[int]): `id` добавленных/удалённых рецептов.
+        added (bool): `True` - рецепты добавлены, `False` - удалены.
+    """
+    sign = 1 if added else -1
+    change_cart_totals(
+        (user_id,),
+        {
+            ing_id: sign * amount
+            for ing_id, amount in recipe_ingredient_amounts(
+                recipe_ids
+            ).items()
+        },
+    )
+
+
+def recipe_ingredients_changed(
+    recipe: Recipe, old: dict[int, int], new: dict[int, int]
+) -> None:
+    """Учитывает изменение ингридиентов рецепта во всех корзинах с ним.
+
+    Args:
+        recipe (Recipe): Изменённый рецепт.
+        old (dict[int, int]): Ингридиенты рецепта до изменения.
+        new (dict[int, int]): Ингридиенты рецепта после изменения.
+    """
+    change_cart_totals(
+        Carts.objects.filter(recipe=recipe).values_list("user", flat=True),
+        {
+            ing_id: new.get(ing_id, 0) - old.get(ing_id, 0)
+            for ing_id in old.keys() | new.keys()
+        },
+    )
+
+
+def expected_cart_totals(
+    user_ids: Iterable[int] | None = None,
+) -> dict[tuple[int, int], int]:
+    """Считает содержимое `CartIngredient` по корзинам покупок.
+
+    Args:
+        user_ids (Iterable[int] | None):
+            `id` владельцев корзин. `None` - все пользователи.
+
+    Returns:
+        dict[tuple[int, int], int]:
+            (`id` пользователя, `id` ингридиента) -> количество.
+    """
+    carts = Carts.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user__in=user_ids)
+
+    totals = (
+        carts.values("user", "recipe__ingredient__ingredients")
+        .annotate(amount=Sum("recipe__ingredient__amount"))
+        .filter(amount__gt=0)
+        .order_by()
+    )
+    return {
+        (row["user"], row["recipe__ingredient__ingredients"]): row["amount"]
+        for row in totals.iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+    }
+
+
+def shopping_list_ingredients(user: "MyUser") -> Iterator[dict]:
+    """Читает ингридиенты из корзины пользователя.
+
+    Суммы ингридиентов хранятся в `CartIngredient`, поэтому список
+    читается по индексу без агрегации. Одноимённые ингридиенты
+    с разными единицами измерения - разные строки.
+    Строки читаются из БД порциями.
+
+    Args:
+        user (MyUser):
+            Пользователь, для которго будет создаваться список.
+
+    Returns:
+        Iterator[dict]:
+            Словари с ключами `name`, `measurement_unit`, `amount`.
+    """
     # ###########   Пример с использованием сырого SQL   ############ #
-    # ingredients = Ingredient.objects.raw('''                        #
+    # ingredients = CartIngredient.objects.raw('''                    #
     # SELECT                                                          #
-    #     ing.id,                                                     #
+    #     ci.id AS id,                                                #
     #     ing.name AS name,                                           #
-    #     ing.measurement_unit AS measurement,                        #
-    #     SUM(ai.amount) AS amount                                    #
-    # FROM recipes_ingredient AS ing                                  #
-    # JOIN recipes_amountingredient AS ai ON ai.ingredients_id=ing.id #
-    # JOIN recipes_recipe AS rcp ON ai.recipe_id=rcp.id               #
-    # JOIN recipes_carts AS crt ON crt.recipe_id=rcp.id               #
-    # WHERE crt.user_id=%s                                            #
-    # GROUP BY ing.id, ing.name;                                      #
+    #     ing.measurement_unit AS measurement_unit,                   #
+    #     ci.amount AS amount                                         #
+    # FROM recipes_cartingredient AS ci                               #
+    # JOIN recipes_ingredient AS ing ON ing.id=ci.ingredient_id       #
+    # WHERE ci.user_id=%s                                             #
+    # ORDER BY ing.name, ing.measurement_unit;                        #
     # ''', (user.id,))                                                #
-    #                                                                 #
-    # for ing in ingredients:                                         #
-    #     shopping_list.append(                                       #
-    #         f'{ing.name}: {ing.amount} {ing.measurement}'           #
-    #     )                                                           #
     ###################################################################
+    return _shopping_list_queryset(user).iterator(
+        chunk_size=SHOPPING_LIST_CHUNK_SIZE
+    )
+
+
+def _shopping_list_queryset(user: "MyUser") -> QuerySet:
+    return (
+        CartIngredient.objects.filter(user=user)
+        .annotate(
+            name=F("ingredient__name"),
+            measurement_unit=F("ingredient__measurement_unit"),
+        )
+        .values("name", "measurement_unit", "amount")
+        .order_by("name", "measurement_unit")
+    )
+
+
+def _shopping_list_txt(
+    user: "MyUser", ingredients: Iterable[dict]
+) -> Iterator[str]:
+    yield (
+        f"Список покупок для:\n\n{user.first_name}\n"
+        f"{dt.now().strftime(DATE_TIME_FORMAT)}\n\n"
+    )
+    for ing in ingredients:
+        yield f'{ing["name"]}: {ing["amount"]} {ing["measurement_unit"]}\n'
+    yield "\nПосчитано в Foodgram"
+
+
+class _Echo:
+    """Буфер для `csv.writer`, возвращающий записанную строку."""
+
+    def write(self, value: str) -> str:
+        return value
 
-    shopping_list.append("\nПосчитано в Foodgram")
-    return "\n".join(shopping_list)
+
+def _shopping_list_csv(
+    user: "MyUser", ingredients: Iterable[dict]
+) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("Ингридиент", "Количество", "Единицы измерения"))
+    for ing in ingredients:
+        yield writer.writerow(
+            (ing["name"], ing["amount"], ing["measurement_unit"])
+        )
+
+
+def _shopping_list_json(
+    user: "MyUser", ingredients: Iterable[dict]
+) -> Iterator[str]:
+    yield (
+        f'{{"user": {json.dumps(user.first_name, ensure_ascii=False)}, '
+        f'"created": "{dt.now().isoformat()}", "ingredients": ['
+    )
+    for idx, ing in enumerate(ingredients):
+        yield ", " * bool(idx) + json.dumps(ing, ensure_ascii=False)
+    yield "]}"
+
+
+def _shopping_list_pdf(
+    user: "MyUser", ingredients: Iterable[dict]
+) -> Iterator[bytes]:
+    """Формирует PDF-документ.
+
+    Формат PDF требует таблицу смещений объектов в конце файла,
+    поэтому документ собирается целиком и отдаётся одним блоком.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase.pdfmetrics import registerFont
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen.canvas import Canvas
+
+    font, font_size, margin = "Foodgram", 12, 50
+    registerFont(TTFont(font, settings.PDF_FONT_PATH))
+    buffer = BytesIO()
+    canvas = Canvas(buffer, pagesize=A4)
+    width, height = A4
+    text = "".join(_shopping_list_txt(user, ingredients))
+    y = height - margin
+    for line in text.splitlines():
+        if y < margin:
+            canvas.showPage()
+            y = height - margin
+        canvas.setFont(font, font_size)
+        canvas.drawString(margin, y, line)
+        y -= font_size * 1.5
+    canvas.save()
+    yield buffer.getvalue()
+
+
+SHOPPING_LIST_WRITERS: dict[str, Callable] = {
+    "txt": _shopping_list_txt,
+    "csv": _shopping_list_csv,
+    "json": _shopping_list_json,
+    "pdf": _shopping_list_pdf,
+}
+
+
+def create_shoping_list(
+    user: "MyUser", file_format: str = "txt"
+) -> Iterator[str | bytes]:
+    """Сфомировать список ингридкетов для покупки.
+
+    Документ формируется по частям, по мере чтения строк из БД,
+    и предназначен для отдачи через `StreamingHttpResponse`.
+
+    Args:
+        user (MyUser):
+            Пользователь, для которго будет создаваться список.
+        file_format (str):
+            Формат документа: `txt`, `csv`, `json` или `pdf`.
+
+    Returns:
+        Iterator[str | bytes]:
+            Части списка продуктов с указанием необходимого количества.
+    """
+    writer = SHOPPING_LIST_WRITERS[file_format]
+    return writer(user, shopping_list_ingredients(user))
+
+
+async def acreate_shoping_list(
+    user: "MyUser", file_format: str = "txt"
+) -> Iterator[str | bytes]:
+    """Асинхронная версия `create_shoping_list`.
+
+    Строки списка читаются из БД асинхронно и целиком: Django 4.1
+    перебирает потоковый ответ в цикле событий ASGI, где синхронные
+    запросы к БД запрещены. Документ формируется по частям из памяти.
+
+    Args:
+        user (MyUser):
+            Пользователь, для которго будет создаваться список.
+        file_format (str):
+            Формат документа: `txt`, `csv`, `json` или `pdf`.
+
+    Returns:
+        Iterator[str | bytes]:
+            Части списка продуктов с указанием необходимого количества.
+    """
+    writer = SHOPPING_LIST_WRITERS[file_format]
+    ingredients = [row async for row in _shopping_list_queryset(user)]
+    return writer(user, ingredients)
+
+
+def filter_recipes_by_tags(
+    queryset: QuerySet[Recipe], slugs: Iterable[str], all_tags: bool = False
+) -> QuerySet[Recipe]:
+    """Отбирает рецепты по тэгам полусоединением без `DISTINCT`.
+
+    Условие проверяется подзапросом к таблице связи `recipes_recipe_tags`,
+    поэтому строки рецептов не размножаются и не требуют сортировки
+    для удаления дублей.
+
+    Args:
+        queryset (QuerySet[Recipe]): Исходный набор рецептов.
+        slugs (Iterable[str]): Слаги тэгов.
+        all_tags (bool):
+            `False` - рецепты с любым из тэгов (`EXISTS`),
+            `True` - рецепты со всеми тэгами (`id IN (... HAVING COUNT)`).
+
+    Returns:
+        QuerySet[Recipe]: Отфильтрованные рецепты.
+    """
+    slugs = set(slugs)
+    links = Recipe.tags.through.objects.filter(tag__slug__in=slugs)
+    if not all_tags:
+        return queryset.filter(Exists(links.filter(recipe=OuterRef("pk"))))
+
+    return queryset.filter(
+        pk__in=links.values("recipe")
+        .annotate(tags_count=Count("tag"))
+        .filter(tags_count=len(slugs))
+        .values("recipe")
+    )
+
+
+def prefetch_author_recipes(
+    authors: Iterable["MyUser"], limit: int | None = None
+) -> None:
+    """Предзагружает последние рецепты авторов одним запросом.
+
+    Рецепты нумеруются оконной функцией
+    `ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY pub_date DESC)`
+    и отбираются первые `limit` рецептов каждого автора.
+
+    Args:
+        authors (Iterable[MyUser]): Авторы, например, страница подписок.
+        limit (int | None):
+            Сколько рецептов каждого автора загрузить. `None` - все.
+    """
+    authors = list(authors)
+    ordering = (F("pub_date").desc(), F("pk").desc())
+    recipes = Recipe.objects.filter(author__in=authors)
+    if limit is not None:
+        ranked = (
+            recipes.annotate(
+                row_number=Window(
+                    RowNumber(), partition_by=F("author"), order_by=ordering
+                )
+            )
+            .values("pk", "row_number")
+            .order_by()
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.filter(
+            pk__in=RawSQL(
+                f'SELECT "id" FROM ({sql}) AS "ranked" '
+                'WHERE "ranked"."row_number" <= %s',
+                (*params, limit),
+            )
+        )
+
+    prefetch_related_objects(
+        authors,
+        Prefetch(
+            "recipes",
+            queryset=recipes.only(
+                "id",
+                "name",
+                "image",
+                "image_variants",
+                "cooking_time",
+                "author",
+            ).order_by(*ordering),
+        ),
+    )
 
 
 def maybe_incorrect_layout(url_string: str) -> str:
@@ -1,18 +1,141 @@
-from pathlib import Path
-
-from django.db.models.signals import post_delete
+from core.cache import bump_catalog_version
+from core.images import recipe_image_names
+from core.services import (
+    change_counters,
+    recipe_ingredient_amounts,
+    recipe_ingredients_changed,
+)
+from core.storage import release_files
+from core.tokens import invalidate_tokens
+from django.contrib.auth import get_user_model
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from recipes.models import Recipe
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image(sender: Recipe, instance: Recipe, *a, **kw) -> None:
+    """Снимает ссылки на картинки при удаление рецепта.
+    Привет Андрею Пронину.
+
+    Картинку могут использовать другие рецепты, поэтому файлы без ссылок
+    удаляет `manage.py cleanup_media`.
+
+    Args:
+        sender (Recipe): Модель отправляющая сигнал.
+        instance (Recipe): Удалённый рецепт.
+    """
+    release_files(
+        recipe_image_names(instance.image.name, instance.image_variants)
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_from_carts(sender: Recipe, instance: Recipe, *a, **kw) -> None:
+    """Вычитает ингридиенты удаляемого рецепта из корзин покупок.
+
+    Args:
+        sender (Recipe): Модель отправляющая сигнал.
+        instance (Recipe): Удаляемый рецепт.
+    """
+    recipe_ingredients_changed(
+        instance, recipe_ingredient_amounts((instance.pk,)), {}
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(
+    sender: Recipe, instance: Recipe, created: bool, *a, **kw
+) -> None:
+    """Увеличивает счётчик рецептов автора.
+
+    Args:
+        sender (Recipe): Модель отправляющая сигнал.
+        instance (Recipe): Сохранённый рецепт.
+        created (bool): Рецепт создан, а не изменён.
+    """
+    if created and instance.author_id:
+        change_counters(
+            User.objects.filter(pk=instance.author_id), recipes_count=1
+        )
 
 
 @receiver(post_delete, sender=Recipe)
-def delete_image(sender: Recipe, instance: Recipe, *a, **kw) -> None:
-    """Удаляет картинку при удаление рецепта. Привет Андрею Пронину.
+def count_deleted_recipe(sender: Recipe, instance: Recipe, *a, **kw) -> None:
+    """Уменьшает счётчик рецептов автора.
 
     Args:
         sender (Recipe): Модель отправляющая сигнал.
         instance (Recipe): Удалённый рецепт.
     """
-    image = Path(instance.image.path)
-    if image.exists():
-        image.unlink()
+    if instance.author_id:
+        change_counters(
+            User.objects.filter(pk=instance.author_id), recipes_count=-1
+        )
+
+
+@receiver(pre_delete, sender=User)
+def uncount_deleted_user(sender: type[Model], instance: Model, *a, **kw):
+    """Уменьшает счётчики, в которых учтён удаляемый пользователь.
+
+    Его избранное, корзина и подписки удаляются каскадно.
+
+    Args:
+        sender (type[Model]): Модель отправляющая сигнал.
+        instance (Model): Удаляемый пользователь.
+    """
+    change_counters(
+        Recipe.objects.filter(in_favorites__user=instance), favorites_count=-1
+    )
+    change_counters(
+        Recipe.objects.filter(in_carts__user=instance), carts_count=-1
+    )
+    change_counters(
+        User.objects.filter(subscribers__user=instance), subscribers_count=-1
+    )
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_catalog(sender: type[Model], *a, **kw) -> None:
+    """Сбрасывает закэшированные ответы справочника при его изменении.
+
+    Args:
+        sender (type[Model]): Изменённая модель справочника.
+    """
+    bump_catalog_version(sender)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender: Token, instance: Token, *a, **kw):
+    """Убирает из кэша удалённый токен (выход, удаление пользователя).
+
+    Args:
+        sender (Token): Модель отправляющая сигнал.
+        instance (Token): Удалённый токен.
+    """
+    invalidate_tokens((instance.key,))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(
+    sender: type[Model], instance: Model, created: bool, *a, **kw
+) -> None:
+    """Убирает из кэша токены изменённого пользователя.
+
+    Закэшированный пользователь устаревает при любом сохранении:
+    блокировке (`is_active`), смене пароля, правке профиля.
+
+    Args:
+        sender (type[Model]): Модель отправляющая сигнал.
+        instance (Model): Сохранённый пользователь.
+        created (bool): Пользователь создан, а не изменён.
+    """
+    if not created:
+        invalidate_tokens(
+            Token.objects.filter(user=instance).values_list("key", flat=True)
+        )
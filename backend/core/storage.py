@@ -0,0 +1,136 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 содержимого
+(`recipe_images/ab/abcdef....png`), поэтому одинаковые изображения
+хранятся один раз, а имя файла никогда не меняет содержимое - nginx
+и браузеры могут кэшировать его бессрочно.
+
+Один файл могут использовать несколько рецептов, поэтому файлы
+не удаляются вместе с рецептом. Ссылки на файлы считаются в модели
+`MediaFile` (`retain_files`/`release_files`), а файлы без ссылок
+удаляет `manage.py cleanup_media` спустя `MEDIA_CLEANUP_GRACE` секунд.
+Задержка защищает файл, который только что сохранили повторно,
+но ещё не успели учесть.
+"""
+import os
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from hashlib import sha256
+from pathlib import PurePosixPath
+from tempfile import mkstemp
+
+from django.apps import apps
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Now
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """Файловое хранилище, именующее файлы по хэшу содержимого.
+
+    Каталог и расширение берутся из переданного имени, остальное
+    имя заменяется хэшем. Если такой файл уже есть, он не перезаписывается,
+    а только обновляется время его изменения.
+    """
+
+    def get_available_name(self, name: str, max_length: int = None) -> str:
+        # Окончательное имя выбирает `_save`, оно уникально по содержимому.
+        return name
+
+    @staticmethod
+    def hashed_name(name: str, content: File) -> str:
+        """Имя файла по SHA-256 содержимого.
+
+        Args:
+            name (str): Имя, предложенное полем модели.
+            content (File): Содержимое файла.
+
+        Returns:
+            str: Например, `recipe_images/ab/ab...ef.png`.
+        """
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        path = PurePosixPath(name)
+        return str(
+            path.parent / digest[:2] / f"{digest}{path.suffix.lower()}"
+        )
+
+    def _save(self, name: str, content: File) -> str:
+        name = self.hashed_name(name, content)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.utime(full_path)
+            return name
+
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if hasattr(content, "temporary_file_path"):
+            try:
+                os.replace(content.temporary_file_path(), full_path)
+            except OSError:
+                # Временный файл на другой файловой системе - копируем.
+                self._write(content, directory, full_path)
+        else:
+            self._write(content, directory, full_path)
+        os.chmod(full_path, self.file_permissions_mode or 0o644)
+        return name
+
+    @staticmethod
+    def _write(content: File, directory: str, full_path: str) -> None:
+        # Файл пишется рядом и переименовывается: пока запись не закончена,
+        # по этому имени не отдаётся недописанный файл.
+        fd, tmp_path = mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _change_refs(counts: Counter, sign: int) -> None:
+    MediaFile = apps.get_model("recipes", "MediaFile")
+    by_delta = defaultdict(list)
+    for name, count in counts.items():
+        by_delta[count * sign].append(name)
+    for delta, names in by_delta.items():
+        MediaFile.objects.filter(name__in=names).update(
+            refs=Greatest(F("refs") + delta, Value(0)), updated=Now()
+        )
+
+
+def retain_files(names: Iterable[str]) -> None:
+    """Добавляет ссылки на файлы хранилища.
+
+    Args:
+        names (Iterable[str]): Имена файлов, пустые пропускаются.
+    """
+    counts = Counter(name for name in names if name)
+    if not counts:
+        return
+
+    MediaFile = apps.get_model("recipes", "MediaFile")
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refs=0) for name in counts),
+        ignore_conflicts=True,
+    )
+    _change_refs(counts, 1)
+
+
+def release_files(names: Iterable[str]) -> None:
+    """Убирает ссылки на файлы хранилища.
+
+    Файлы без ссылок удаляет `manage.py cleanup_media`.
+
+    Args:
+        names (Iterable[str]): Имена файлов, пустые пропускаются.
+    """
+    counts = Counter(name for name in names if name)
+    if counts:
+        _change_refs(counts, -1)
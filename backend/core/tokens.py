@@ -0,0 +1,149 @@
+"""Кэш токенов авторизации: ключ токена -> токен с пользователем.
+
+Два уровня: словарь в памяти процесса (`TOKEN_LOCAL_CACHE_TIMEOUT`
+секунд) и общий кэш Django (`TOKEN_CACHE_TIMEOUT` секунд). Промахи
+не кэшируются, новый токен сразу начинает работать. Кэш Django
+в памяти процесса (`locmem`) не используется: сброс записи в нём
+не дошёл бы до других воркеров, и отозванный токен действовал бы
+в них до `TOKEN_CACHE_TIMEOUT`.
+
+Сигналы (`core.signals`) сбрасывают записи при удалении токена
+(выход, удаление пользователя) и любом сохранении пользователя
+(блокировка, смена пароля, правка профиля). В других процессах
+запись в памяти живёт до истечения своего короткого срока.
+
+Счётчики пользователя меняются `QuerySet.update()` без сигналов,
+поэтому не кэшируются: они отложены (`defer`) и при обращении
+читаются из БД, а `save()` закэшированного пользователя их не пишет.
+"""
+from copy import deepcopy
+from datetime import datetime, timedelta
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+from typing import Iterable
+
+from core.cache import cache_is_shared
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+# Поля пользователя, которые меняются без сигналов.
+DEFERRED_USER_FIELDS = ("user__recipes_count", "user__subscribers_count")
+
+# Сколько записей держит кэш процесса до очистки.
+LOCAL_CACHE_SIZE = 10_000
+
+_local: dict[str, tuple[float, Token]] = {}
+_local_lock = Lock()
+
+
+def _cache_key(key: str) -> str:
+    digest = sha256(key.encode()).hexdigest()
+    return f"auth:token:{digest}"
+
+
+def _tokens() -> QuerySet:
+    return Token.objects.select_related("user").defer(*DEFERRED_USER_FIELDS)
+
+
+def _get_local(key: str) -> Token | None:
+    entry = _local.get(key)
+    if entry is None or entry[0] < monotonic():
+        return None
+    # Каждый запрос меняет своего пользователя, а не общий экземпляр.
+    return deepcopy(entry[1])
+
+
+def _set_local(key: str, token: Token) -> None:
+    timeout = settings.TOKEN_LOCAL_CACHE_TIMEOUT
+    if not timeout:
+        return
+    with _local_lock:
+        if len(_local) >= LOCAL_CACHE_SIZE:
+            now = monotonic()
+            for stale in [k for k, (exp, _) in _local.items() if exp < now]:
+                del _local[stale]
+            if len(_local) >= LOCAL_CACHE_SIZE:
+                _local.clear()
+        _local[key] = (monotonic() + timeout, token)
+
+
+def get_token(key: str) -> Token | None:
+    """Ищет токен в кэше процесса, общем кэше и затем в БД.
+
+    Args:
+        key (str): Ключ токена из заголовка `Authorization`.
+
+    Returns:
+        Token | None: Токен с пользователем или `None`, если его нет.
+    """
+    token = _get_local(key)
+    if token is not None:
+        return token
+    shared = cache_is_shared()
+    token = cache.get(_cache_key(key)) if shared else None
+    if token is None:
+        token = _tokens().filter(key=key).first()
+        if token is None:
+            return None
+        if shared:
+            cache.set(_cache_key(key), token, settings.TOKEN_CACHE_TIMEOUT)
+    _set_local(key, token)
+    return token
+
+
+async def aget_token(key: str) -> Token | None:
+    """Асинхронный вариант `get_token`."""
+    token = _get_local(key)
+    if token is not None:
+        return token
+    shared = cache_is_shared()
+    token = await cache.aget(_cache_key(key)) if shared else None
+    if token is None:
+        token = await _tokens().filter(key=key).afirst()
+        if token is None:
+            return None
+        if shared:
+            await cache.aset(
+                _cache_key(key), token, settings.TOKEN_CACHE_TIMEOUT
+            )
+    _set_local(key, token)
+    return token
+
+
+def invalidate_tokens(keys: Iterable[str]) -> None:
+    """Удаляет токены из кэша процесса и общего кэша.
+
+    Args:
+        keys (Iterable[str]): Ключи токенов.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    with _local_lock:
+        for key in keys:
+            _local.pop(key, None)
+    if cache_is_shared():
+        cache.delete_many([_cache_key(key) for key in keys])
+
+
+def tokens_expired_before() -> datetime | None:
+    """Граница выдачи просроченных токенов.
+
+    Returns:
+        datetime | None:
+            Токены, созданные раньше, просрочены.
+            `None`, если срок жизни токенов (`TOKEN_TTL`) не ограничен.
+    """
+    if not settings.TOKEN_TTL:
+        return None
+    return timezone.now() - timedelta(seconds=settings.TOKEN_TTL)
+
+
+def token_expired(token: Token) -> bool:
+    """Проверяет, истёк ли срок жизни токена."""
+    border = tokens_expired_before()
+    return border is not None and token.created < border
@@ -22,6 +22,20 @@ ROOT_URLCONF = "foodgram.urls"
 
 WSGI_APPLICATION = "foodgram.wsgi.application"
 
+ASGI_APPLICATION = "foodgram.asgi.application"
+
+# Режим запуска сервера (`run_app.sh`): "wsgi" - воркеры gunicorn
+# с потоком на запрос, "asgi" - воркеры uvicorn с циклом событий.
+SERVER_MODE = config("SERVER_MODE", default="wsgi")
+
+# Async-представления ленты, рецепта, ингридиентов и списка покупок
+# (`api.async_views`). По умолчанию включены в режиме ASGI.
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=SERVER_MODE == "asgi", cast=bool)
+
+# Воркеры gunicorn и потоки в каждом (`run_app.sh`, для WSGI).
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=2, cast=int)
+GUNICORN_THREADS = config("GUNICORN_THREADS", default=1, cast=int)
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -29,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -40,11 +55,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.profiling.RequestProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -65,17 +82,139 @@ TEMPLATES = [
     },
 ]
 
+# Количество потоков фоновой обработки изображений рецептов
+# (`core.images`). 0 - обрабатывать синхронно после сохранения.
+IMAGE_PROCESSING_WORKERS = config(
+    "IMAGE_PROCESSING_WORKERS", default=2, cast=int
+)
+
+DB_ENGINE = config("DB_ENGINE", default="django.db.backends.postgresql")
+
+# Пул соединений в памяти процесса (`core.db_pool`), только для PostgreSQL.
+# В режиме ASGI запросы выполняются в разных потоках, и постоянные
+# соединения (`CONN_MAX_AGE`) не переиспользуются, поэтому пул включён
+# по умолчанию.
+DB_POOL = (
+    config("DB_POOL", default=SERVER_MODE == "asgi", cast=bool)
+    and DB_ENGINE == "django.db.backends.postgresql"
+)
+# В режиме ASGI число потоков не ограничено, пул ограничивает
+# одновременные обращения к БД одного воркера.
+DB_ASYNC_CONCURRENCY = config("DB_ASYNC_CONCURRENCY", default=10, cast=int)
+# Размер пула воркера: потоки запросов и фоновой обработки изображений.
+DB_POOL_SIZE = config(
+    "DB_POOL_SIZE",
+    default=IMAGE_PROCESSING_WORKERS
+    + (GUNICORN_THREADS if SERVER_MODE == "wsgi" else DB_ASYNC_CONCURRENCY),
+    cast=int,
+)
+# Лимит `max_connections` сервера за вычетом служебных соединений.
+# Проверка `core.db_pool.checks` предупреждает, если все воркеры
+# могут открыть больше соединений.
+DB_MAX_CONNECTIONS = config("DB_MAX_CONNECTIONS", default=90, cast=int)
+
 DATABASES = {
     "default": {
-        "ENGINE": config("DB_ENGINE", default="django.db.backends.postgresql"),
+        "ENGINE": "core.db_pool" if DB_POOL else DB_ENGINE,
         "NAME": config("DB_NAME", default="postgres"),
         "USER": config("POSTGRES_USER", default="postgres"),
         "PASSWORD": config("POSTGRES_PASSWORD", default="postgres"),
         "HOST": config("DB_HOST", default="127.0.0.1"),
         "PORT": config("DB_PORT", default=5432, cast=int),
+        # С пулом соединение возвращается в пул в конце каждого запроса.
+        "CONN_MAX_AGE": (
+            0
+            if DB_POOL or SERVER_MODE == "asgi"
+            else config("CONN_MAX_AGE", default=60, cast=int)
+        ),
+        "CONN_HEALTH_CHECKS": config(
+            "CONN_HEALTH_CHECKS", default=True, cast=bool
+        ),
+        "POOL": {
+            "SIZE": DB_POOL_SIZE,
+            # Секунд ожидания свободного соединения, затем ошибка БД.
+            "TIMEOUT": config("DB_POOL_TIMEOUT", default=5.0, cast=float),
+            # Простой (сек.), после которого соединение проверяется
+            # `SELECT 1` перед выдачей.
+            "CHECK_AFTER": config("DB_POOL_CHECK_AFTER", default=30, cast=int),
+        },
     }
 }
 
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": config("CACHE_LOCATION", default=BASE_DIR / "cache"),
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config(
+            "CACHE_LOCATION", default="redis://127.0.0.1:6379"
+        ),
+    },
+}
+
+CACHES = {
+    "default": CACHE_BACKENDS[config("CACHE_BACKEND", default="locmem")],
+}
+
+# Время хранения ответов справочников (тэги, ингридиенты) в секундах.
+# Актуальность поддерживается инвалидацией по сигналам, см. `core.cache`.
+CATALOG_CACHE_TIMEOUT = config(
+    "CATALOG_CACHE_TIMEOUT", default=60 * 60 * 24, cast=int
+)
+# То же для кэша в памяти процесса (`CACHE_BACKEND=locmem`): инвалидация
+# не доходит до других воркеров, ответ может устареть на это время.
+CATALOG_LOCAL_CACHE_TIMEOUT = config(
+    "CATALOG_LOCAL_CACHE_TIMEOUT", default=30, cast=int
+)
+
+# Поиск ингридиентов: "memory" - индекс в памяти процесса (`core.search`),
+# "database" - запросом к БД (в PostgreSQL - по триграммному индексу).
+INGREDIENT_SEARCH_BACKEND = config(
+    "INGREDIENT_SEARCH_BACKEND", default="memory"
+)
+
+# Загруженные файлы больше этого размера Django сразу пишет
+# во временный файл, а не держит в памяти процесса.
+FILE_UPLOAD_MAX_MEMORY_SIZE = config(
+    "FILE_UPLOAD_MAX_MEMORY_SIZE", default=256 * 1024, cast=int
+)
+
+# Время хранения количества объектов для постраничной пагинации
+# в секундах. 0 - считать `COUNT(*)` при каждом запросе.
+PAGINATION_COUNT_CACHE_TIMEOUT = config(
+    "PAGINATION_COUNT_CACHE_TIMEOUT", default=0, cast=int
+)
+
+# Доля запросов (0..1), для которых считаются запросы к БД, время БД
+# и сериализации (`core.profiling`). Время всех запросов учитывается всегда.
+# Профилирование замедляет запрос, поэтому по умолчанию - 1% запросов.
+PROFILING_SAMPLE_RATE = config(
+    "PROFILING_SAMPLE_RATE", default=0.01, cast=float
+)
+# Со скольких повторов одного запроса за HTTP-запрос он считается N+1.
+PROFILING_DUPLICATE_THRESHOLD = config(
+    "PROFILING_DUPLICATE_THRESHOLD", default=3, cast=int
+)
+
+# Токен для чтения `/metrics` (`Authorization: Bearer <токен>`).
+# Пусто - метрики доступны только сотрудникам.
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Каталог для сохранения профилей запросов `?__profile=`. Пусто - профиль
+# только возвращается в ответе.
+PROFILE_REQUESTS_DIR = config("PROFILE_REQUESTS_DIR", default="")
+
+# Шрифт с кириллицей для выгрузки списка покупок в PDF.
+PDF_FONT_PATH = config(
+    "PDF_FONT_PATH",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
 AUTH_USER_MODEL = "users.MyUser"
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -93,9 +232,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Кэш токенов авторизации (`core.tokens`), в секундах: общий кэш
+# и память процесса. Запись в памяти других процессов после выхода или
+# блокировки пользователя действует до истечения своего срока.
+# С `CACHE_BACKEND=locmem` используется только память процесса.
+TOKEN_CACHE_TIMEOUT = config("TOKEN_CACHE_TIMEOUT", default=60 * 5, cast=int)
+TOKEN_LOCAL_CACHE_TIMEOUT = config(
+    "TOKEN_LOCAL_CACHE_TIMEOUT", default=5, cast=int
+)
+# Срок жизни токена в секундах, 0 - бессрочно. Просроченные токены
+# удаляет `manage.py cleanup_tokens`, при входе выдаётся новый.
+TOKEN_TTL = config("TOKEN_TTL", default=0, cast=int)
+
+# Сколько секунд хранится ответ на запрос с заголовком `Idempotency-Key`
+# (добавление и удаление избранного, покупок, подписок).
+IDEMPOTENCY_KEY_TIMEOUT = config(
+    "IDEMPOTENCY_KEY_TIMEOUT", default=60 * 60 * 24, cast=int
+)
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -116,6 +273,7 @@ DJOSER = {
         "user_list": "api.serializers.UserSerializer",
         "current_user": "api.serializers.UserSerializer",
         "user_create": "api.serializers.UserSerializer",
+        "token_create": "api.serializers.TokenCreateSerializer",
     },
 }
 
@@ -130,6 +288,11 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / MEDIA_URL
 
+# Файлы именуются по хэшу содержимого и не дублируются (`core.storage`).
+DEFAULT_FILE_STORAGE = "core.storage.HashedFileSystemStorage"
+# Через сколько секунд `manage.py cleanup_media` удаляет файлы без ссылок.
+MEDIA_CLEANUP_GRACE = config("MEDIA_CLEANUP_GRACE", default=60 * 60, cast=int)
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 PASSWORD_RESET_TIMEOUT = 60 * 60  # 1 hour
@@ -143,8 +306,16 @@ LOGGING = {
         },
     },
     "loggers": {
+        # Текст каждого запроса к БД пишется только с `SQL_LOG_LEVEL=DEBUG`
+        # (и `DEBUG=True`), по умолчанию - только ошибки.
         "django.db.backends": {
-            "level": "DEBUG",  # if DEBUG else 'ERROR',
+            "level": config("SQL_LOG_LEVEL", default="WARNING"),
+            "handlers": [
+                "console",
+            ],
+        },
+        "core.profiling": {
+            "level": "WARNING",
             "handlers": [
                 "console",
             ],
@@ -1,7 +1,9 @@
+from core.profiling import metrics_view
 from django.contrib import admin
 from django.urls import include, path
 
 urlpatterns = (
     path("admin/", admin.site.urls),
     path("api/", include("api.urls", namespace="api")),
+    path("metrics", metrics_view, name="metrics"),
 )
@@ -1,3 +1,4 @@
+from core.services import recipe_ingredient_amounts, recipe_ingredients_changed
 from django.contrib.admin import (
     ModelAdmin,
     TabularInline,
@@ -6,6 +7,7 @@ from django.contrib.admin import (
     site,
 )
 from django.core.handlers.wsgi import WSGIRequest
+from django.forms import BaseInlineFormSet, ModelForm
 from django.utils.html import format_html
 from django.utils.safestring import SafeString, mark_safe
 from recipes.forms import TagForm
@@ -83,10 +85,24 @@ class RecipeAdmin(ModelAdmin):
 
     get_image.short_description = "Изображение"
 
-    def count_favorites(self, obj: Recipe) -> int:
-        return obj.in_favorites.count()
+    def save_related(
+        self,
+        request: WSGIRequest,
+        form: ModelForm,
+        formsets: list[BaseInlineFormSet],
+        change: bool,
+    ) -> None:
+        old_amounts = recipe_ingredient_amounts((form.instance.pk,))
+        super().save_related(request, form, formsets, change)
+        recipe_ingredients_changed(
+            form.instance,
+            old_amounts,
+            recipe_ingredient_amounts((form.instance.pk,)),
+        )
 
-    count_favorites.short_description = "В избранном"
+    @display(description="В избранном", ordering="favorites_count")
+    def count_favorites(self, obj: Recipe) -> int:
+        return obj.favorites_count
 
 
 @register(Tag)
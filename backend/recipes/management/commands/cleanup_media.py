@@ -0,0 +1,103 @@
+"""Удаление файлов изображений, на которые не ссылается ни один рецепт.
+
+Удаляются файлы с нулевым количеством ссылок в `MediaFile` и файлы
+каталога изображений, не учтённые в `MediaFile` вовсе (например,
+результат обработки, ставший ненужным). Файл не трогается, пока
+с последнего изменения не прошло `--grace` секунд
+(по умолчанию `MEDIA_CLEANUP_GRACE`).
+
+Example:
+    python manage.py cleanup_media --dry-run
+    python manage.py cleanup_media
+"""
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from itertools import islice
+from posixpath import join
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipes.models import MediaFile, Recipe
+
+# Сколько имён файлов сверяется с `MediaFile` одним запросом.
+BATCH_SIZE = 500
+
+
+def storage_files(directory: str) -> Iterator[str]:
+    """Обходит файлы каталога хранилища рекурсивно."""
+    if not default_storage.exists(directory):
+        return
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        yield join(directory, name)
+    for name in directories:
+        yield from storage_files(join(directory, name))
+
+
+class Command(BaseCommand):
+    help = "Удаляет файлы изображений без ссылок из рецептов."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=settings.MEDIA_CLEANUP_GRACE,
+            help="Не удалять файлы, изменённые менее N секунд назад.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать количество файлов для удаления.",
+        )
+
+    def handle(self, *args, grace: int, dry_run: bool, **kwargs) -> None:
+        self.cutoff = timezone.now() - timedelta(seconds=grace)
+        self.dry_run = dry_run
+
+        released = self.delete_released()
+        orphans = self.delete_orphans()
+
+        verb = "Будет удалено" if dry_run else "Удалено"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} файлов без ссылок: {released}, "
+                f"не учтённых файлов: {orphans}"
+            )
+        )
+
+    def delete_file(self, name: str) -> bool:
+        if not default_storage.exists(name):
+            return False
+        modified: datetime = default_storage.get_modified_time(name)
+        if modified >= self.cutoff:
+            return False
+        if not self.dry_run:
+            default_storage.delete(name)
+        return True
+
+    def delete_released(self) -> int:
+        unused = MediaFile.objects.filter(refs=0, updated__lt=self.cutoff)
+        deleted = 0
+        for name in list(unused.values_list("name", flat=True)):
+            # Ссылку могли добавить после выборки - удаляем условно.
+            if not self.dry_run and not unused.filter(name=name).delete()[0]:
+                continue
+            deleted += self.delete_file(name)
+        return deleted
+
+    def delete_orphans(self) -> int:
+        directory = Recipe._meta.get_field("image").upload_to
+        files = storage_files(directory)
+        deleted = 0
+        while batch := list(islice(files, BATCH_SIZE)):
+            known = set(
+                MediaFile.objects.filter(name__in=batch).values_list(
+                    "name", flat=True
+                )
+            )
+            deleted += sum(
+                self.delete_file(name) for name in batch if name not in known
+            )
+        return deleted
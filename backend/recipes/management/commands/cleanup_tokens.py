@@ -0,0 +1,49 @@
+"""Удаление токенов авторизации старше `TOKEN_TTL` секунд.
+
+Токены выбираются по индексу на дате выдачи и удаляются пачками,
+сигнал `post_delete` убирает их из кэша (`core.tokens`).
+
+Example:
+    python manage.py cleanup_tokens --dry-run
+    python manage.py cleanup_tokens
+"""
+from core.tokens import tokens_expired_before
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+# Сколько токенов удаляется одним запросом.
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Удаляет просроченные токены авторизации."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать количество токенов для удаления.",
+        )
+
+    def handle(self, *args, dry_run: bool, **kwargs) -> None:
+        expired_before = tokens_expired_before()
+        if expired_before is None:
+            self.stdout.write("Срок жизни токенов не ограничен (TOKEN_TTL).")
+            return
+
+        expired = Token.objects.filter(created__lt=expired_before)
+        if dry_run:
+            deleted = expired.count()
+        else:
+            deleted = 0
+            while keys := list(
+                expired.order_by("created").values_list("key", flat=True)[
+                    :BATCH_SIZE
+                ]
+            ):
+                deleted += Token.objects.filter(key__in=keys).delete()[0]
+
+        verb = "Будет удалено" if dry_run else "Удалено"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} просроченных токенов: {deleted}")
+        )
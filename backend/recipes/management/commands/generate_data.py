@@ -0,0 +1,346 @@
+"""Генерация синтетических данных для нагрузочного тестирования.
+
+Создаёт пользователей, тэги, ингридиенты, рецепты, избранное, корзины
+и подписки через `bulk_create`. Распределения приближены к реальным:
+рецепты пишет пятая часть пользователей, а количество рецептов
+у авторов, популярность рецептов и ингридиентов убывают по закону Ципфа.
+Количество избранного, корзин и подписок у пользователей распределено
+экспоненциально. Даты публикации рецептов - за последний год.
+
+Все рецепты используют одно изображение-заглушку. У всех пользователей
+один пароль (`--password`). Счётчики и суммы корзин пересчитываются
+командами `reconcile_counters` и `rebuild_cart_totals`.
+
+Example:
+    python manage.py generate_data --users 10000 --recipes 50000
+"""
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate, chain, islice, repeat
+from random import Random
+
+from core.cache import bump_catalog_version
+from core.images import process_recipe_image, recipe_image_names
+from core.storage import retain_files
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Model
+from django.db.transaction import atomic
+from django.utils import timezone
+from PIL import Image
+from recipes.models import (
+    AmountIngredient,
+    Carts,
+    Favorites,
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+LETTERS = str.maketrans("0123456789", "abcdefghij")
+TAGS = (
+    ("завтрак", "breakfast"),
+    ("обед", "lunch"),
+    ("ужин", "dinner"),
+    ("десерт", "dessert"),
+    ("выпечка", "bakery"),
+    ("салат", "salad"),
+    ("суп", "soup"),
+    ("напиток", "drink"),
+    ("закуска", "snack"),
+    ("постное", "lenten"),
+)
+UNITS = ("г", "кг", "мл", "л", "шт", "ст. л.", "ч. л.", "по вкусу")
+AMOUNTS = (1, 2, 3, 5, 10, 50, 100, 200, 250, 500)
+WORDS = (
+    "нарезать",
+    "смешать",
+    "обжарить",
+    "запечь",
+    "посолить",
+    "добавить",
+    "довести до кипения",
+    "остудить",
+    "подавать",
+    "с зеленью",
+)
+# Показатель степени в законе Ципфа.
+ZIPF_EXPONENT = 1.1
+# Доля пользователей, публикующих рецепты.
+AUTHORS_SHARE = 0.2
+
+
+def letters(number: int) -> str:
+    """Число буквами: имена пользователей и тэгов - только из букв."""
+    return str(number).translate(LETTERS)
+
+
+def zipf_weights(size: int) -> list[float]:
+    """Накопленные веса для `Random.choices(cum_weights=...)`."""
+    return list(
+        accumulate(1 / rank**ZIPF_EXPONENT for rank in range(1, size + 1))
+    )
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def manual_pub_date():
+    """Позволяет задать `Recipe.pub_date` при `bulk_create`."""
+    field = Recipe._meta.get_field("pub_date")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Генерирует синтетические данные для нагрузочного тестирования."
+
+    def add_arguments(self, parser) -> None:
+        for name, default, help_text in (
+            ("users", 1000, "Количество пользователей."),
+            ("recipes", 5000, "Количество рецептов."),
+            ("tags", 10, "Количество новых тэгов."),
+            ("ingredients", 2000, "Количество новых ингридиентов."),
+            ("favorites", 20, "Среднее количество избранного."),
+            ("carts", 3, "Среднее количество рецептов в корзине."),
+            ("subscriptions", 5, "Среднее количество подписок."),
+            ("batch-size", 5000, "Количество объектов в одной вставке."),
+            ("seed", 42, "Начальное значение генератора случайных чисел."),
+        ):
+            parser.add_argument(
+                f"--{name}", type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            "--password",
+            default="Pa$$w0rd_42",
+            help="Пароль всех созданных пользователей.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        self.rnd = Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        with atomic():
+            users = self.create_users(options["users"], options["password"])
+            tags = self.create_tags(options["tags"])
+            ingredients = self.create_ingredients(options["ingredients"])
+            authors = users[: max(1, int(len(users) * AUTHORS_SHARE))]
+            recipes = self.create_recipes(
+                options["recipes"], authors, tags, ingredients
+            )
+            self.attach_image(recipes)
+            for model, average in (
+                (Favorites, options["favorites"]),
+                (Carts, options["carts"]),
+            ):
+                self.create_links(model, "recipe_id", users, recipes, average)
+            self.create_links(
+                Subscriptions,
+                "author_id",
+                users,
+                authors,
+                options["subscriptions"],
+            )
+
+        bump_catalog_version(Tag)
+        bump_catalog_version(Ingredient)
+        call_command("reconcile_counters", stdout=self.stdout)
+        call_command("rebuild_cart_totals", stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Данные созданы."))
+
+    def bulk_create(self, model: type[Model], objs: Iterable[Model]) -> int:
+        count = 0
+        for batch in batched(objs, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+        self.stdout.write(f"{model._meta.verbose_name_plural}: {count}")
+        return count
+
+    def create_new(
+        self, model: type[Model], make: callable, count: int
+    ) -> list[int]:
+        """Создаёт объекты `make(номер)` и возвращает их `id`."""
+        start = model.objects.aggregate(start=Max("pk"))["start"] or 0
+        self.bulk_create(model, (make(start + idx) for idx in range(count)))
+        return list(
+            model.objects.filter(pk__gt=start)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def create_users(self, count: int, password: str) -> list[int]:
+        password = make_password(password)
+        users = self.create_new(
+            User,
+            lambda idx: User(
+                username=f"load{letters(idx)}",
+                email=f"load{idx}@foodgram.test",
+                first_name="Иван",
+                last_name="Иванов",
+                password=password,
+            ),
+            count,
+        )
+        self.rnd.shuffle(users)
+        return users
+
+    def create_tags(self, count: int) -> list[int]:
+        def make(idx: int) -> Tag:
+            name, slug = TAGS[idx % len(TAGS)]
+            if idx >= len(TAGS):
+                name, slug = f"{name}{letters(idx)}", f"{slug}{idx}"
+            return Tag(name=name, slug=slug, color=f"#{idx:06X}")
+
+        self.bulk_create(Tag, (make(idx) for idx in range(count)))
+        return list(Tag.objects.values_list("pk", flat=True))
+
+    def create_ingredients(self, count: int) -> list[int]:
+        self.bulk_create(
+            Ingredient,
+            (
+                Ingredient(
+                    name=f"ингридиент {letters(idx)}",
+                    measurement_unit=self.rnd.choice(UNITS),
+                )
+                for idx in range(count)
+            ),
+        )
+        ingredients = list(Ingredient.objects.values_list("pk", flat=True))
+        self.rnd.shuffle(ingredients)
+        return ingredients
+
+    def create_recipes(
+        self,
+        count: int,
+        authors: list[int],
+        tags: list[int],
+        ingredients: list[int],
+    ) -> list[int]:
+        now = timezone.now()
+        dates = sorted(
+            now - timedelta(days=self.rnd.uniform(0, 365))
+            for _ in range(count)
+        )
+        author_weights = zipf_weights(len(authors))
+        with manual_pub_date():
+            recipes = self.create_new(
+                Recipe,
+                lambda idx: Recipe(
+                    name=f"Рецепт {idx}",
+                    author_id=self.rnd.choices(
+                        authors, cum_weights=author_weights
+                    )[0],
+                    text=", ".join(self.rnd.sample(WORDS, 5)).capitalize(),
+                    cooking_time=min(
+                        300, max(1, int(self.rnd.lognormvariate(3.3, 0.6)))
+                    ),
+                    pub_date=dates.pop(),
+                    image="",
+                ),
+                count,
+            )
+
+        self.bulk_create(
+            Recipe.tags.through,
+            (
+                Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+                for recipe in recipes
+                for tag in self.rnd.sample(tags, min(len(tags), 3))[
+                    : self.rnd.randint(1, 3)
+                ]
+            ),
+        )
+        ingredient_weights = zipf_weights(len(ingredients))
+        self.bulk_create(
+            AmountIngredient,
+            (
+                AmountIngredient(
+                    recipe_id=recipe,
+                    ingredients_id=ingredient,
+                    amount=self.rnd.choice(AMOUNTS),
+                )
+                for recipe in recipes
+                for ingredient in set(
+                    self.rnd.choices(
+                        ingredients,
+                        cum_weights=ingredient_weights,
+                        k=self.rnd.randint(3, 12),
+                    )
+                )
+            ),
+        )
+        self.rnd.shuffle(recipes)
+        return recipes
+
+    def attach_image(self, recipes: list[int]) -> None:
+        """Назначает всем рецептам одно обработанное изображение."""
+        buffer = BytesIO()
+        Image.new("RGB", (800, 600), "#E4A11B").save(buffer, "JPEG")
+        name = default_storage.save(
+            "recipe_images/placeholder.jpg", ContentFile(buffer.getvalue())
+        )
+        generated = Recipe.objects.filter(pk__in=recipes)
+        if not recipes:
+            return
+        generated.update(image=name)
+        retain_files((name,))
+
+        process_recipe_image(recipes[0])
+        image, image_hash, variants = Recipe.objects.values_list(
+            "image", "image_hash", "image_variants"
+        ).get(pk=recipes[0])
+        generated.update(
+            image=image, image_hash=image_hash, image_variants=variants
+        )
+        names = recipe_image_names(image, variants)
+        retain_files(chain.from_iterable(repeat(names, len(recipes) - 1)))
+
+    def create_links(
+        self,
+        model: type[Model],
+        field: str,
+        users: list[int],
+        targets: list[int],
+        average: int,
+    ) -> None:
+        """Связывает пользователей с популярными объектами.
+
+        Количество связей у пользователя распределено экспоненциально
+        со средним `average`, объекты выбираются по закону Ципфа.
+        """
+        if not average or not targets:
+            return
+        weights = zipf_weights(len(targets))
+
+        def links(user: int) -> set[int]:
+            count = min(len(targets), int(self.rnd.expovariate(1 / average)))
+            chosen = set(
+                self.rnd.choices(targets, cum_weights=weights, k=count)
+            )
+            chosen.discard(user)
+            return chosen
+
+        self.bulk_create(
+            model,
+            (
+                model(user_id=user, **{field: target})
+                for user in users
+                for target in links(user)
+            ),
+        )
@@ -0,0 +1,265 @@
+"""Пакетная загрузка справочника ингридиентов из JSON или CSV.
+
+Файл читается потоково: JSON - массив объектов `{"name": ...,
+"measurement_unit": ...}` или фикстура `dumpdata`/`loaddata`
+(объекты других моделей пропускаются), CSV - строки
+`название,единица измерения` с необязательным заголовком.
+Значения проверяются и приводятся к нижнему регистру, как
+в `Ingredient.clean`. Ингридиенты, уже существующие в справочнике
+(ограничение `unique_for_ingredient`), пропускаются.
+
+В PostgreSQL пакет загружается `COPY` во временную таблицу и переносится
+одним `INSERT ... ON CONFLICT DO NOTHING`, в остальных БД -
+`bulk_create(ignore_conflicts=True)`. Загрузка выполняется в одной
+транзакции.
+
+Example:
+    python manage.py import_ingredients data/dump.json
+    python manage.py import_ingredients ingredients.csv --batch-size 20000
+"""
+import csv
+import json
+import re
+from collections.abc import Iterable, Iterator
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+from typing import Any, TextIO
+
+from core.cache import bump_catalog_version
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.transaction import atomic
+from recipes.models import Ingredient
+
+FIELDS = ("name", "measurement_unit")
+FIXTURE_MODEL = Ingredient._meta.label_lower
+# Размер блока при чтении JSON, символов.
+READ_CHUNK_SIZE = 64 * 1024
+# Сколько ошибок в строках выводится подробно.
+MAX_REPORTED_ERRORS = 10
+WHITESPACE = re.compile(r"\s*")
+# Поддерживается только PostgreSQL.
+STAGING_TABLE = "ingredient_import"
+
+
+class JsonArrayReader:
+    """Потоковое чтение элементов JSON-массива верхнего уровня.
+
+    В памяти находится только текущий блок файла и текущий элемент.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = READ_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read(self) -> None:
+        chunk = self.file.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def _next_char(self) -> str:
+        """Пропускает пробелы. Пустая строка - конец файла."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ""
+            self._read()
+
+    def _value(self) -> Any:
+        self._next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # Число на границе блока может продолжаться в следующем.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            self._read()
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._next_char() != "[":
+            raise ValueError("Ожидается JSON-массив.")
+        self.pos += 1
+        if self._next_char() == "]":
+            return
+
+        while True:
+            yield self._value()
+            char = self._next_char()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("Ожидается `,` или `]` между элементами.")
+
+
+def json_rows(file: TextIO) -> Iterator[tuple[int, Any]]:
+    """Элементы JSON-массива с порядковыми номерами.
+
+    Объекты фикстур других моделей заменяются на `None`.
+    """
+    for number, item in enumerate(JsonArrayReader(file), 1):
+        if isinstance(item, dict) and "model" in item:
+            is_ingredient = item["model"] == FIXTURE_MODEL
+            item = item.get("fields") if is_ingredient else None
+        yield number, item
+
+
+def csv_rows(file: TextIO) -> Iterator[tuple[int, Any]]:
+    """Строки CSV с номерами строк файла, заголовок пропускается."""
+    reader = csv.reader(file)
+    for row in reader:
+        if reader.line_num == 1 and [
+            value.strip().lower() for value in row
+        ] == list(FIELDS):
+            continue
+        yield reader.line_num, (
+            dict(zip(FIELDS, row)) if len(row) == len(FIELDS) else row
+        )
+
+
+READERS = {"json": json_rows, "csv": csv_rows}
+
+
+def clean_row(data: Any) -> tuple[str, str]:
+    """Проверяет и нормализует ингридиент.
+
+    Raises:
+        ValueError: Описание ошибки.
+
+    Returns:
+        tuple[str, str]: Название и единица измерения.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"ожидаются поля {', '.join(FIELDS)}")
+
+    values = []
+    for field in FIELDS:
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"`{field}` - пустое значение или не строка")
+        value = value.strip().lower()
+        max_length = Ingredient._meta.get_field(field).max_length
+        if len(value) > max_length:
+            raise ValueError(f"`{field}` длиннее {max_length} символов")
+        values.append(value)
+    return tuple(values)
+
+
+def insert_orm(rows: list[tuple[str, str]]) -> None:
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=name, measurement_unit=unit) for name, unit in rows),
+        ignore_conflicts=True,
+    )
+
+
+def insert_copy(rows: list[tuple[str, str]]) -> None:
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            "(name text, measurement_unit text) ON COMMIT DROP"
+        )
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (name, measurement_unit) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        cursor.execute(
+            f"INSERT INTO {table} (name, measurement_unit) "
+            f"SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE} "
+            "ON CONFLICT ON CONSTRAINT unique_for_ingredient DO NOTHING"
+        )
+
+
+class Command(BaseCommand):
+    help = "Загружает ингридиенты из JSON или CSV пакетами."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path", type=Path, help="Путь к файлу.")
+        parser.add_argument(
+            "--format",
+            choices=READERS,
+            help="Формат файла. По умолчанию - по расширению.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Количество строк в одной вставке.",
+        )
+        parser.add_argument(
+            "--method",
+            choices=("auto", "copy", "orm"),
+            default="auto",
+            help="`copy` - только PostgreSQL. `auto` - `copy`, если доступен.",
+        )
+
+    def handle(self, *args, path: Path, batch_size: int, **options) -> None:
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in READERS:
+            raise CommandError("Укажите формат файла: --format json|csv.")
+        insert = self.get_insert(options["method"])
+
+        self.errors = self.skipped = self.valid = 0
+        try:
+            with path.open(encoding="utf-8", newline="") as file, atomic():
+                before = Ingredient.objects.count()
+                rows = self.clean_rows(READERS[file_format](file))
+                while batch := list(islice(rows, batch_size)):
+                    insert(list(dict.fromkeys(batch)))
+                created = Ingredient.objects.count() - before
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Не удалось прочитать {path}: {error}")
+
+        bump_catalog_version(Ingredient)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Добавлено: {created}, "
+                f"повторы и существующие: {self.valid - created}, "
+                f"с ошибками: {self.errors}, других моделей: {self.skipped}"
+            )
+        )
+
+    @staticmethod
+    def get_insert(method: str):
+        is_postgresql = connection.vendor == "postgresql"
+        if method == "copy" and not is_postgresql:
+            raise CommandError("`COPY` поддерживается только в PostgreSQL.")
+        if method == "orm" or not is_postgresql:
+            return insert_orm
+        return insert_copy
+
+    def clean_rows(
+        self, rows: Iterable[tuple[int, Any]]
+    ) -> Iterator[tuple[str, str]]:
+        for number, data in rows:
+            if data is None:
+                self.skipped += 1
+                continue
+            try:
+                row = clean_row(data)
+            except ValueError as error:
+                self.errors += 1
+                if self.errors <= MAX_REPORTED_ERRORS:
+                    self.stderr.write(f"Запись {number}: {error}")
+                continue
+            self.valid += 1
+            yield row
@@ -0,0 +1,471 @@
+"""Нагрузочное тестирование API смешанным набором запросов.
+
+Запросы выбираются по весам сценариев (`SCENARIOS`) и выполняются
+в `--concurrency` потоках. Без `--url` запросы обрабатываются в этом же
+процессе тестовым клиентом Django, и для каждого запроса считается
+количество запросов к БД. С `--url` запросы отправляются по HTTP
+на работающий сервер: количество запросов к БД берётся из заголовка
+`Server-Timing` (задайте серверу `PROFILING_SAMPLE_RATE=1`), а токены
+пользователей - из той же БД, что указана в настройках. SQLite
+не выдерживает параллельных записей (`database is locked`), замеры
+проводите на PostgreSQL.
+
+Отчёт - задержки p50/p95/p99 и среднее количество запросов к БД
+по сценариям, коды ответов и общая пропускная способность.
+Для данных используйте `manage.py generate_data`.
+
+Example:
+    python manage.py loadtest --requests 2000 --concurrency 8
+    python manage.py loadtest --url http://localhost:8000 --json report.json
+"""
+import json
+import re
+import statistics
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from random import Random
+from threading import local
+from time import perf_counter
+from typing import NamedTuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from recipes.models import Carts, Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+# Сколько пользователей получают токены для авторизованных запросов.
+USERS_SAMPLE = 100
+# Сколько рецептов участвует в запросах к отдельным рецептам.
+RECIPES_SAMPLE = 1000
+PERCENTILES = (50, 95, 99)
+# Количество запросов к БД в заголовке `Server-Timing` (`core.profiling`).
+SERVER_QUERIES = re.compile(r'\bdb;[^,]*desc="(\d+) queries"')
+# Размер страницы, который запрашивает фронтенд.
+LIMIT = 6
+
+
+class Step(NamedTuple):
+    scenario: str
+    method: str
+    path: str
+    token: str | None
+
+
+class Scenario(NamedTuple):
+    """Сценарий нагрузки.
+
+    Attributes:
+        weight (int): Относительная частота сценария.
+        auth (bool): Запросы от авторизованного пользователя.
+        paths (Callable): `(Random, данные) -> [(метод, путь), ...]`.
+    """
+
+    weight: int
+    auth: bool
+    paths: Callable[[Random, dict], list[tuple[str, str]]]
+
+
+def _get(path: str) -> list[tuple[str, str]]:
+    return [("GET", path)]
+
+
+def _toggle(path: str) -> list[tuple[str, str]]:
+    return [("POST", path), ("DELETE", path)]
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "recipes": Scenario(
+        25,
+        False,
+        lambda rnd, data: _get(
+            f"/api/recipes/?page={rnd.randint(1, 5)}&limit={LIMIT}"
+        ),
+    ),
+    "recipes_auth": Scenario(
+        15,
+        True,
+        lambda rnd, data: _get(
+            f"/api/recipes/?page={rnd.randint(1, 3)}&limit={LIMIT}"
+        ),
+    ),
+    "recipes_tags": Scenario(
+        10,
+        False,
+        lambda rnd, data: _get(
+            f"/api/recipes/?limit={LIMIT}&"
+            + "&".join(
+                f"tags={slug}"
+                for slug in rnd.sample(data["tags"], min(2, len(data["tags"])))
+            )
+        ),
+    ),
+    "recipes_cursor": Scenario(
+        5,
+        False,
+        lambda rnd, data: _get(f"/api/recipes/?cursor=&limit={LIMIT}"),
+    ),
+    "recipe": Scenario(
+        15,
+        False,
+        lambda rnd, data: _get(f"/api/recipes/{rnd.choice(data['recipes'])}/"),
+    ),
+    "ingredients": Scenario(
+        10,
+        False,
+        lambda rnd, data: _get(
+            f"/api/ingredients/?name={rnd.choice(data['prefixes'])}"
+        ),
+    ),
+    "tags": Scenario(5, False, lambda rnd, data: _get("/api/tags/")),
+    "subscriptions": Scenario(
+        5,
+        True,
+        lambda rnd, data: _get(
+            f"/api/users/subscriptions/?limit={LIMIT}&recipes_limit=3"
+        ),
+    ),
+    "shopping_cart": Scenario(
+        3,
+        True,
+        lambda rnd, data: _get("/api/recipes/download_shopping_cart/"),
+    ),
+    "favorite": Scenario(
+        7,
+        True,
+        # Добавление и удаление - состояние БД не меняется. Если рецепт
+        # уже в избранном, добавление вернёт 400 и удаления не будет.
+        lambda rnd, data: _toggle(
+            f"/api/recipes/{rnd.choice(data['recipes'])}/favorite/"
+        ),
+    ),
+}
+
+
+def percentile_report(values: list[float]) -> dict[str, float]:
+    """Перцентили `PERCENTILES` значений в миллисекундах."""
+    if len(values) < 2:
+        values = values * 2 or [0.0, 0.0]
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {f"p{p}": round(cuts[p - 1] * 1000, 2) for p in PERCENTILES}
+
+
+class QueryCounter:
+    """Обёртка `connection.execute_wrapper`, считающая запросы к БД."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class LocalTransport:
+    """Запросы через тестовый клиент Django в текущем процессе."""
+
+    def __init__(self) -> None:
+        self.local = local()
+
+    def __call__(self, step: Step) -> tuple[int, int | None]:
+        if not hasattr(self.local, "client"):
+            self.local.client = Client(raise_request_exception=False)
+        headers = {}
+        if step.token:
+            headers["HTTP_AUTHORIZATION"] = f"Token {step.token}"
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.local.client.generic(
+                step.method, step.path, **headers
+            )
+            # Потоковые ответы формируются при чтении.
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response.status_code, counter.count
+
+    @staticmethod
+    def close() -> None:
+        connections.close_all()
+
+
+class HttpTransport:
+    """Запросы по HTTP к работающему серверу."""
+
+    def __init__(self, url: str, timeout: float) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def __call__(self, step: Step) -> tuple[int, int | None]:
+        request = Request(self.url + step.path, method=step.method)
+        if step.token:
+            request.add_header("Authorization", f"Token {step.token}")
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status, self.queries(response)
+        except HTTPError as error:
+            error.read()
+            return error.code, self.queries(error)
+
+    @staticmethod
+    def queries(response) -> int | None:
+        """Запросы к БД по заголовку `Server-Timing`, если он есть."""
+        match = SERVER_QUERIES.search(
+            response.headers.get("Server-Timing", "")
+        )
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def close() -> None:
+        pass
+
+
+class Command(BaseCommand):
+    help = "Нагрузочное тестирование API."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Количество сценариев в замере.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=50,
+            help="Количество сценариев для прогрева, не входят в отчёт.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Количество параллельных потоков.",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=SCENARIOS,
+            help="Выполнять только указанные сценарии.",
+        )
+        parser.add_argument(
+            "--url",
+            help="Адрес сервера. По умолчанию - запросы внутри процесса.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30,
+            help="Таймаут HTTP-запроса, секунд.",
+        )
+        parser.add_argument(
+            "--json",
+            help="Сохранить отчёт в JSON-файл (`-` - вывести).",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options) -> None:
+        rnd = Random(options["seed"])
+        data = self.load_data(rnd)
+        names = options["scenario"] or list(SCENARIOS)
+        if not data["tokens"]:
+            names = [name for name in names if not SCENARIOS[name].auth]
+        if not names:
+            raise CommandError("Нет пользователей для выбранных сценариев.")
+
+        transport = (
+            HttpTransport(options["url"], options["timeout"])
+            if options["url"]
+            else LocalTransport()
+        )
+        concurrency = max(1, options["concurrency"])
+        self.run(
+            transport,
+            self.plan(rnd, data, names, options["warmup"]),
+            concurrency,
+        )
+        results, duration = self.run(
+            transport,
+            self.plan(rnd, data, names, options["requests"]),
+            concurrency,
+        )
+
+        report = self.make_report(results, duration)
+        self.print_report(report)
+        if options["json"] == "-":
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        elif options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def load_data(rnd: Random) -> dict:
+        """Выбирает объекты для запросов и токены пользователей.
+
+        Половина пользователей - с непустой корзиной покупок,
+        чтобы выгрузка списка покупок не сводилась к ответу 400.
+        """
+        recipes = list(
+            Recipe.objects.order_by("-favorites_count").values_list(
+                "pk", flat=True
+            )[:RECIPES_SAMPLE]
+        )
+        if not recipes:
+            raise CommandError(
+                "Нет рецептов. Создайте данные: manage.py generate_data."
+            )
+        with_cart = list(
+            Carts.objects.values_list("user_id", flat=True)
+            .distinct()
+            .order_by("user_id")[: USERS_SAMPLE // 2]
+        )
+        others = list(
+            User.objects.exclude(pk__in=with_cart)
+            .order_by("?")
+            .values_list("pk", flat=True)[: USERS_SAMPLE - len(with_cart)]
+        )
+        tokens = [
+            Token.objects.get_or_create(user_id=user_id)[0].key
+            for user_id in with_cart + others
+        ]
+        names = Ingredient.objects.values_list("name", flat=True)[:500]
+        return {
+            "recipes": recipes,
+            "tags": list(Tag.objects.values_list("slug", flat=True)),
+            "prefixes": sorted({name[:3] for name in names}) or ["а"],
+            "tokens": tokens,
+        }
+
+    @staticmethod
+    def plan(
+        rnd: Random, data: dict, names: list[str], count: int
+    ) -> list[list[Step]]:
+        """Выбирает `count` сценариев по весам.
+
+        Returns:
+            list[list[Step]]: Запросы каждого сценария.
+        """
+        weights = [SCENARIOS[name].weight for name in names]
+        plan = []
+        for name in rnd.choices(names, weights, k=count):
+            scenario = SCENARIOS[name]
+            token = rnd.choice(data["tokens"]) if scenario.auth else None
+            plan.append(
+                [
+                    Step(name, method, path, token)
+                    for method, path in scenario.paths(rnd, data)
+                ]
+            )
+        return plan
+
+    @staticmethod
+    def run(
+        transport: LocalTransport | HttpTransport,
+        plan: list[list[Step]],
+        concurrency: int,
+    ) -> tuple[list[tuple], float]:
+        """Выполняет сценарии в `concurrency` потоках.
+
+        Запросы одного сценария (например, добавление и удаление
+        из избранного) выполняются одним потоком по порядку, после
+        ответа с ошибкой остальные запросы сценария пропускаются.
+
+        Returns:
+            tuple[list[tuple], float]: Результаты
+            `(шаг, код ответа, секунд, запросов к БД)` и общее время.
+        """
+
+        def worker(part: list[list[Step]]) -> list[tuple]:
+            results = []
+            try:
+                for steps in part:
+                    for step in steps:
+                        started = perf_counter()
+                        try:
+                            status, queries = transport(step)
+                        except OSError:
+                            status, queries = 0, None
+                        results.append(
+                            (step, status, perf_counter() - started, queries)
+                        )
+                        if not 200 <= status < 300:
+                            break
+            finally:
+                if concurrency > 1:
+                    transport.close()
+            return results
+
+        started = perf_counter()
+        if concurrency == 1:
+            # В текущем потоке видны данные незафиксированной транзакции.
+            results = worker(plan)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                parts = (plan[idx::concurrency] for idx in range(concurrency))
+                results = list(
+                    chain.from_iterable(executor.map(worker, parts))
+                )
+        return results, perf_counter() - started
+
+    @staticmethod
+    def make_report(results: list[tuple], duration: float) -> dict:
+        by_scenario = defaultdict(list)
+        for result in results:
+            by_scenario[result[0].scenario].append(result)
+
+        scenarios = {}
+        for name, items in sorted(by_scenario.items()):
+            latencies = [latency for _, _, latency, _ in items]
+            queries = [count for *_, count in items if count is not None]
+            scenarios[name] = {
+                "requests": len(items),
+                "errors": sum(
+                    not status or status >= 500 for _, status, *_ in items
+                ),
+                "statuses": dict(Counter(status for _, status, *_ in items)),
+                **percentile_report(latencies),
+                "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+                "queries": (
+                    round(statistics.fmean(queries), 2) if queries else None
+                ),
+            }
+
+        latencies = [latency for _, _, latency, _ in results]
+        return {
+            "requests": len(results),
+            "errors": sum(item["errors"] for item in scenarios.values()),
+            "duration_s": round(duration, 3),
+            "rps": round(len(results) / duration, 1) if duration else None,
+            **percentile_report(latencies),
+            "scenarios": scenarios,
+        }
+
+    def print_report(self, report: dict) -> None:
+        header = (
+            f"{'сценарий':<16}{'запросов':>9}{'ошибок':>8}"
+            f"{'p50':>9}{'p95':>9}{'p99':>9}{'SQL':>7}"
+        )
+        self.stdout.write(header)
+        for name, item in report["scenarios"].items():
+            queries = "-" if item["queries"] is None else item["queries"]
+            self.stdout.write(
+                f"{name:<16}{item['requests']:>9}{item['errors']:>8}"
+                f"{item['p50']:>9}{item['p95']:>9}{item['p99']:>9}"
+                f"{queries:>7}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Всего: {report['requests']} запросов "
+                f"за {report['duration_s']} с ({report['rps']} в секунду), "
+                f"ошибок: {report['errors']}, p50/p95/p99: "
+                f"{report['p50']}/{report['p95']}/{report['p99']} мс."
+            )
+        )
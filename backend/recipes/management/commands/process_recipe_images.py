@@ -0,0 +1,33 @@
+"""Обработка изображений рецептов, не обработанных в фоне.
+
+Например, если процесс приложения остановился раньше, чем пул потоков
+обработал очередь, или после загрузки рецептов из дампа.
+
+Example:
+    python manage.py process_recipe_images
+"""
+from core.images import process_recipe_image
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Обрабатывает изображения рецептов без хэша или вариантов."
+
+    def handle(self, *args, **kwargs) -> None:
+        recipe_ids = Recipe.objects.filter(
+            Q(image_hash="") | Q(image_variants={})
+        ).values_list("pk", flat=True)
+        processed = 0
+        for recipe_id in list(recipe_ids):
+            try:
+                process_recipe_image(recipe_id)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f"Рецепт {recipe_id}: {error}")
+                continue
+            processed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Обработано изображений: {processed}")
+        )
@@ -0,0 +1,71 @@
+"""Сверка и пересчёт сумм ингридиентов в корзинах покупок.
+
+Example:
+    python manage.py rebuild_cart_totals --check
+    python manage.py rebuild_cart_totals --user 1 --user 2
+"""
+from core.services import expected_cart_totals
+from django.core.management.base import BaseCommand, CommandError
+from django.db.transaction import atomic
+from recipes.models import CartIngredient
+
+
+class Command(BaseCommand):
+    help = "Сверяет и пересчитывает таблицу `CartIngredient` по корзинам."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сверить, завершиться с ошибкой при расхождениях.",
+        )
+        parser.add_argument(
+            "--user",
+            action="append",
+            type=int,
+            dest="user_ids",
+            help="`id` пользователя. По умолчанию - все пользователи.",
+        )
+
+    def handle(self, *args, check: bool, user_ids: list[int] | None, **kw):
+        with atomic():
+            stored = CartIngredient.objects.select_for_update()
+            if user_ids is not None:
+                stored = stored.filter(user__in=user_ids)
+
+            actual = {
+                (row.user_id, row.ingredient_id): row
+                for row in stored.iterator()
+            }
+            expected = expected_cart_totals(user_ids)
+
+            stale = [
+                row.pk for key, row in actual.items() if key not in expected
+            ]
+            changed = []
+            missing = []
+            for (user_id, ing_id), amount in expected.items():
+                row = actual.get((user_id, ing_id))
+                if row is None:
+                    row = CartIngredient(user_id=user_id, ingredient_id=ing_id)
+                    missing.append(row)
+                elif row.amount != amount:
+                    changed.append(row)
+                row.amount = amount
+
+            drift = len(stale) + len(changed) + len(missing)
+            if check:
+                if drift:
+                    raise CommandError(f"Расхождений: {drift}")
+                self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+                return
+
+            CartIngredient.objects.filter(pk__in=stale).delete()
+            CartIngredient.objects.bulk_update(
+                changed, ("amount",), batch_size=1000
+            )
+            CartIngredient.objects.bulk_create(missing, batch_size=1000)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Исправлено расхождений: {drift}")
+        )
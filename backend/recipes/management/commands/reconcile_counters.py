@@ -0,0 +1,78 @@
+"""Сверка и исправление денормализованных счётчиков.
+
+Example:
+    python manage.py reconcile_counters --check
+    python manage.py reconcile_counters
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, Model, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.transaction import atomic
+from recipes.models import Carts, Favorites, Recipe
+from users.models import Subscriptions
+
+User = get_user_model()
+
+# (модель, поле счётчика, связанная модель, поле связи с моделью)
+COUNTERS: tuple[tuple[type[Model], str, type[Model], str], ...] = (
+    (Recipe, "favorites_count", Favorites, "recipe"),
+    (Recipe, "carts_count", Carts, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "subscribers_count", Subscriptions, "author"),
+)
+
+
+def actual_count(link_model: type[Model], fk: str) -> Coalesce:
+    """Подзапрос, считающий связанные объекты."""
+    return Coalesce(
+        Subquery(
+            link_model.objects.filter(**{fk: OuterRef("pk")})
+            .order_by()
+            .values(fk)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Сверяет и исправляет счётчики рецептов и пользователей."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сверить, завершиться с ошибкой при расхождениях.",
+        )
+
+    def handle(self, *args, check: bool, **kwargs) -> None:
+        drift = 0
+        for model, field, link_model, fk in COUNTERS:
+            with atomic():
+                wrong = (
+                    model.objects.select_for_update()
+                    .annotate(actual=actual_count(link_model, fk))
+                    .exclude(**{field: F("actual")})
+                    .values_list("pk", flat=True)
+                )
+                wrong_ids = list(wrong)
+                if wrong_ids and not check:
+                    model.objects.filter(pk__in=wrong_ids).update(
+                        **{field: actual_count(link_model, fk)}
+                    )
+
+            drift += len(wrong_ids)
+            self.stdout.write(
+                f"{model._meta.model_name}.{field}: {len(wrong_ids)}"
+            )
+
+        if check and drift:
+            raise CommandError(f"Расхождений: {drift}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Исправлено расхождений: {drift}")
+            if drift
+            else self.style.SUCCESS("Расхождений нет.")
+        )
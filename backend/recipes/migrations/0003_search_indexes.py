@@ -0,0 +1,53 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:51
+
+import core.indexes
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from core.operations import PostgresAddIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0002_initial"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        PostgresAddIndex(
+            model_name="ingredient",
+            index=core.indexes.PostgresGinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"),
+                    name="gin_trgm_ops",
+                ),
+                name="recipes_ingredient_name_trgm",
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="recipe",
+            index=core.indexes.PostgresGinIndex(
+                fields=["name"],
+                name="recipes_recipe_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="recipe",
+            index=core.indexes.PostgresGinIndex(
+                django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.SearchVector(
+                        "text", config="russian"
+                    ),
+                    "||",
+                    django.contrib.postgres.search.SearchVector(
+                        "text", config="english"
+                    ),
+                    django.contrib.postgres.search.SearchConfig("russian"),
+                ),
+                name="recipes_recipe_text_search",
+            ),
+        ),
+    ]
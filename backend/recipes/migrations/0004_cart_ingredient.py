@@ -0,0 +1,88 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_cart_ingredients(apps, schema_editor):
+    Carts = apps.get_model("recipes", "Carts")
+    CartIngredient = apps.get_model("recipes", "CartIngredient")
+    totals = (
+        Carts.objects.values("user", "recipe__ingredient__ingredients")
+        .annotate(amount=models.Sum("recipe__ingredient__amount"))
+        .filter(amount__gt=0)
+        .order_by()
+    )
+    CartIngredient.objects.bulk_create(
+        (
+            CartIngredient(
+                user_id=row["user"],
+                ingredient_id=row["recipe__ingredient__ingredients"],
+                amount=row["amount"],
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0003_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartIngredient",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество"
+                    ),
+                ),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="in_carts",
+                        to="recipes.ingredient",
+                        verbose_name="Ингридиент",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart_ingredients",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец списка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ингридиент в списке покупок",
+                "verbose_name_plural": "Ингридиенты в списке покупок",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cartingredient",
+            constraint=models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="\nrecipes_cartingredient ingredient is cart alredy\n",
+            ),
+        ),
+        migrations.RunPython(fill_cart_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count(model, fk):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{fk: models.OuterRef("pk")})
+            .order_by()
+            .values(fk)
+            .annotate(total=models.Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Favorites = apps.get_model("recipes", "Favorites")
+    Carts = apps.get_model("recipes", "Carts")
+    MyUser = apps.get_model("users", "MyUser")
+    Subscriptions = apps.get_model("users", "Subscriptions")
+
+    Recipe.objects.update(
+        favorites_count=count(Favorites, "recipe"),
+        carts_count=count(Carts, "recipe"),
+    )
+    MyUser.objects.update(
+        recipes_count=count(Recipe, "author"),
+        subscribers_count=count(Subscriptions, "author"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_cart_ingredient"),
+        ("users", "0002_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="carts_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В списках покупок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В избранном"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["pub_date", "id"], name="recipes_recipe_feed"
+            ),
+        ),
+    ]
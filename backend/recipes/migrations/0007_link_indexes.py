@@ -0,0 +1,52 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_recipe_feed_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="carts",
+            index=models.Index(
+                fields=["user", "recipe"], name="recipes_carts_user_recipe"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="carts",
+            index=models.Index(
+                fields=["user", "-date_added"], name="recipes_carts_user_date"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="favorites",
+            index=models.Index(
+                fields=["user", "recipe"], name="recipes_favorites_user_recipe"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="favorites",
+            index=models.Index(
+                fields=["user", "-date_added"],
+                name="recipes_favorites_user_date",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["author", "-pub_date"],
+                name="recipes_recipe_author_pub_date",
+            ),
+        ),
+        # Таблица связи M2M создаётся Django, поэтому индекс - через SQL.
+        # `(tag_id, recipe_id)` покрывает выбор рецептов по тэгам.
+        migrations.RunSQL(
+            'CREATE INDEX "recipes_recipe_tags_tag_recipe" '
+            'ON "recipes_recipe_tags" ("tag_id", "recipe_id");',
+            'DROP INDEX "recipes_recipe_tags_tag_recipe";',
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:21
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def fill_media_files(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    MediaFile = apps.get_model("recipes", "MediaFile")
+    refs = Counter()
+    for image, variants in Recipe.objects.values_list(
+        "image", "image_variants"
+    ).iterator():
+        if image:
+            refs[image] += 1
+        refs.update(variant["name"] for variant in variants.values())
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refs=count) for name, count in refs.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0009_recipe_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaFile",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Имя файла",
+                    ),
+                ),
+                (
+                    "refs",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество ссылок"
+                    ),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Изменён"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Медиафайл",
+                "verbose_name_plural": "Медиафайлы",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="mediafile",
+            index=models.Index(
+                condition=models.Q(("refs", 0)),
+                fields=["updated"],
+                name="recipes_mediafile_unused",
+            ),
+        ),
+        migrations.RunPython(fill_media_files, migrations.RunPython.noop),
+    ]
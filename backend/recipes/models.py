@@ -16,10 +16,20 @@ Models:
         Указывает избранные пользователем рецепты.
     Cart:
         Рецепты в корзине покупок пользователя.
+    CartIngredient:
+        Суммарное количество ингридиентов в корзине покупок пользователя.
+    MediaFile:
+        Количество ссылок рецептов на файл в хранилище.
 """
-from core.enums import Limits, Tuples
+from core.counters import CountersModelMixin
+from core.enums import Limits
+from core.images import file_hash, image_queue, recipe_image_names
+from core.indexes import PostgresGinIndex
+from core.storage import release_files, retain_files
 from core.validators import OneOfTwoValidator, hex_color_validator
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import OpClass
+from django.contrib.postgres.search import SearchVector
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db.models import (
     CASCADE,
@@ -29,20 +39,28 @@ from django.db.models import (
     DateTimeField,
     ForeignKey,
     ImageField,
+    Index,
+    JSONField,
     ManyToManyField,
     Model,
+    PositiveIntegerField,
     PositiveSmallIntegerField,
     Q,
     TextField,
     UniqueConstraint,
 )
-from django.db.models.functions import Length
-from PIL import Image
+from django.db.models.functions import Length, Upper
 
 CharField.register_lookup(Length)
 
 User = get_user_model()
 
+# Поисковый вектор описания рецепта. Используется и в индексе,
+# и в запросах, чтобы PostgreSQL мог применить индекс.
+RECIPE_TEXT_VECTOR = SearchVector("text", config="russian") + SearchVector(
+    "text", config="english"
+)
+
 
 class Tag(Model):
     """Тэги для рецептов.
@@ -125,6 +143,13 @@ class Ingredient(Model):
         verbose_name = "Ингридиент"
         verbose_name_plural = "Ингридиенты"
         ordering = ("name",)
+        indexes = (
+            # Django строит `icontains` как `UPPER(name) LIKE UPPER(...)`.
+            PostgresGinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="recipes_ingredient_name_trgm",
+            ),
+        )
         constraints = (
             UniqueConstraint(
                 fields=("name", "measurement_unit"),
@@ -149,7 +174,7 @@ class Ingredient(Model):
         super().clean()
 
 
-class Recipe(Model):
+class Recipe(CountersModelMixin, Model):
     """Модель для рецептов.
 
     Основная модель приложения описывающая рецепты.
@@ -174,13 +199,24 @@ class Recipe(Model):
             Дата добавления рецепта. Прописывается автоматически.
         image(str):
             Изображение рецепта. Указывает путь к изображению.
+        image_hash(str):
+            SHA-256 обработанного изображения. Пустой, пока изображение
+            не обработано (см. `core.images`).
+        image_variants(dict):
+            WebP-копии изображения разной ширины для `srcset`.
         text(str):
             Описание рецепта. Установлены ограничения по длине.
         cooking_time(int):
             Время приготовления рецепта.
             Установлены ограничения по максимальным и минимальным значениям.
+        favorites_count(int):
+            Сколько пользователей добавили рецепт в `избранное`.
+        carts_count(int):
+            Сколько пользователей добавили рецепт в `покупки`.
     """
 
+    counter_fields = ("favorites_count", "carts_count")
+
     name = CharField(
         verbose_name="Название блюда",
         max_length=Limits.MAX_LEN_RECIPES_CHARFIELD.value,
@@ -212,6 +248,18 @@ class Recipe(Model):
         verbose_name="Изображение блюда",
         upload_to="recipe_images/",
     )
+    image_hash = CharField(
+        verbose_name="Хэш изображения",
+        max_length=64,
+        blank=True,
+        editable=False,
+    )
+    image_variants = JSONField(
+        verbose_name="Варианты изображения",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = TextField(
         verbose_name="Описание блюда",
         max_length=Limits.MAX_LEN_RECIPES_TEXTFIELD.value,
@@ -230,11 +278,38 @@ class Recipe(Model):
             ),
         ),
     )
+    favorites_count = PositiveIntegerField(
+        verbose_name="В избранном",
+        default=0,
+        editable=False,
+    )
+    carts_count = PositiveIntegerField(
+        verbose_name="В списках покупок",
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ("-pub_date",)
+        indexes = (
+            PostgresGinIndex(
+                fields=("name",),
+                opclasses=("gin_trgm_ops",),
+                name="recipes_recipe_name_trgm",
+            ),
+            PostgresGinIndex(
+                RECIPE_TEXT_VECTOR, name="recipes_recipe_text_search"
+            ),
+            # Лента и keyset-пагинация по `(pub_date, id)`.
+            Index(fields=("pub_date", "id"), name="recipes_recipe_feed"),
+            # Рецепты автора: `?author=`, профиль, подписки.
+            Index(
+                fields=("author", "-pub_date"),
+                name="recipes_recipe_author_pub_date",
+            ),
+        )
         constraints = (
             UniqueConstraint(
                 fields=("name", "author"),
@@ -254,10 +329,38 @@ class Recipe(Model):
         return super().clean()
 
     def save(self, *args, **kwargs) -> None:
+        """Сохраняет рецепт.
+
+        Новое изображение обрабатывается в фоне после фиксации транзакции,
+        до этого отдаётся оригинал. Загруженный файл закрывается сразу:
+        временный файл уже перенесён в хранилище. Ссылки переносятся
+        со старого изображения и его вариантов на новое. Повторно
+        загруженное текущее изображение (тот же `image_hash`) не
+        сохраняется и не обрабатывается.
+        """
+        if not self.image or self.image._committed:
+            return super().save(*args, **kwargs)
+
+        upload = self.image.file
+        old = (
+            Recipe.objects.filter(pk=self.pk)
+            .values_list("image", "image_hash", "image_variants")
+            .first()
+        )
+        if old is not None and old[1] == file_hash(upload):
+            upload.close()
+            self.image, self.image_hash, self.image_variants = old
+            return super().save(*args, **kwargs)
+
+        self.image_hash = ""
+        self.image_variants = {}
         super().save(*args, **kwargs)
-        image = Image.open(self.image.path)
-        image.thumbnail(Tuples.RECIPE_IMAGE_SIZE)
-        image.save(self.image.path)
+        upload.close()
+
+        retain_files((self.image.name,))
+        if old is not None:
+            release_files(recipe_image_names(old[0], old[2]))
+        image_queue.schedule(self.pk)
 
 
 class AmountIngredient(Model):
@@ -353,6 +456,18 @@ class Favorites(Model):
     class Meta:
         verbose_name = "Избранный рецепт"
         verbose_name_plural = "Избранные рецепты"
+        # Уникальное ограничение начинается с `recipe`, а запросы
+        # по пользователю (избранное, корзина) начинаются с `user`.
+        indexes = (
+            Index(
+                fields=("user", "recipe"),
+                name="recipes_favorites_user_recipe",
+            ),
+            Index(
+                fields=("user", "-date_added"),
+                name="recipes_favorites_user_date",
+            ),
+        )
         constraints = (
             UniqueConstraint(
                 fields=(
@@ -400,6 +515,18 @@ class Carts(Model):
     class Meta:
         verbose_name = "Рецепт в списке покупок"
         verbose_name_plural = "Рецепты в списке покупок"
+        # Уникальное ограничение начинается с `recipe`, а запросы
+        # по пользователю (избранное, корзина) начинаются с `user`.
+        indexes = (
+            Index(
+                fields=("user", "recipe"),
+                name="recipes_carts_user_recipe",
+            ),
+            Index(
+                fields=("user", "-date_added"),
+                name="recipes_carts_user_date",
+            ),
+        )
         constraints = (
             UniqueConstraint(
                 fields=(
@@ -412,3 +539,100 @@ class Carts(Model):
 
     def __str__(self) -> str:
         return f"{self.user} -> {self.recipe}"
+
+
+class CartIngredient(Model):
+    """Ингридиенты в корзине покупок.
+
+    Денормализованная сумма ингридиентов всех рецептов из корзины
+    пользователя. Обновляется при добавлении/удалении рецепта в корзину
+    и при изменении ингридиентов рецепта (см. `core.services`),
+    поэтому список покупок читается без агрегации.
+    Сверить и пересчитать: `manage.py rebuild_cart_totals`.
+
+    Attributes:
+        user(int):
+            Владелец корзины. Связь через ForeignKey.
+        ingredient(int):
+            Ингридиент. Связь через ForeignKey.
+        amount(int):
+            Суммарное количество ингридиента.
+    """
+
+    user = ForeignKey(
+        verbose_name="Владелец списка",
+        related_name="cart_ingredients",
+        to=User,
+        on_delete=CASCADE,
+    )
+    ingredient = ForeignKey(
+        verbose_name="Ингридиент",
+        related_name="in_carts",
+        to=Ingredient,
+        on_delete=CASCADE,
+    )
+    amount = PositiveIntegerField(
+        verbose_name="Количество",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "Ингридиент в списке покупок"
+        verbose_name_plural = "Ингридиенты в списке покупок"
+        constraints = (
+            UniqueConstraint(
+                fields=(
+                    "user",
+                    "ingredient",
+                ),
+                name="\n%(app_label)s_%(class)s ingredient is cart alredy\n",
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.user} -> {self.amount} {self.ingredient}"
+
+
+class MediaFile(Model):
+    """Файл в хранилище с адресацией по содержимому.
+
+    Один файл может быть изображением или вариантом изображения
+    нескольких рецептов. Ссылки меняются функциями `core.storage`,
+    файлы без ссылок удаляет `manage.py cleanup_media`.
+
+    Attributes:
+        name(str):
+            Имя файла в хранилище.
+        refs(int):
+            Количество ссылок рецептов на файл.
+        updated(datetime):
+            Время последнего изменения количества ссылок.
+    """
+
+    name = CharField(
+        verbose_name="Имя файла",
+        max_length=255,
+        primary_key=True,
+    )
+    refs = PositiveIntegerField(
+        verbose_name="Количество ссылок",
+        default=0,
+    )
+    updated = DateTimeField(
+        verbose_name="Изменён",
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = "Медиафайл"
+        verbose_name_plural = "Медиафайлы"
+        indexes = (
+            Index(
+                fields=("updated",),
+                condition=Q(refs=0),
+                name="recipes_mediafile_unused",
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.refs})"
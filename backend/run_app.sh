@@ -8,4 +8,11 @@ done;
 
 python manage.py migrate;
 python manage.py collectstatic --noinput;
-gunicorn -w 2 -b 0:8000 foodgram.wsgi;
+# Число воркеров и потоков учитывается в размере пула соединений с БД.
+if [ "$SERVER_MODE" = "asgi" ]; then
+    gunicorn -w "${WEB_CONCURRENCY:-2}" -k uvicorn.workers.UvicornWorker \
+        -b 0:8000 foodgram.asgi;
+else
+    gunicorn -w "${WEB_CONCURRENCY:-2}" --threads "${GUNICORN_THREADS:-1}" \
+        -b 0:8000 foodgram.wsgi;
+fi;
@@ -11,6 +11,8 @@ class MyUserAdmin(UserAdmin):
         "first_name",
         "last_name",
         "email",
+        "recipes_count",
+        "subscribers_count",
     )
     fields = (
         ("is_active",),
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="myuser",
+            name="recipes_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Рецептов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="myuser",
+            name="subscribers_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Подписчиков"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriptions",
+            index=models.Index(
+                fields=["user", "author"], name="users_subs_user_author"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subscriptions",
+            index=models.Index(
+                fields=["user", "-date_added"], name="users_subs_user_date"
+            ),
+        ),
+    ]
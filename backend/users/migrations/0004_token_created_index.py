@@ -0,0 +1,20 @@
+# Индекс по дате выдачи токенов для `manage.py cleanup_tokens`.
+# Модель `Token` принадлежит DRF, поэтому индекс создаётся SQL-запросом.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authtoken", "0003_tokenproxy"),
+        ("users", "0003_link_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS authtoken_token_created_idx "
+            "ON authtoken_token (created);",
+            "DROP INDEX IF EXISTS authtoken_token_created_idx;",
+        ),
+    ]
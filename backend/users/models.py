@@ -7,6 +7,7 @@ AbstractUser из Django для переопределения полей обя
 import unicodedata
 
 from core import texsts
+from core.counters import CountersModelMixin
 from core.enums import Limits
 from core.validators import MinLenValidator, OneOfTwoValidator
 from django.contrib.auth.models import AbstractUser
@@ -19,7 +20,9 @@ from django.db.models import (
     EmailField,
     F,
     ForeignKey,
+    Index,
     Model,
+    PositiveIntegerField,
     Q,
     UniqueConstraint,
 )
@@ -29,7 +32,7 @@ from django.utils.translation import gettext_lazy as _
 CharField.register_lookup(Length)
 
 
-class MyUser(AbstractUser):
+class MyUser(CountersModelMixin, AbstractUser):
     """Настроенная под приложение `Foodgram` модель пользователя.
 
     При создании пользователя все поля обязательны для заполнения.
@@ -57,8 +60,14 @@ class MyUser(AbstractUser):
             Установлено ограничение по максимальной длине.
         is_active (bool):
             Активен или заблокирован пользователь.
+        recipes_count (int):
+            Количество рецептов пользователя.
+        subscribers_count (int):
+            Количество подписчиков пользователя.
     """
 
+    counter_fields = ("recipes_count", "subscribers_count")
+
     email = EmailField(
         verbose_name="Адрес электронной почты",
         max_length=Limits.MAX_LEN_EMAIL_FIELD.value,
@@ -111,6 +120,16 @@ class MyUser(AbstractUser):
         verbose_name="Активирован",
         default=True,
     )
+    recipes_count = PositiveIntegerField(
+        verbose_name="Рецептов",
+        default=0,
+        editable=False,
+    )
+    subscribers_count = PositiveIntegerField(
+        verbose_name="Подписчиков",
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Пользователь"
@@ -208,6 +227,12 @@ class Subscriptions(Model):
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        # Уникальное ограничение начинается с `author`, а подписки
+        # пользователя выбираются по `user`.
+        indexes = (
+            Index(fields=("user", "author"), name="users_subs_user_author"),
+            Index(fields=("user", "-date_added"), name="users_subs_user_date"),
+        )
         constraints = (
             UniqueConstraint(
                 fields=("author", "user"),
@@ -0,0 +1,183 @@
+"""Бенчмарк пропускной способности WSGI и ASGI при медленных клиентах.
+
+Не входит в обычный прогон тестов, запуск:
+    pytest tests/bench_asgi.py -s
+
+Запускаются два сервера, как в `run_app.sh`: `gunicorn -w 2` (WSGI)
+и `gunicorn -w 2 -k uvicorn.workers.UvicornWorker` (ASGI, async-views).
+Медленные клиенты (`BENCH_SLOW_CLIENTS`, по умолчанию 4) передают
+заголовки запроса по одному в `SLOW_HEADER_DELAY` секунд, быстрые
+(`BENCH_FAST_CLIENTS`, по умолчанию 8) в это время запрашивают ленту
+и рецепты. Для каждого сервера выводятся запросов в секунду и p50/p95
+быстрых клиентов. БД - SQLite во временном каталоге, данные -
+`manage.py generate_data`.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from statistics import quantiles
+
+import pytest
+from conftest import BACKEND_DIR
+
+pytest.importorskip("uvicorn")
+pytest.importorskip("gunicorn")
+
+SLOW_CLIENTS = int(os.environ.get("BENCH_SLOW_CLIENTS", 4))
+FAST_CLIENTS = int(os.environ.get("BENCH_FAST_CLIENTS", 8))
+DURATION = float(os.environ.get("BENCH_DURATION", 10))
+SLOW_HEADERS = 10
+SLOW_HEADER_DELAY = 0.1
+RECIPES = 300
+
+SEED = """
+import django
+from django.conf import settings
+from django.core.management import call_command
+
+django.setup()
+settings.MEDIA_ROOT = {media!r}
+call_command("migrate", verbosity=0)
+call_command("generate_data", "--users", "50", "--recipes", "{recipes}")
+"""
+
+SERVERS = {
+    "wsgi": ("foodgram.wsgi",),
+    "asgi": ("-k", "uvicorn.workers.UvicornWorker", "foodgram.asgi"),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def environ(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("asgi")
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "foodgram.settings",
+        "DB_ENGINE": "django.db.backends.sqlite3",
+        "DB_NAME": str(tmp / "db.sqlite3"),
+        "DEBUG": "False",
+    }
+    subprocess.run(
+        (
+            sys.executable,
+            "-c",
+            SEED.format(media=str(tmp / "media"), recipes=RECIPES),
+        ),
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return env
+
+
+@pytest.fixture(params=SERVERS)
+def server(request, environ):
+    port = free_port()
+    process = subprocess.Popen(
+        (
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-w",
+            "2",
+            "-b",
+            f"127.0.0.1:{port}",
+            *SERVERS[request.param],
+        ),
+        cwd=BACKEND_DIR,
+        env={**environ, "SERVER_MODE": request.param},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.5).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+    yield request.param, port
+    process.terminate()
+    process.wait(10)
+
+
+async def fetch(port: int, path: str) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+        "Connection: close\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    await reader.read()
+    writer.close()
+    return status
+
+
+async def slow_client(port: int, stop: asyncio.Event) -> None:
+    """Передаёт заголовки запроса по частям, пока не остановлен."""
+    while not stop.is_set():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /api/recipes/?limit=6 HTTP/1.1\r\nHost: slow\r\n")
+        for idx in range(SLOW_HEADERS):
+            await asyncio.sleep(SLOW_HEADER_DELAY)
+            writer.write(f"X-Slow-{idx}: 1\r\n".encode())
+            await writer.drain()
+        writer.write(b"Connection: close\r\n\r\n")
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+
+async def fast_client(port: int, stop: asyncio.Event, latency: list) -> None:
+    idx = 0
+    while not stop.is_set():
+        idx += 1
+        path = (
+            f"/api/recipes/{idx % RECIPES + 1}/"
+            if idx % 2
+            else f"/api/recipes/?limit=6&page={idx % 10 + 1}"
+        )
+        started = time.perf_counter()
+        assert await fetch(port, path) == 200
+        latency.append(time.perf_counter() - started)
+
+
+async def load(port: int) -> list[float]:
+    stop = asyncio.Event()
+    latency = []
+    tasks = [
+        *(slow_client(port, stop) for _ in range(SLOW_CLIENTS)),
+        *(fast_client(port, stop, latency) for _ in range(FAST_CLIENTS)),
+    ]
+    tasks = [asyncio.create_task(task) for task in tasks]
+    await asyncio.sleep(DURATION)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return latency
+
+
+def test_slow_clients_throughput(server):
+    mode, port = server
+    asyncio.run(fetch(port, "/api/recipes/?limit=6"))
+
+    latency = asyncio.run(load(port))
+
+    assert len(latency) > 1
+    cuts = quantiles(latency, n=100)
+    p50, p95 = cuts[49], cuts[94]
+    print(
+        f"\n{mode}: медленных клиентов {SLOW_CLIENTS}, "
+        f"быстрых {FAST_CLIENTS}, {len(latency) / DURATION:.1f} rps, "
+        f"p50 {p50 * 1000:.0f} мс, p95 {p95 * 1000:.0f} мс"
+    )
@@ -0,0 +1,143 @@
+"""Бенчмарки горячих сериализаторов и сервисов (pytest-benchmark).
+
+Не входит в обычный прогон тестов, запуск:
+    pip install -r backend/requirements-dev.txt
+    pytest tests/bench_hot_paths.py --benchmark-autosave
+
+Результаты сохраняются в JSON в каталоге `.benchmarks/`, сравнение
+с предыдущим сохранённым прогоном (падает при замедлении медианы на 20%):
+    pytest tests/bench_hot_paths.py --benchmark-compare \
+        --benchmark-compare-fail=median:20%
+
+Кроме времени, для каждого бенчмарка в `extra_info.queries`
+записывается количество запросов к БД за один вызов.
+Данные - справочник ингридиентов `data/dump.json` и рецепты
+`manage.py generate_data` с фиксированным `--seed`. Для PostgreSQL
+передайте `DB_ENGINE`, `DB_NAME` и остальные параметры БД,
+как для приложения.
+"""
+from io import StringIO
+
+import pytest
+from conftest import BACKEND_DIR
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytest.importorskip("pytest_benchmark")
+
+RECIPES = 600
+PAGE_SIZES = (10, 50, 200)
+CART_SIZES = (1, 10, 100, 500)
+INGREDIENT_COUNTS = (10, 100, 1000)
+# "молоко" в латинской раскладке, префикс и URL-кодированный префикс.
+SEARCH_QUERIES = ("vjkjrj", "сол", "%D0%BC%D0%B0%D1%81")
+
+
+def run(benchmark, func):
+    """Замеряет `func`, предварительно посчитав запросы к БД."""
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    benchmark.extra_info["queries"] = len(queries)
+    return benchmark(func)
+
+
+@pytest.fixture
+def catalog(db, media_root):
+    from django.contrib.auth import get_user_model
+
+    out = StringIO()
+    call_command(
+        "import_ingredients", str(BACKEND_DIR / "data" / "dump.json"),
+        stdout=out, stderr=out,
+    )
+    call_command(
+        "generate_data",
+        "--users", "100",
+        "--recipes", str(RECIPES),
+        "--ingredients", "0",
+        "--carts", "0",
+        "--seed", "42",
+        stdout=out,
+    )
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    return get_user_model().objects.order_by("pk").first()
+
+
+def make_request(user, path: str = "/api/recipes/"):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    request = APIRequestFactory().get(path)
+    force_authenticate(request, user)
+    return Request(request)
+
+
+@pytest.mark.parametrize("size", PAGE_SIZES)
+def test_recipe_serializer_page(benchmark, catalog, size):
+    from api.serializers import RecipeSerializer
+    from api.views import RecipeViewSet
+
+    request = make_request(catalog)
+    view = RecipeViewSet(request=request, format_kwarg=None, action="list")
+
+    def serialize():
+        page = view.get_queryset().order_by("-pub_date")[:size]
+        return RecipeSerializer(
+            page, many=True, context=view.get_serializer_context()
+        ).data
+
+    assert len(run(benchmark, serialize)) == size
+
+
+@pytest.mark.parametrize("size", CART_SIZES)
+@pytest.mark.parametrize("file_format", ("txt", "pdf"))
+def test_shopping_list(benchmark, catalog, size, file_format):
+    from core.services import create_shoping_list
+    from recipes.models import Carts, Recipe
+
+    Carts.objects.bulk_create(
+        Carts(user=catalog, recipe_id=pk)
+        for pk in Recipe.objects.values_list("pk", flat=True)[:size]
+    )
+    call_command("rebuild_cart_totals", stdout=StringIO())
+
+    def build():
+        return list(create_shoping_list(catalog, file_format))
+
+    assert run(benchmark, build)
+
+
+@pytest.mark.parametrize("query", SEARCH_QUERIES)
+@pytest.mark.parametrize("backend", ("memory", "database"))
+def test_ingredient_search(benchmark, catalog, settings, backend, query):
+    from api.views import IngredientViewSet
+
+    settings.INGREDIENT_SEARCH_BACKEND = backend
+    request = make_request(catalog, f"/api/ingredients/?name={query}")
+    view = IngredientViewSet(request=request, format_kwarg=None)
+    # Индекс в памяти строится при первом поиске.
+    list(view.get_queryset())
+
+    assert run(benchmark, lambda: list(view.get_queryset()))
+
+
+@pytest.mark.parametrize("count", INGREDIENT_COUNTS)
+def test_ingredients_validator(benchmark, catalog, count):
+    from core.validators import ingredients_validator
+    from recipes.models import Ingredient
+
+    ids = Ingredient.objects.values_list("pk", flat=True)[:count]
+    data = [{"id": pk, "amount": str(pk % 500 + 1)} for pk in ids]
+
+    result = run(benchmark, lambda: ingredients_validator(data, Ingredient))
+    assert len(result) == count
+
+
+@pytest.mark.parametrize("value", ("vjkjrj", "молоко", "%D0%BC%D0%BE"))
+def test_maybe_incorrect_layout(benchmark, value):
+    from core.services import maybe_incorrect_layout
+
+    assert benchmark(maybe_incorrect_layout, value)
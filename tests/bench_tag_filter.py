@@ -0,0 +1,96 @@
+"""Бенчмарк фильтра рецептов по тэгам: `JOIN + DISTINCT` против `EXISTS`.
+
+Не входит в обычный прогон тестов, запуск:
+    pytest tests/bench_tag_filter.py -s
+
+Количество рецептов задаётся переменной `BENCH_RECIPES`
+(по умолчанию 100 000). Для PostgreSQL передайте `DB_ENGINE`, `DB_NAME`
+и остальные параметры БД, как для приложения.
+"""
+import os
+import random
+from statistics import median
+from time import perf_counter
+
+import pytest
+from django.db import connection
+
+RECIPES = int(os.environ.get("BENCH_RECIPES", 100_000))
+TAGS = 10
+BATCH = 5_000
+REPEAT = 5
+FILTER_SLUGS = ["tag0", "tag1", "tag2"]
+
+
+@pytest.fixture
+def catalog(make_user):
+    from recipes.models import Recipe, Tag
+
+    rnd = random.Random(42)
+    authors = [make_user() for _ in range(20)]
+    tags = Tag.objects.bulk_create(
+        Tag(
+            name=f"тэг{'абвгдежзий'[idx]}",
+            color=f"#{idx:06X}",
+            slug=f"tag{idx}",
+        )
+        for idx in range(TAGS)
+    )
+    text = "Очень подробное описание рецепта. " * 20
+    links = Recipe.tags.through
+    for start in range(0, RECIPES, BATCH):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f"Рецепт {idx}",
+                author=authors[idx % len(authors)],
+                text=text,
+                image="recipe_images/bench.png",
+                cooking_time=10,
+            )
+            for idx in range(start, min(start + BATCH, RECIPES))
+        )
+        links.objects.bulk_create(
+            links(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe in recipes
+            for tag in rnd.sample(tags, rnd.randint(1, 3))
+        )
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+def timeit(func) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return median(timings) * 1000
+
+
+@pytest.mark.django_db
+def test_tag_filter_benchmark(catalog):
+    from core.services import filter_recipes_by_tags
+    from recipes.models import Recipe
+
+    queries = {
+        "join + distinct": Recipe.objects.filter(
+            tags__slug__in=FILTER_SLUGS
+        ).distinct(),
+        "exists (any)": filter_recipes_by_tags(
+            Recipe.objects.all(), FILTER_SLUGS
+        ),
+        "having (all)": filter_recipes_by_tags(
+            Recipe.objects.all(), FILTER_SLUGS[:2], all_tags=True
+        ),
+    }
+    assert list(queries["join + distinct"][:50]) == list(
+        queries["exists (any)"][:50]
+    )
+
+    print(f"\n{connection.vendor}, рецептов: {RECIPES}, медиана из {REPEAT}")
+    print(f"{'запрос':<18}{'страница, мс':>14}{'count, мс':>12}")
+    for name, queryset in queries.items():
+        page = timeit(lambda: list(queryset[:6]))
+        count = timeit(queryset.count)
+        print(f"{name:<18}{page:>14.1f}{count:>12.1f}")
@@ -0,0 +1,147 @@
+import os
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+os.environ.setdefault("DB_ENGINE", "django.db.backends.sqlite3")
+os.environ.setdefault("DB_NAME", ":memory:")
+
+
+def pytest_configure(config):
+    import django
+
+    django.setup()
+
+
+LETTERS = str.maketrans("0123456789", "abcdefghij")
+
+
+def make_image(name: str = "image.png", size: tuple = (20, 20)):
+    """Готовит картинку для сохранения в `Recipe.image`."""
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    buffer = BytesIO()
+    Image.new("RGB", size, "green").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+def counters(obj, *fields) -> tuple[int, ...]:
+    """Текущие значения счётчиков объекта из БД."""
+    obj.refresh_from_db(fields=fields)
+    return tuple(getattr(obj, field) for field in fields)
+
+
+def cart_totals(user) -> dict[str, int]:
+    """Суммы ингредиентов списка покупок пользователя."""
+    return {
+        row.ingredient.name + row.ingredient.measurement_unit: row.amount
+        for row in user.cart_ingredients.select_related("ingredient")
+    }
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from core import tokens
+    from django.core.cache import cache
+
+    cache.clear()
+    tokens._local.clear()
+
+
+@pytest.fixture
+def api_client():
+    from rest_framework.test import APIClient
+
+    return APIClient()
+
+
+@pytest.fixture
+def make_user(db):
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    counter = iter(range(10**6))
+
+    def factory(**kwargs):
+        idx = next(counter)
+        kwargs.setdefault("username", f"user{idx:04d}".translate(LETTERS))
+        kwargs.setdefault("email", f"user{idx}@foodgram.test")
+        kwargs.setdefault("first_name", "Иван")
+        kwargs.setdefault("last_name", "Иванов")
+        return User.objects.create_user(password="Pa$$w0rd_42", **kwargs)
+
+    return factory
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def user_client(api_client, user):
+    api_client.force_authenticate(user)
+    return api_client
+
+
+@pytest.fixture
+def tags(db):
+    from recipes.models import Tag
+
+    return [
+        Tag.objects.create(name="завтрак", color="#FFFC66", slug="breakfast"),
+        Tag.objects.create(name="обед", color="#54E709", slug="lunch"),
+        Tag.objects.create(name="ужин", color="#E4007C", slug="dinner"),
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    from recipes.models import Ingredient
+
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit=unit)
+        for name, unit in (
+            ("абрикос", "г"),
+            ("банан", "шт"),
+            ("вишня", "г"),
+            ("молоко", "мл"),
+            ("сахар", "г"),
+        )
+    )
+
+
+@pytest.fixture
+def make_recipe(db, tags, ingredients):
+    from recipes.models import AmountIngredient, Recipe
+
+    counter = iter(range(10**6))
+
+    def factory(author, **kwargs):
+        idx = next(counter)
+        kwargs.setdefault("name", f"Рецепт {idx}")
+        kwargs.setdefault("text", "Описание рецепта")
+        kwargs.setdefault("cooking_time", 10)
+        kwargs.setdefault("image", make_image())
+        recipe = Recipe.objects.create(author=author, **kwargs)
+        recipe.tags.set(tags[: idx % len(tags) + 1])
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(recipe=recipe, ingredients=ing, amount=idx + 1)
+            for ing in ingredients[: idx % len(ingredients) + 1]
+        )
+        return recipe
+
+    return factory
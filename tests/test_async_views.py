@@ -0,0 +1,160 @@
+import asyncio
+from contextlib import contextmanager
+from importlib import reload
+
+import pytest
+from asgiref.sync import async_to_sync
+
+
+@contextmanager
+def async_views(settings):
+    """Подключает маршруты `api.async_views`, как при `ASYNC_VIEWS`."""
+    import api.urls
+    import foodgram.urls
+    from django.urls import clear_url_caches
+
+    def load(enabled: bool) -> None:
+        settings.ASYNC_VIEWS = enabled
+        reload(api.urls)
+        reload(foodgram.urls)
+        clear_url_caches()
+
+    load(True)
+    try:
+        yield
+    finally:
+        load(False)
+
+
+def arequest(method: str, path: str, token: str | None = None, **headers):
+    """Запрос через ASGI-обработчик Django."""
+    from django.test import AsyncClient
+
+    if token:
+        headers["authorization"] = f"Token {token}"
+
+    async def send():
+        return await getattr(AsyncClient(), method)(path, **headers)
+
+    return async_to_sync(send)()
+
+
+def aget(path: str, token: str | None = None, **headers):
+    return arequest("get", path, token, **headers)
+
+
+@pytest.fixture
+def token(user):
+    from rest_framework.authtoken.models import Token
+
+    return Token.objects.create(user=user).key
+
+
+@pytest.fixture
+def catalog(make_user, make_recipe, user, api_client, token):
+    author = make_user()
+    recipes = [make_recipe(author) for _ in range(5)]
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+    for recipe in recipes[:2]:
+        api_client.post(f"/api/recipes/{recipe.pk}/shopping_cart/")
+        api_client.post(f"/api/recipes/{recipe.pk}/favorite/")
+    return recipes
+
+
+@pytest.mark.django_db
+def test_async_views_match_sync(
+    catalog, api_client, token, settings, monkeypatch
+):
+    from django.core.cache import cache
+    from django.urls import resolve
+    from rest_framework.views import APIView
+
+    paths = (
+        "/api/recipes/",
+        "/api/recipes/?limit=2&page=2",
+        "/api/recipes/?limit=2&tags=breakfast&is_favorited=1",
+        "/api/recipes/?limit=2&page=9",
+        f"/api/recipes/{catalog[0].pk}/",
+        "/api/recipes/999999/",
+        "/api/ingredients/",
+        "/api/ingredients/?name=vjkjrj",
+        "/api/recipes/download_shopping_cart/",
+        "/api/recipes/download_shopping_cart/?format=csv",
+    )
+    expected = {}
+    for path in paths:
+        for key in (None, token):
+            api_client.credentials(
+                **({"HTTP_AUTHORIZATION": f"Token {key}"} if key else {})
+            )
+            response = api_client.get(path)
+            expected[path, key] = (
+                response.status_code,
+                response["Content-Type"],
+                b"".join(response),
+            )
+    cache.clear()
+
+    sync_calls = []
+    dispatch = APIView.dispatch
+
+    def spy(self, request, *args, **kwargs):
+        sync_calls.append((request.path, request.user.is_authenticated))
+        return dispatch(self, request, *args, **kwargs)
+
+    with async_views(settings), monkeypatch.context() as patch:
+        assert asyncio.iscoroutinefunction(resolve("/api/recipes/").func)
+        patch.setattr(APIView, "dispatch", spy)
+        for path in paths:
+            for key in (None, token):
+                response = aget(path, key)
+                assert (
+                    response.status_code,
+                    response["Content-Type"],
+                    b"".join(response),
+                ) == expected[path, key], (path, key)
+
+    # Синхронно отвечает только отказ анонимному пользователю.
+    assert sync_calls == [("/api/recipes/download_shopping_cart/", False)] * 2
+
+
+@pytest.mark.django_db
+def test_async_views_fallback(catalog, token, settings):
+    from recipes.models import Favorites
+
+    with async_views(settings):
+        # Ошибки токена и browsable API - синхронные представления DRF.
+        assert aget("/api/recipes/", "invalid").status_code == 401
+        assert aget("/api/recipes/", accept="text/html")[
+            "Content-Type"
+        ].startswith("text/html")
+        cursor_page = aget("/api/recipes/?cursor=&limit=2", token).json()
+        assert "count" not in cursor_page
+        assert len(cursor_page["results"]) == 2
+        response = arequest(
+            "post", f"/api/recipes/{catalog[4].pk}/favorite/", token
+        )
+
+    assert response.status_code == 201
+    assert Favorites.objects.filter(recipe=catalog[4]).exists()
+
+
+@pytest.mark.django_db
+def test_async_profiling(catalog, token, make_user, settings):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.authtoken.models import Token
+
+    settings.PROFILING_SAMPLE_RATE = 1
+    staff_token = Token.objects.create(user=make_user(is_staff=True)).key
+
+    with async_views(settings):
+        with CaptureQueriesContext(connection) as queries:
+            response = aget("/api/recipes/?limit=3", token)
+        profile = aget("/api/recipes/?__profile=1", staff_token)
+
+    assert response.status_code == 200
+    assert f'desc="{len(queries)} queries"' in response["Server-Timing"]
+    assert len(queries) > 0
+    assert profile["X-Profiled-Status"] == "200"
+    assert "function calls" in profile.content.decode()
@@ -0,0 +1,130 @@
+import pytest
+from conftest import cart_totals, counters
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def recipes(author, make_recipe, ingredients):
+    return [make_recipe(author) for _ in range(3)]
+
+
+def statuses(response) -> dict[int, str]:
+    assert response.status_code == 200
+    return {item["id"]: item["status"] for item in response.json()}
+
+
+@pytest.mark.django_db
+def test_batch_cart(user_client, user, recipes):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    first, second, third = recipes
+    user_client.post(f"/api/recipes/{first.id}/shopping_cart/")
+
+    with CaptureQueriesContext(connection) as queries:
+        response = user_client.post(
+            "/api/recipes/shopping_cart/",
+            {"ids": [first.id, second.id, third.id, 999999, second.id]},
+            format="json",
+        )
+    assert statuses(response) == {
+        first.id: "exists",
+        second.id: "created",
+        third.id: "created",
+        999999: "not_found",
+    }
+    assert [counters(r, "carts_count") for r in recipes] == [(1,)] * 3
+    assert len(queries) < 15
+    single_recipe_totals = cart_totals(user)
+
+    response = user_client.delete(
+        "/api/recipes/shopping_cart/",
+        {"ids": [second.id, 999999]},
+        format="json",
+    )
+    assert statuses(response) == {second.id: "deleted", 999999: "not_found"}
+    assert counters(second, "carts_count") == (0,)
+    assert cart_totals(user) != single_recipe_totals
+
+    # Очистка всего списка покупок одним запросом.
+    response = user_client.delete(
+        "/api/recipes/shopping_cart/", {"all": True}, format="json"
+    )
+    assert statuses(response) == {first.id: "deleted", third.id: "deleted"}
+    assert not user.carts.exists()
+    assert cart_totals(user) == {}
+    assert [counters(r, "carts_count") for r in recipes] == [(0,)] * 3
+
+
+@pytest.mark.django_db
+def test_batch_favorites_and_subscriptions(
+    user_client, user, author, make_user, recipes
+):
+    response = user_client.post(
+        "/api/recipes/favorite/",
+        {"ids": [recipe.id for recipe in recipes]},
+        format="json",
+    )
+    assert set(statuses(response).values()) == {"created"}
+    assert user.favorites.count() == 3
+    assert user.carts.count() == 0
+
+    other = make_user()
+    response = user_client.post(
+        "/api/users/subscriptions/",
+        {"ids": [author.id, other.id, user.id]},
+        format="json",
+    )
+    assert statuses(response) == {
+        author.id: "created",
+        other.id: "created",
+        user.id: "not_found",
+    }
+    assert counters(author, "subscribers_count") == (1,)
+
+    response = user_client.delete(
+        "/api/users/subscriptions/",
+        {"ids": [author.id, other.id]},
+        format="json",
+    )
+    assert statuses(response) == {author.id: "deleted", other.id: "deleted"}
+    assert counters(other, "subscribers_count") == (0,)
+
+
+@pytest.mark.django_db
+def test_batch_validation(user_client):
+    from rest_framework.test import APIClient
+
+    url = "/api/recipes/shopping_cart/"
+    anonymous = APIClient().post(url, {"ids": [1]}, format="json")
+    assert anonymous.status_code == 401
+    for data in ({}, {"ids": []}, {"ids": ["x"]}, {"ids": [0]}):
+        assert user_client.post(url, data, format="json").status_code == 400
+    too_many = {"ids": list(range(1, 102))}
+    assert user_client.post(url, too_many, format="json").status_code == 400
+
+
+@pytest.mark.django_db
+def test_batch_delete_requires_ids(user_client, user, author, recipes):
+    ids = [recipe.id for recipe in recipes]
+    user_client.post("/api/recipes/favorite/", {"ids": ids}, format="json")
+    user_client.post("/api/recipes/shopping_cart/", {"ids": ids}, format="json")
+    user_client.post(f"/api/users/{author.id}/subscribe/")
+
+    for url in ("/api/recipes/favorite/", "/api/users/subscriptions/"):
+        for data in (None, {}, [author.id], {"all": True}):
+            response = user_client.delete(url, data, format="json")
+            assert response.status_code == 400, (url, data)
+    cart = "/api/recipes/shopping_cart/"
+    for data in (None, {}, ids, {"all": False}, {"all": True, "ids": ids}):
+        response = user_client.delete(cart, data, format="json")
+        assert response.status_code == 400, data
+    response = user_client.post(cart, {"all": True}, format="json")
+    assert response.status_code == 400
+
+    assert user.favorites.count() == user.carts.count() == 3
+    assert user.subscriptions.count() == 1
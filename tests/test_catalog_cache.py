@@ -0,0 +1,100 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+TAGS_URL = "/api/tags/"
+INGREDIENTS_URL = "/api/ingredients/"
+
+
+@pytest.fixture(params=("locmem", "file", "redis"), autouse=True)
+def catalog_cache(request, settings, tmp_path):
+    backends = {
+        "locmem": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "file": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": tmp_path / "cache",
+        },
+    }
+    if request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        backends["redis"] = {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://fake:6379",
+            "OPTIONS": {
+                "connection_class": getattr(
+                    fakeredis, "FakeRedisConnection", fakeredis.FakeConnection
+                ),
+            },
+        }
+    settings.CACHES = {"default": backends[request.param]}
+
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_second_request_is_served_from_cache(api_client, tags):
+    first = api_client.get(TAGS_URL)
+
+    with CaptureQueriesContext(connection) as context:
+        second = api_client.get(TAGS_URL)
+
+    assert not context.captured_queries
+    assert second.json() == first.json()
+    assert second["ETag"] == first["ETag"]
+
+
+@pytest.mark.django_db
+def test_if_none_match_returns_not_modified(api_client, ingredients):
+    etag = api_client.get(INGREDIENTS_URL)["ETag"]
+
+    response = api_client.get(INGREDIENTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+
+@pytest.mark.django_db
+def test_query_params_are_cached_separately(api_client, ingredients):
+    found = api_client.get(INGREDIENTS_URL, {"name": "ба"}).json()
+    everything = api_client.get(INGREDIENTS_URL).json()
+
+    assert [ing["name"] for ing in found] == ["банан"]
+    assert len(everything) == len(ingredients)
+
+
+@pytest.mark.django_db
+def test_cache_is_invalidated_by_signals(api_client, tags):
+    etag = api_client.get(TAGS_URL)["ETag"]
+
+    tags[0].name = "полдник"
+    tags[0].save()
+    changed = api_client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+    assert changed.status_code == 200
+    assert changed["ETag"] != etag
+    assert "полдник" in [tag["name"] for tag in changed.json()]
+
+    tags[1].delete()
+    assert len(api_client.get(TAGS_URL).json()) == len(tags) - 1
+
+
+@pytest.mark.django_db
+def test_local_cache_expires(api_client, tags, settings):
+    from core.cache import cache_is_shared
+    from django.core.cache import cache
+
+    # Кэш в памяти процесса не знает об изменениях в других воркерах.
+    settings.CATALOG_LOCAL_CACHE_TIMEOUT = 0
+    cache.clear()
+    first = api_client.get(TAGS_URL)
+
+    with CaptureQueriesContext(connection) as context:
+        second = api_client.get(TAGS_URL)
+
+    shared = cache_is_shared()
+    assert bool(context.captured_queries) is not shared
+    assert (second["ETag"] == first["ETag"]) is shared
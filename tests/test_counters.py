@@ -0,0 +1,99 @@
+from io import StringIO
+
+import pytest
+from conftest import counters
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def recipe(author, make_recipe):
+    return make_recipe(author)
+
+
+@pytest.mark.django_db
+def test_recipe_counters(user_client, user, recipe):
+    for url in ("favorite", "shopping_cart"):
+        assert (
+            user_client.post(f"/api/recipes/{recipe.id}/{url}/").status_code
+            == 201
+        )
+        assert (
+            user_client.post(f"/api/recipes/{recipe.id}/{url}/").status_code
+            == 400
+        )
+    assert counters(recipe, "favorites_count", "carts_count") == (1, 1)
+
+    assert (
+        user_client.delete(f"/api/recipes/{recipe.id}/favorite/").status_code
+        == 204
+    )
+    assert counters(recipe, "favorites_count", "carts_count") == (0, 1)
+
+    user.delete()
+    assert counters(recipe, "favorites_count", "carts_count") == (0, 0)
+
+
+@pytest.mark.django_db
+def test_user_counters(user_client, author, make_recipe):
+    recipes = [make_recipe(author) for _ in range(3)]
+    recipes[0].delete()
+    assert counters(author, "recipes_count") == (2,)
+
+    url = f"/api/users/{author.id}/subscribe/"
+    response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.json()["recipes_count"] == 2
+    assert counters(author, "subscribers_count") == (1,)
+
+    subscriptions = user_client.get("/api/users/subscriptions/", {"limit": 10})
+    assert subscriptions.json()["results"][0]["recipes_count"] == 2
+
+    assert user_client.delete(url).status_code == 204
+    assert counters(author, "subscribers_count") == (0,)
+
+
+@pytest.mark.django_db
+def test_stale_save_keeps_counters(user_client, author, recipe):
+    from django.contrib.auth import get_user_model
+    from recipes.models import Recipe
+
+    stale_recipe = Recipe.objects.get(pk=recipe.pk)
+    stale_author = get_user_model().objects.get(pk=author.pk)
+    for url in ("favorite", "shopping_cart"):
+        user_client.post(f"/api/recipes/{recipe.id}/{url}/")
+    user_client.post(f"/api/users/{author.id}/subscribe/")
+
+    stale_recipe.name = "Новое название"
+    stale_recipe.save()
+    stale_author.first_name = "Иван"
+    stale_author.save()
+
+    assert counters(recipe, "favorites_count", "carts_count") == (1, 1)
+    assert counters(author, "recipes_count", "subscribers_count") == (1, 1)
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert (recipe.name, author.first_name) == ("Новое название", "Иван")
+
+
+@pytest.mark.django_db
+def test_reconcile_counters(user, author, recipe):
+    from django.contrib.auth import get_user_model
+    from recipes.models import Favorites, Recipe
+
+    Favorites.objects.create(user=user, recipe=recipe)
+    get_user_model().objects.filter(pk=author.pk).update(recipes_count=7)
+    Recipe.objects.filter(pk=recipe.pk).update(carts_count=3)
+
+    with pytest.raises(CommandError):
+        call_command("reconcile_counters", "--check", stdout=StringIO())
+
+    call_command("reconcile_counters", stdout=StringIO())
+    assert counters(recipe, "favorites_count", "carts_count") == (1, 0)
+    assert counters(author, "recipes_count") == (1,)
+    call_command("reconcile_counters", "--check", stdout=StringIO())
@@ -0,0 +1,144 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    from core.profiling import metrics
+
+    metrics.clear()
+
+
+def make_pool(**kwargs):
+    from core.db_pool.pool import ConnectionPool
+
+    kwargs.setdefault("size", 1)
+    kwargs.setdefault("timeout", 1)
+    kwargs.setdefault("check_after", 30)
+    kwargs.setdefault("is_usable", lambda connection: True)
+    return ConnectionPool(
+        name="default",
+        connect=lambda: sqlite3.connect(":memory:", check_same_thread=False),
+        **kwargs,
+    )
+
+
+def test_connection_is_reused():
+    from core.profiling import metrics
+
+    pool = make_pool()
+
+    first = pool.checkout()
+    pool.checkin(first)
+    second = pool.checkout()
+
+    assert second is first
+    rendered = metrics.render()
+    assert 'foodgram_db_pool_checkouts_total{alias="default"} 2' in rendered
+    assert 'foodgram_db_pool_connects_total{alias="default"} 1' in rendered
+    assert (
+        'foodgram_db_pool_connections{alias="default",state="in_use"} 1'
+        in rendered
+    )
+
+
+def test_timeout_and_wait():
+    from core.db_pool.pool import PoolTimeout
+    from core.profiling import metrics
+    from django.db.utils import OperationalError
+
+    pool = make_pool(timeout=0.05)
+    connection = pool.checkout()
+
+    with pytest.raises(PoolTimeout):
+        pool.checkout()
+    assert issubclass(PoolTimeout, OperationalError)
+
+    threading.Timer(0.1, pool.checkin, (connection,)).start()
+    pool.timeout = 1
+    started = time.perf_counter()
+    assert pool.checkout() is connection
+    assert time.perf_counter() - started >= 0.05
+
+    rendered = metrics.render()
+    assert 'foodgram_db_pool_timeouts_total{alias="default"} 1' in rendered
+    assert (
+        'foodgram_db_pool_wait_seconds_bucket{alias="default",le="0.001"} 1'
+        in rendered
+    )
+    assert 'foodgram_db_pool_wait_seconds_count{alias="default"} 2' in rendered
+
+
+def test_unusable_connections_are_replaced():
+    from core.profiling import metrics
+
+    pool = make_pool(check_after=0, is_usable=lambda connection: False)
+    first = pool.checkout()
+    pool.checkin(first)
+
+    second = pool.checkout()
+    assert second is not first
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.execute("SELECT 1")
+
+    pool.checkin(second, reusable=False)
+    assert pool.checkout() is not second
+    assert (
+        'foodgram_db_pool_discarded_total{alias="default"} 2'
+        in metrics.render()
+    )
+
+
+def test_failed_connect_releases_slot():
+    from core.db_pool.pool import ConnectionPool
+
+    def connect():
+        raise sqlite3.OperationalError("нет связи")
+
+    pool = ConnectionPool(
+        name="default",
+        connect=connect,
+        is_usable=bool,
+        size=1,
+        timeout=0.05,
+        check_after=30,
+    )
+
+    for _ in range(2):
+        with pytest.raises(sqlite3.OperationalError):
+            pool.checkout()
+
+
+def test_backend_is_loadable():
+    from django.db.utils import load_backend
+
+    backend = load_backend("core.db_pool")
+
+    assert backend.DatabaseWrapper.vendor == "postgresql"
+
+
+def test_connections_limit_check(settings):
+    from core.db_pool.checks import check_connections_limit
+
+    settings.DB_ENGINE = "django.db.backends.postgresql"
+    settings.SERVER_MODE = "wsgi"
+    settings.DB_POOL = True
+    settings.DB_POOL_SIZE = 12
+    settings.WEB_CONCURRENCY = 4
+    settings.DB_MAX_CONNECTIONS = 90
+
+    assert check_connections_limit() == []
+
+    settings.WEB_CONCURRENCY = 8
+    assert [error.id for error in check_connections_limit()] == [
+        "foodgram.W002"
+    ]
+
+    settings.SERVER_MODE = "asgi"
+    settings.DB_POOL = False
+    assert [error.id for error in check_connections_limit()] == [
+        "foodgram.W001"
+    ]
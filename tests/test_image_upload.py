@@ -0,0 +1,103 @@
+from base64 import b64decode, b64encode
+from io import BytesIO
+
+import pytest
+from conftest import make_image
+from django.core.exceptions import ValidationError
+from PIL import Image
+
+RECIPES_URL = "/api/recipes/"
+IMAGE_URL = "/api/recipes/{}/image/"
+
+
+def image_base64(size: tuple = (20, 20), mode: str = "RGB") -> str:
+    buffer = BytesIO()
+    Image.new(mode, size).save(buffer, "PNG")
+    return b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def recipe_data(tags, ingredients):
+    return {
+        "tags": [tags[0].id],
+        "ingredients": [{"id": ingredients[0].id, "amount": 2}],
+        "name": "Рецепт",
+        "text": "Описание",
+        "cooking_time": 10,
+    }
+
+
+def test_decode_base64_image():
+    from core.images import decode_base64_image
+
+    data = image_base64()
+    # Переносы строк не мешают декодированию блоками.
+    wrapped = "\n".join(data[i:i + 76] for i in range(0, len(data), 76))
+    file = decode_base64_image(f"data:image/png;base64,{wrapped}")
+
+    assert file.content_type == "image/png"
+    assert file.temporary_file_path()
+    assert file.read() == b64decode(data)
+    assert file.size == len(b64decode(data))
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        "не base64",
+        b64encode(b"not an image at all").decode(),
+        image_base64()[:-2],
+    ),
+)
+def test_decode_base64_image_invalid(data):
+    from core.images import decode_base64_image
+
+    with pytest.raises(ValidationError):
+        decode_base64_image(data)
+
+
+@pytest.mark.django_db
+def test_create_recipe_with_base64_image(user_client, recipe_data):
+    recipe_data["image"] = f"data:image/png;base64,{image_base64()}"
+
+    response = user_client.post(RECIPES_URL, recipe_data, format="json")
+
+    assert response.status_code == 201
+    assert response.data["image"].endswith(".png")
+
+
+@pytest.mark.django_db
+def test_decompression_bomb_is_rejected(user_client, recipe_data):
+    # Несколько килобайт PNG, 48 млн пикселей после распаковки.
+    recipe_data["image"] = image_base64(size=(8000, 6000), mode="1")
+
+    response = user_client.post(RECIPES_URL, recipe_data, format="json")
+
+    assert response.status_code == 400
+    assert "image" in response.data
+
+
+@pytest.mark.django_db
+def test_multipart_image_upload(user_client, user, make_user, make_recipe):
+    recipe = make_recipe(user)
+    old_image = recipe.image.name
+
+    response = user_client.put(
+        IMAGE_URL.format(recipe.id),
+        {"image": make_image("photo.jpeg", size=(30, 30))},
+        format="multipart",
+    )
+
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.image.name != old_image
+    assert recipe.image.name.endswith(".png")
+    assert response.data["id"] == recipe.id
+
+    other = make_recipe(make_user())
+    response = user_client.put(
+        IMAGE_URL.format(other.id),
+        {"image": make_image()},
+        format="multipart",
+    )
+    assert response.status_code == 403
@@ -0,0 +1,199 @@
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from conftest import make_image
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+
+@pytest.fixture
+def sync_images(settings):
+    settings.IMAGE_PROCESSING_WORKERS = 0
+
+
+def image_size(recipe) -> tuple[int, int]:
+    with Image.open(recipe.image.path) as image:
+        return image.size
+
+
+@pytest.mark.django_db
+def test_image_is_processed_after_commit(
+    sync_images, django_capture_on_commit_callbacks, make_user, make_recipe
+):
+    author = make_user()
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe = make_recipe(author, image=make_image(size=(800, 600)))
+
+    # До обработки отдаётся оригинал.
+    original = recipe.image.path
+    assert image_size(recipe) == (800, 600)
+    assert recipe.image_hash == ""
+
+    for callback in callbacks:
+        callback()
+    recipe.refresh_from_db()
+
+    assert image_size(recipe) == (500, 375)
+    assert len(recipe.image_hash) == 64
+    assert recipe.image.path != original
+    # Оригинал без ссылок удаляет `cleanup_media`.
+    assert Path(original).exists()
+    call_command("cleanup_media", "--grace", "0", stdout=StringIO())
+    assert not Path(original).exists()
+
+    # Варианты не увеличиваются: `retina` шириной в оригинал.
+    widths = {
+        variant: data["width"]
+        for variant, data in recipe.image_variants.items()
+    }
+    assert widths == {"card": 320, "detail": 640, "retina": 800}
+    with default_storage.open(recipe.image_variants["card"]["name"]) as file:
+        with Image.open(file) as image:
+            assert (image.format, image.size) == ("WEBP", (320, 240))
+
+
+@pytest.mark.django_db
+def test_unchanged_image_is_not_processed(
+    sync_images, django_capture_on_commit_callbacks, make_user, make_recipe
+):
+    from core.images import process_recipe_image
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = make_recipe(make_user(), image=make_image(size=(800, 600)))
+    recipe.refresh_from_db()
+    name, image_hash = recipe.image.name, recipe.image_hash
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.name = "Новое название"
+        recipe.save()
+    process_recipe_image(recipe.pk)
+    recipe.refresh_from_db()
+
+    assert not callbacks
+    assert (recipe.image.name, recipe.image_hash) == (name, image_hash)
+
+
+@pytest.mark.django_db
+def test_same_image_upload_is_not_processed(
+    sync_images, django_capture_on_commit_callbacks, make_user, make_recipe
+):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from recipes.models import MediaFile
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = make_recipe(make_user(), image=make_image(size=(800, 600)))
+    recipe.refresh_from_db()
+    before = recipe.image.name, recipe.image_hash, recipe.image_variants
+    with default_storage.open(recipe.image.name) as file:
+        content = file.read()
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.image = SimpleUploadedFile("same.png", content, "image/png")
+        recipe.save()
+    recipe.refresh_from_db()
+
+    assert not callbacks
+    after = recipe.image.name, recipe.image_hash, recipe.image_variants
+    assert after == before
+    assert MediaFile.objects.get(name=recipe.image.name).refs == 1
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.image = make_image(size=(300, 300))
+        recipe.save()
+
+    assert len(callbacks) == 1
+    assert (recipe.image_hash, recipe.image_variants) == ("", {})
+
+
+@pytest.mark.django_db
+def test_small_image_is_kept(
+    sync_images, django_capture_on_commit_callbacks, make_user, make_recipe
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = make_recipe(make_user())
+    name = recipe.image.name
+    recipe.refresh_from_db()
+
+    assert recipe.image.name == name
+    assert recipe.image_hash
+    # Одинаковые по ширине варианты не дублируются.
+    assert list(recipe.image_variants) == ["card"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_image_is_processed_in_thread_pool(settings, make_user, make_recipe):
+    from core.images import image_queue
+
+    settings.IMAGE_PROCESSING_WORKERS = 1
+    recipe = make_recipe(make_user(), image=make_image(size=(1000, 1000)))
+
+    image_queue.submit(recipe.pk).result(timeout=10)
+    recipe.refresh_from_db()
+
+    assert image_size(recipe) == (500, 500)
+
+
+@pytest.mark.django_db
+def test_process_recipe_images_command(make_user, make_recipe):
+    recipe = make_recipe(make_user(), image=make_image(size=(600, 600)))
+    call_command("process_recipe_images", stdout=StringIO())
+    recipe.refresh_from_db()
+
+    assert image_size(recipe) == (500, 500)
+
+
+@pytest.mark.django_db
+def test_image_srcset(
+    sync_images,
+    django_capture_on_commit_callbacks,
+    api_client,
+    make_user,
+    make_recipe,
+):
+    author = make_user()
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe = make_recipe(author, image=make_image(size=(700, 700)))
+
+    response = api_client.get(f"/api/recipes/{recipe.id}/")
+    assert response.data["image_srcset"] == ""
+
+    for callback in callbacks:
+        callback()
+    recipe.refresh_from_db()
+    response = api_client.get(f"/api/recipes/{recipe.id}/")
+
+    srcset = response.data["image_srcset"].split(", ")
+    assert [src.rsplit(" ", 1)[1] for src in srcset] == [
+        "320w",
+        "640w",
+        "700w",
+    ]
+    assert srcset[0].startswith("http://testserver/media/")
+    assert srcset[0].split(" ")[0].endswith(".webp")
+
+
+@pytest.mark.django_db
+def test_variants_are_released_with_recipe(
+    sync_images, django_capture_on_commit_callbacks, make_user, make_recipe
+):
+    from recipes.models import MediaFile
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = make_recipe(make_user(), image=make_image(size=(800, 600)))
+    recipe.refresh_from_db()
+    names = [recipe.image.name] + [
+        variant["name"] for variant in recipe.image_variants.values()
+    ]
+    assert all(default_storage.exists(name) for name in names)
+
+    assert set(
+        MediaFile.objects.filter(refs=1).values_list("name", flat=True)
+    ) == set(names)
+
+    recipe.delete()
+    assert not MediaFile.objects.filter(refs__gt=0).exists()
+    call_command("cleanup_media", "--grace", "0", stdout=StringIO())
+
+    assert not any(default_storage.exists(name) for name in names)
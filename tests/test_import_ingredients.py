@@ -0,0 +1,82 @@
+import json
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+DUMP = Path(__file__).resolve().parent.parent / "backend" / "data" / "dump.json"
+
+
+def import_ingredients(*args) -> str:
+    out = StringIO()
+    call_command("import_ingredients", *args, stdout=out, stderr=StringIO())
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("chunk_size", (1, 7, 64 * 1024))
+def test_json_array_reader(chunk_size):
+    from recipes.management.commands.import_ingredients import JsonArrayReader
+
+    items = [{"name": "соль", "n": 12345}, 67890, "строка, с ]", [], {}]
+    text = json.dumps(items, ensure_ascii=False, indent=2)
+
+    assert list(JsonArrayReader(StringIO(text), chunk_size)) == items
+    assert list(JsonArrayReader(StringIO(" [ ] "), chunk_size)) == []
+    with pytest.raises(ValueError):
+        list(JsonArrayReader(StringIO('[{"a": 1} {"b": 2}]'), chunk_size))
+
+
+@pytest.mark.django_db
+def test_import_fixture():
+    from recipes.models import Ingredient
+
+    output = import_ingredients(str(DUMP))
+
+    assert Ingredient.objects.count() == 2188
+    assert "Добавлено: 2188" in output
+    assert "других моделей: 3" in output
+
+    # Повторная загрузка ничего не добавляет.
+    assert "Добавлено: 0" in import_ingredients(str(DUMP))
+    assert Ingredient.objects.count() == 2188
+
+
+@pytest.mark.django_db
+def test_import_csv(tmp_path, ingredients):
+    from core.search import ingredient_index
+    from recipes.models import Ingredient
+
+    path = tmp_path / "ingredients.txt"
+    path.write_text(
+        "name,measurement_unit\n"
+        "Кокос,г\n"
+        "кокос, Г \n"
+        "абрикос,г\n"
+        ",г\n"
+        "слишком много,полей,здесь\n",
+        encoding="utf-8",
+    )
+    before = Ingredient.objects.count()
+    ingredient_index.search("кокос")
+
+    output = import_ingredients(
+        str(path), "--format", "csv", "--batch-size", "1"
+    )
+
+    assert Ingredient.objects.count() == before + 1
+    assert "с ошибками: 2" in output
+    assert Ingredient.objects.filter(name="кокос", measurement_unit="г").exists()
+    # Индекс поиска видит загруженные ингридиенты.
+    assert [ing.name for ing in ingredient_index.search("кокос")] == ["кокос"]
+
+
+@pytest.mark.django_db
+def test_import_errors(tmp_path):
+    with pytest.raises(CommandError):
+        import_ingredients(str(tmp_path / "ingredients.xml"))
+    with pytest.raises(CommandError):
+        import_ingredients(str(tmp_path / "missing.json"))
+    with pytest.raises(CommandError):
+        import_ingredients(str(DUMP), "--method", "copy")
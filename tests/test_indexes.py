@@ -0,0 +1,85 @@
+"""Проверка планов запросов: используются ли индексы под фильтры API.
+
+В PostgreSQL на маленьких таблицах планировщик предпочитает
+последовательное чтение, поэтому оно отключается на время теста.
+"""
+import pytest
+from django.db import connection
+
+
+def plan(queryset) -> str:
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+@pytest.fixture
+def data(user, make_user, make_recipe):
+    from recipes.models import Carts, Favorites
+    from users.models import Subscriptions
+
+    author = make_user()
+    recipes = [make_recipe(author) for _ in range(3)]
+    for recipe in recipes:
+        Favorites.objects.create(user=user, recipe=recipe)
+        Carts.objects.create(user=user, recipe=recipe)
+    Subscriptions.objects.create(user=user, author=author)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    return author, recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("model_name", ("Favorites", "Carts"))
+def test_link_tables_by_user(user, data, model_name):
+    from recipes import models
+
+    model = getattr(models, model_name)
+    table = model._meta.db_table
+
+    by_recipe = model.objects.filter(user=user).values("recipe")
+    assert f"{table}_user_recipe" in plan(by_recipe)
+
+    latest = model.objects.filter(user=user).order_by("-date_added")
+    assert f"{table}_user_date" in plan(latest)
+
+
+@pytest.mark.django_db
+def test_subscriptions_by_user(user, data):
+    from users.models import Subscriptions
+
+    authors = Subscriptions.objects.filter(user=user).values("author")
+    assert "users_subs_user_author" in plan(authors)
+
+    latest = Subscriptions.objects.filter(user=user).order_by("-date_added")
+    assert "users_subs_user_date" in plan(latest)
+
+
+@pytest.mark.django_db
+def test_recipes_by_author(data):
+    from recipes.models import Recipe
+
+    author, _ = data
+    recipes = Recipe.objects.filter(author=author).order_by("-pub_date")
+    assert "recipes_recipe_author_pub_date" in plan(recipes)
+
+
+@pytest.mark.django_db
+def test_recipes_by_tags(data, tags):
+    from recipes.models import Recipe
+
+    recipe_ids = Recipe.tags.through.objects.filter(
+        tag__in=tags[:2]
+    ).values("recipe")
+    assert "recipes_recipe_tags_tag_recipe" in plan(recipe_ids)
+
+
+@pytest.mark.django_db
+def test_feed(data):
+    from recipes.models import Recipe
+
+    assert "recipes_recipe_feed" in plan(
+        Recipe.objects.order_by("-pub_date", "-id")
+    )
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+import pytest
+from core.services import maybe_incorrect_layout
+from django.core.management import call_command
+
+DUMP = Path(__file__).resolve().parent.parent / "backend/data/dump.json"
+INGREDIENTS_URL = "/api/ingredients/"
+QUERIES = ("а", "ма", "мол", "сыр", "ckbd", "Сахар", "%D1%81%D0%BE", "ъ")
+
+
+def orm_search(name: str) -> list[int]:
+    """Поиск ингридиентов запросами к БД, как до появления индекса."""
+    from recipes.models import Ingredient
+
+    name = maybe_incorrect_layout(name)
+    start = Ingredient.objects.filter(name__istartswith=name)
+    contain = Ingredient.objects.filter(name__icontains=name).exclude(
+        name__in=(ing.name for ing in start)
+    )
+    return [ing.id for ing in list(start) + list(contain)]
+
+
+@pytest.fixture
+def dump_ingredients(db):
+    """Ингридиенты из `data/dump.json` в нижнем регистре.
+
+    SQLite сравнивает и сортирует кириллицу с учётом регистра,
+    поэтому для сравнения с ORM названия приводятся к нижнему регистру.
+    """
+    from recipes.models import Ingredient
+
+    call_command("loaddata", DUMP, verbosity=0)
+    ingredients = list(Ingredient.objects.all())
+    for ing in ingredients:
+        ing.name = ing.name.lower()
+    Ingredient.objects.bulk_update(ingredients, ("name",))
+
+
+@pytest.mark.django_db
+def test_index_matches_orm_search(api_client, dump_ingredients):
+    from core.search import ingredient_index
+
+    for name in QUERIES:
+        expected = orm_search(name)
+        found = ingredient_index.search(maybe_incorrect_layout(name))
+
+        assert [ing.id for ing in found] == expected, name
+        response = api_client.get(INGREDIENTS_URL, {"name": name})
+        assert [ing["id"] for ing in response.json()] == expected, name
+
+
+@pytest.mark.django_db
+def test_database_backend_matches_index(api_client, settings, ingredients):
+    from core.search import ingredient_index
+
+    settings.INGREDIENT_SEARCH_BACKEND = "database"
+
+    for name in ("а", "ан", "ма", "dbi"):
+        response = api_client.get(INGREDIENTS_URL, {"name": name})
+        expected = ingredient_index.search(maybe_incorrect_layout(name))
+        assert [ing["id"] for ing in response.json()] == [
+            ing.id for ing in expected
+        ], name
+
+
+@pytest.mark.django_db
+def test_index_follows_catalog_changes(ingredients):
+    from core.search import ingredient_index
+    from recipes.models import Ingredient
+
+    assert [ing.name for ing in ingredient_index.search("ба")] == ["банан"]
+
+    Ingredient.objects.create(name="баклажан", measurement_unit="г")
+    ingredients[1].delete()
+
+    assert [ing.name for ing in ingredient_index.search("ба")] == [
+        "баклажан"
+    ]
+
+
+@pytest.mark.django_db
+def test_index_is_rebuilt_when_local_version_expires(ingredients, settings):
+    from core.search import ingredient_index
+    from django.core.cache import cache
+    from recipes.models import Ingredient
+
+    settings.CATALOG_LOCAL_CACHE_TIMEOUT = 0
+    cache.clear()
+    assert not ingredient_index.search("черешня")
+
+    # Изменение в другом воркере: сигнал до этого процесса не доходит.
+    Ingredient.objects.filter(pk=ingredients[0].pk).update(name="черешня")
+
+    assert [ing.pk for ing in ingredient_index.search("черешня")] == [
+        ingredients[0].pk
+    ]
@@ -0,0 +1,83 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import F
+
+
+def generate(*args) -> None:
+    call_command(
+        "generate_data",
+        "--users", "20",
+        "--recipes", "30",
+        "--tags", "4",
+        "--ingredients", "15",
+        *args,
+        stdout=StringIO(),
+    )
+
+
+@pytest.mark.django_db
+def test_generate_data(media_root):
+    from django.contrib.auth import get_user_model
+    from recipes.models import Carts, Favorites, MediaFile, Recipe, Tag
+    from users.models import Subscriptions
+
+    User = get_user_model()
+
+    generate()
+
+    assert User.objects.count() == 20
+    assert Recipe.objects.count() == 30
+    assert Tag.objects.count() == 4
+    assert not Subscriptions.objects.filter(user=F("author")).exists()
+    recipe = Recipe.objects.order_by("?").first()
+    assert recipe.tags.exists()
+    assert recipe.ingredients.count() >= 1
+    assert recipe.favorites_count == Favorites.objects.filter(
+        recipe=recipe
+    ).count()
+    assert recipe.carts_count == Carts.objects.filter(recipe=recipe).count()
+    # Все рецепты ссылаются на одно обработанное изображение.
+    assert set(Recipe.objects.values_list("image", flat=True)) == {
+        recipe.image.name
+    }
+    assert recipe.image_variants
+    assert MediaFile.objects.get(name=recipe.image.name).refs == 30
+
+    # Повторный запуск добавляет новых пользователей и рецепты.
+    generate("--seed", "7")
+    assert User.objects.count() == 40
+    assert Recipe.objects.count() == 60
+
+
+@pytest.mark.django_db
+def test_loadtest(media_root, tmp_path):
+    from recipes.models import Favorites
+
+    generate()
+    favorites = Favorites.objects.count()
+    report_path = tmp_path / "report.json"
+    out = StringIO()
+
+    call_command(
+        "loadtest",
+        "--requests", "60",
+        "--warmup", "5",
+        "--concurrency", "1",
+        "--json", str(report_path),
+        stdout=out,
+    )
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["requests"] >= 60
+    assert report["errors"] == 0
+    assert {"p50", "p95", "p99", "rps"} <= report.keys()
+    for name, item in report["scenarios"].items():
+        assert all(int(code) < 500 for code in item["statuses"]), name
+    # Каталоги отдаются из кэша, лента рецептов - из БД.
+    assert report["scenarios"]["recipes"]["queries"] >= 1
+    assert "Всего:" in out.getvalue()
+    # Сценарий избранного не меняет данные.
+    assert Favorites.objects.count() == favorites
@@ -0,0 +1,79 @@
+import os
+from io import StringIO
+
+import pytest
+from conftest import make_image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+
+def refs(name: str) -> int:
+    from recipes.models import MediaFile
+
+    return MediaFile.objects.get(name=name).refs
+
+
+def cleanup(*args) -> None:
+    call_command("cleanup_media", *args, stdout=StringIO())
+
+
+def test_files_are_named_by_content(media_root):
+    first = default_storage.save("recipe_images/a.PNG", ContentFile(b"1"))
+    second = default_storage.save("recipe_images/b.png", ContentFile(b"1"))
+    other = default_storage.save("recipe_images/c.png", ContentFile(b"2"))
+
+    assert first == second != other
+    assert first.startswith("recipe_images/6b/6b86b273")
+    assert first.endswith(".png")
+    assert len(list((media_root / "recipe_images").rglob("*.png"))) == 2
+
+
+@pytest.mark.django_db
+def test_shared_image_is_kept_while_referenced(make_user, make_recipe):
+    author = make_user()
+    first = make_recipe(author, image=make_image())
+    second = make_recipe(author, image=make_image("other.png"))
+    name = first.image.name
+
+    assert second.image.name == name
+    assert refs(name) == 2
+
+    first.delete()
+    cleanup("--grace", "0")
+
+    assert refs(name) == 1
+    assert default_storage.exists(name)
+
+    second.image = make_image(size=(30, 30))
+    second.save()
+    cleanup("--grace", "0")
+
+    assert not default_storage.exists(name)
+    assert refs(second.image.name) == 1
+
+
+@pytest.mark.django_db
+def test_cleanup_respects_grace_period(make_user, make_recipe):
+    recipe = make_recipe(make_user())
+    name = recipe.image.name
+    orphan = default_storage.save("recipe_images/x.png", ContentFile(b"x"))
+    recipe.delete()
+
+    cleanup()
+    assert default_storage.exists(name)
+    assert default_storage.exists(orphan)
+
+    cleanup("--grace", "0", "--dry-run")
+    assert default_storage.exists(orphan)
+
+    # Повторное сохранение того же файла обновляет время изменения.
+    past = default_storage.get_modified_time(orphan).timestamp() - 7200
+    os.utime(default_storage.path(orphan), (past, past))
+    default_storage.save("recipe_images/y.png", ContentFile(b"x"))
+    cleanup("--grace", "3600")
+    assert default_storage.exists(orphan)
+
+    cleanup("--grace", "0")
+    assert not default_storage.exists(name)
+    assert not default_storage.exists(orphan)
@@ -0,0 +1,116 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+RECIPES_URL = "/api/recipes/"
+
+
+@pytest.fixture
+def recipes(make_user, make_recipe):
+    from recipes.models import Recipe
+
+    author = make_user()
+    recipes = [make_recipe(author) for _ in range(7)]
+    # Одинаковая дата публикации - порядок определяет `id`.
+    Recipe.objects.filter(pk__in=[r.pk for r in recipes[2:5]]).update(
+        pub_date=recipes[2].pub_date
+    )
+    return recipes
+
+
+def walk(client, url: str, params: dict) -> tuple[list[int], list[int]]:
+    """Проходит ленту по курсорам, возвращает `id` и число запросов."""
+    found, queries = [], []
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        data = response.json()
+        assert "count" not in data
+        found.extend(obj["id"] for obj in data["results"])
+        if not data["next"]:
+            return found, queries
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(data["next"])
+        queries.append(len(context.captured_queries))
+
+
+@pytest.mark.django_db
+def test_cursor_walks_recipes_in_order(api_client, recipes):
+    from recipes.models import Recipe
+
+    found, queries = walk(api_client, RECIPES_URL, {"cursor": "", "limit": 2})
+
+    expected = list(
+        Recipe.objects.order_by("-pub_date", "-id").values_list(
+            "id", flat=True
+        )
+    )
+    assert found == expected
+    assert len(set(queries)) == 1
+
+
+@pytest.mark.django_db
+def test_cursor_page_has_no_count_query(api_client, recipes):
+    with CaptureQueriesContext(connection) as context:
+        api_client.get(RECIPES_URL, {"cursor": "", "limit": 2})
+
+    assert not any(
+        "COUNT(" in query["sql"] for query in context.captured_queries
+    )
+
+
+@pytest.mark.django_db
+def test_page_mode_is_unchanged(api_client, recipes):
+    data = api_client.get(RECIPES_URL, {"page": 2, "limit": 3}).json()
+
+    assert data["count"] == len(recipes)
+    assert len(data["results"]) == 3
+    assert "page=3" in data["next"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "cursor",
+    (
+        "not-a-cursor",
+        "WyJ4IiwgIjEiXQ==",
+        # `[{}, 1]` и `[1, []]` - значения не строки и не числа.
+        "W3t9LCAxXQ==",
+        "WzEsIFtdXQ==",
+    ),
+)
+def test_invalid_cursor(api_client, recipes, cursor):
+    response = api_client.get(RECIPES_URL, {"cursor": cursor})
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_cursor_subscriptions(user_client, user, make_user):
+    from users.models import Subscriptions
+
+    authors = [make_user() for _ in range(5)]
+    for author in authors:
+        Subscriptions.objects.create(user=user, author=author)
+
+    found, _ = walk(
+        user_client, "/api/users/subscriptions/", {"cursor": "", "limit": 2}
+    )
+
+    assert found == [
+        author.id for author in sorted(authors, key=lambda a: a.username)
+    ]
+
+
+@pytest.mark.django_db
+def test_count_is_cached(api_client, settings, recipes):
+    settings.PAGINATION_COUNT_CACHE_TIMEOUT = 60
+    api_client.get(RECIPES_URL, {"limit": 2})
+
+    with CaptureQueriesContext(connection) as context:
+        data = api_client.get(RECIPES_URL, {"limit": 2, "page": 2}).json()
+
+    assert data["count"] == len(recipes)
+    assert not any(
+        "COUNT(" in query["sql"] for query in context.captured_queries
+    )
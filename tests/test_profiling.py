@@ -0,0 +1,179 @@
+import logging
+
+import pytest
+
+
+METRICS_TOKEN = "metrics-secret"
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics(settings):
+    from core.profiling import metrics
+
+    settings.METRICS_TOKEN = METRICS_TOKEN
+    metrics.clear()
+
+
+def get_metrics(client) -> str:
+    response = client.get(
+        "/metrics", HTTP_AUTHORIZATION=f"Bearer {METRICS_TOKEN}"
+    )
+    assert response.status_code == 200
+    return response.content.decode()
+
+
+def test_fingerprint():
+    from core.profiling import fingerprint
+
+    assert fingerprint(
+        "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'абв' LIMIT 21"
+    ) == fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'x' LIMIT 5")
+    assert fingerprint("SELECT 1 FROM a") != fingerprint("SELECT 1 FROM b")
+
+
+@pytest.mark.django_db
+def test_server_timing_and_metrics(api_client, make_user, make_recipe, settings):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    settings.PROFILING_SAMPLE_RATE = 1
+    make_recipe(make_user())
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get("/api/recipes/")
+
+    timing = response["Server-Timing"]
+    assert f'desc="{len(queries)} queries"' in timing
+    assert "ser;dur=" in timing
+    assert "total;dur=" in timing
+
+    metrics = get_metrics(api_client)
+    assert (
+        'foodgram_requests_total{view="api:recipes-list",method="GET",'
+        'status="200"} 1' in metrics
+    )
+    assert (
+        'foodgram_db_queries_bucket{view="api:recipes-list",le="5"} 1'
+        in metrics
+    )
+    assert 'foodgram_serializer_duration_seconds_count{view="api:' in metrics
+
+
+@pytest.mark.django_db
+def test_sampling(api_client, tags, settings):
+    settings.PROFILING_SAMPLE_RATE = 0
+
+    response = api_client.get("/api/tags/")
+
+    assert "Server-Timing" not in response
+    metrics = get_metrics(api_client)
+    assert 'foodgram_requests_total{view="api:tags-list"' in metrics
+    assert "foodgram_profiled_requests_total{" not in metrics
+
+
+@pytest.mark.django_db
+def test_duplicate_queries_are_reported(caplog, tags, settings):
+    from core.profiling import ProfilingMiddleware, metrics
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from recipes.models import Tag
+
+    settings.PROFILING_SAMPLE_RATE = 1
+    settings.PROFILING_DUPLICATE_THRESHOLD = 3
+
+    def view(request):
+        for tag in tags:
+            Tag.objects.get(pk=tag.pk)
+        return HttpResponse()
+
+    with caplog.at_level(logging.WARNING, logger="core.profiling"):
+        response = ProfilingMiddleware(view)(RequestFactory().get("/n+1/"))
+
+    assert 'desc="3 queries"' in response["Server-Timing"]
+    assert 'dup;desc="2"' in response["Server-Timing"]
+    assert "Повторяющийся запрос (3 раз)" in caplog.text
+    assert (
+        'foodgram_duplicate_queries_total{view="unresolved"} 2'
+        in metrics.render()
+    )
+
+
+@pytest.fixture
+def staff_client(api_client, make_user):
+    from rest_framework.authtoken.models import Token
+
+    staff = make_user(is_staff=True)
+    token = Token.objects.create(user=staff)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return api_client
+
+
+@pytest.mark.django_db
+def test_metrics_access(staff_client, user, settings):
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    assert APIClient().get("/metrics").status_code == 403
+    token = Token.objects.create(user=user)
+    user_client = APIClient(HTTP_AUTHORIZATION=f"Token {token.key}")
+    assert user_client.get("/metrics").status_code == 403
+    wrong = APIClient().get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+    assert wrong.status_code == 403
+    assert get_metrics(APIClient()).startswith("# HELP")
+    assert staff_client.get("/metrics").status_code == 200
+
+    settings.METRICS_TOKEN = ""
+    empty = APIClient().get("/metrics", HTTP_AUTHORIZATION="Bearer ")
+    assert empty.status_code == 403
+
+
+def test_middleware_requires_both_modes():
+    from core.profiling import AsyncCapableMiddleware
+
+    class SyncOnly(AsyncCapableMiddleware):
+        def call(self, request):
+            return self.get_response(request)
+
+    with pytest.raises(TypeError):
+        SyncOnly(lambda request: None)
+
+
+@pytest.mark.django_db
+def test_profile_is_staff_only(user_client, make_recipe, user):
+    make_recipe(user)
+
+    response = user_client.get("/api/recipes/?__profile=1")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "path",
+    ("/api/recipes/", "/api/users/", "/api/users/me/", "/api/tags/"),
+)
+def test_profile_text(staff_client, path):
+    response = staff_client.get(path, HTTP_X_PROFILE="text")
+
+    assert response["Content-Type"].startswith("text/plain")
+    assert response["X-Profiled-Status"] == "200"
+    assert "function calls" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_profile_pstats_saved(staff_client, settings, tmp_path):
+    import marshal
+
+    settings.PROFILE_REQUESTS_DIR = str(tmp_path / "profiles")
+
+    response = staff_client.get("/api/recipes/?__profile=pstats")
+
+    name = response["X-Profile-File"]
+    assert name.startswith("api-recipes-list-")
+    assert name in response["Content-Disposition"]
+    saved = (tmp_path / "profiles" / name).read_bytes()
+    assert saved == response.content
+    assert marshal.loads(saved)
+
+    assert staff_client.get("/api/recipes/?__profile=xml").status_code == 400
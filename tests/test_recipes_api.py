@@ -0,0 +1,121 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+RECIPES_URL = "/api/recipes/"
+
+
+def count_queries(client, url: str) -> int:
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_recipes_list_query_count_is_constant(
+    user_client, user, make_user, make_recipe
+):
+    from recipes.models import Carts, Favorites
+    from users.models import Subscriptions
+
+    authors = [make_user() for _ in range(3)]
+    recipes = [make_recipe(authors[idx % 3]) for idx in range(12)]
+    Favorites.objects.create(user=user, recipe=recipes[0])
+    Carts.objects.create(user=user, recipe=recipes[1])
+    Subscriptions.objects.create(user=user, author=authors[0])
+
+    small_page = count_queries(user_client, f"{RECIPES_URL}?limit=2")
+    large_page = count_queries(user_client, f"{RECIPES_URL}?limit=12")
+
+    assert small_page == large_page
+
+
+@pytest.mark.django_db
+def test_recipes_list_anonymous_query_count_is_constant(
+    api_client, make_user, make_recipe
+):
+    author = make_user()
+    for _ in range(8):
+        make_recipe(author)
+
+    small_page = count_queries(api_client, f"{RECIPES_URL}?limit=2")
+    large_page = count_queries(api_client, f"{RECIPES_URL}?limit=8")
+
+    assert small_page == large_page
+
+
+@pytest.mark.django_db
+def test_recipes_list_flags_from_annotations(
+    user_client, user, make_user, make_recipe
+):
+    from recipes.models import Carts, Favorites
+    from users.models import Subscriptions
+
+    author = make_user()
+    favorite, in_cart, plain = (make_recipe(author) for _ in range(3))
+    Favorites.objects.create(user=user, recipe=favorite)
+    Carts.objects.create(user=user, recipe=in_cart)
+    Subscriptions.objects.create(user=user, author=author)
+
+    response = user_client.get(f"{RECIPES_URL}?limit=10")
+    results = {item["id"]: item for item in response.json()["results"]}
+
+    assert results[favorite.id]["is_favorited"] is True
+    assert results[favorite.id]["is_in_shopping_cart"] is False
+    assert results[in_cart.id]["is_in_shopping_cart"] is True
+    assert results[plain.id]["is_favorited"] is False
+    assert results[plain.id]["author"]["is_subscribed"] is True
+    assert [ing["name"] for ing in results[in_cart.id]["ingredients"]] == [
+        "абрикос",
+        "банан",
+    ]
+
+    favorites = user_client.get(f"{RECIPES_URL}?limit=10&is_favorited=1")
+    assert [item["id"] for item in favorites.json()["results"]] == [
+        favorite.id
+    ]
+
+
+@pytest.mark.django_db
+def test_recipes_search(api_client, make_user, make_recipe):
+    author = make_user()
+    borscht = make_recipe(author, name="Борщ", text="Свекла и капуста")
+    salad = make_recipe(author, name="Салат", text="Капуста и морковь")
+    make_recipe(author, name="Каша", text="Крупа и молоко")
+
+    by_name = api_client.get(RECIPES_URL, {"search": "Борщ", "limit": 10})
+    by_text = api_client.get(RECIPES_URL, {"name": "апуста", "limit": 10})
+
+    assert [item["id"] for item in by_name.json()["results"]] == [borscht.id]
+    assert {item["id"] for item in by_text.json()["results"]} == {
+        borscht.id,
+        salad.id,
+    }
+
+
+@pytest.mark.django_db
+def test_recipes_tags_filter(api_client, make_user, make_recipe):
+    author = make_user()
+    # Тэги рецептов: [breakfast], [breakfast, lunch], [все три].
+    first, second, third = (make_recipe(author) for _ in range(3))
+
+    def found(params: dict) -> list[int]:
+        params = {"limit": 10, **params}
+        response = api_client.get(RECIPES_URL, params)
+        return [item["id"] for item in response.json()["results"]]
+
+    assert found({"tags": ["breakfast", "lunch"]}) == [
+        third.id,
+        second.id,
+        first.id,
+    ]
+    assert found({"tags": "dinner"}) == [third.id]
+    assert found({"tags": ["lunch", "dinner"], "tags_mode": "all"}) == [
+        third.id
+    ]
+    assert found({"tags": ["breakfast", "lunch"], "tags_mode": "all"}) == [
+        third.id,
+        second.id,
+    ]
+    assert found({"tags": ["lunch", "unknown"], "tags_mode": "all"}) == []
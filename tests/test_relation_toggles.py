@@ -0,0 +1,109 @@
+import pytest
+from conftest import counters
+
+
+@pytest.fixture
+def recipe(make_user, make_recipe):
+    return make_recipe(make_user())
+
+
+def statements(queries) -> list[str]:
+    """Первые слова всех запросов, кроме точек сохранения транзакции."""
+    words = [q["sql"].split()[0] for q in queries]
+    return [w for w in words if w not in ("SAVEPOINT", "RELEASE")]
+
+
+def sql(queries, statement: str) -> str:
+    return next(q["sql"] for q in queries if q["sql"].startswith(statement))
+
+
+@pytest.mark.django_db
+def test_toggle_query_count(user_client, recipe):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    # Токен попадает в кэш и не учитывается в запросах переключения.
+    user_client.get("/api/users/me/")
+    url = f"/api/recipes/{recipe.id}/favorite/"
+    # Связь, счётчик рецепта и рецепт для ответа.
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.post(url).status_code == 201
+    assert statements(queries) == ["INSERT", "UPDATE", "SELECT"]
+    assert "RETURNING" in sql(queries, "INSERT")
+    # Повтор: рецепт не загружается, проверяется только его наличие.
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.post(url).status_code == 400
+    assert statements(queries) == ["INSERT", "SELECT"]
+    assert sql(queries, "SELECT").startswith("SELECT 1 AS")
+
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.delete(url).status_code == 204
+    assert statements(queries) == ["DELETE", "UPDATE"]
+    assert "RETURNING" in sql(queries, "DELETE")
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.delete(url).status_code == 400
+    assert statements(queries) == ["DELETE"]
+    assert counters(recipe, "favorites_count") == (0,)
+
+    # Корзина дополнительно пересчитывает ингредиенты списка покупок.
+    url = f"/api/recipes/{recipe.id}/shopping_cart/"
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.post(url).status_code == 201
+    assert len(statements(queries)) == 7
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.delete(url).status_code == 204
+    assert len(statements(queries)) == 5
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url",
+    (
+        "/api/recipes/abc/favorite/",
+        "/api/recipes/abc/shopping_cart/",
+        "/api/users/abc/subscribe/",
+    ),
+)
+def test_toggle_non_numeric_id(user_client, url):
+    assert user_client.post(url).status_code == 404
+    assert user_client.delete(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_repeated_toggles(user_client, user, recipe, monkeypatch):
+    from django.db import connection
+
+    monkeypatch.setitem(connection.settings_dict, "ATOMIC_REQUESTS", True)
+    url = f"/api/recipes/{recipe.id}/shopping_cart/"
+
+    assert user_client.post(url).status_code == 201
+    assert user_client.post(url).status_code == 400
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 400
+    assert user_client.post("/api/recipes/999999/favorite/").status_code == 404
+    assert user_client.post("/api/recipes/x/favorite/").status_code == 404
+    response = user_client.post(f"/api/users/{user.id}/subscribe/")
+    assert response.status_code == 400
+    assert counters(recipe, "carts_count") == (0,)
+
+
+@pytest.mark.django_db
+def test_idempotency_key_replay(user_client, recipe):
+    url = f"/api/recipes/{recipe.id}/favorite/"
+
+    first = user_client.post(url, HTTP_IDEMPOTENCY_KEY="click-1")
+    replay = user_client.post(url, HTTP_IDEMPOTENCY_KEY="click-1")
+    assert first.status_code == replay.status_code == 201
+    assert replay.json() == first.json()
+    assert replay["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first
+    assert counters(recipe, "favorites_count") == (1,)
+
+    assert (
+        user_client.post(url, HTTP_IDEMPOTENCY_KEY="click-2").status_code
+        == 400
+    )
+    for _ in range(2):
+        response = user_client.delete(url, HTTP_IDEMPOTENCY_KEY="click-3")
+        assert response.status_code == 204
+    assert counters(recipe, "favorites_count") == (0,)
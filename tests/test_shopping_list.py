@@ -0,0 +1,152 @@
+import csv
+import json
+from io import StringIO
+
+import pytest
+from conftest import cart_totals
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+DOWNLOAD_URL = "/api/recipes/download_shopping_cart/"
+CART_URL = "/api/recipes/{}/shopping_cart/"
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def cart(user_client, author, make_recipe, ingredients):
+    from recipes.models import AmountIngredient, Ingredient
+
+    first, second = make_recipe(author), make_recipe(author)
+    # Одноимённый ингридиент в других единицах измерения.
+    AmountIngredient.objects.create(
+        recipe=second,
+        ingredients=Ingredient.objects.create(
+            name="абрикос", measurement_unit="шт"
+        ),
+        amount=3,
+    )
+    for recipe in (first, second):
+        response = user_client.post(CART_URL.format(recipe.id))
+        assert response.status_code == 201
+    return first, second
+
+
+def content(response) -> bytes:
+    return b"".join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_txt_is_default(user_client, cart):
+    response = user_client.get(DOWNLOAD_URL)
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/plain; charset=utf-8"
+    lines = content(response).decode().splitlines()
+    assert "абрикос: 3 г" in lines
+    assert "абрикос: 3 шт" in lines
+    assert "банан: 2 шт" in lines
+    assert lines[-1] == "Посчитано в Foodgram"
+
+
+@pytest.mark.django_db
+def test_csv(user_client, cart):
+    response = user_client.get(DOWNLOAD_URL, {"format": "csv"})
+
+    rows = list(csv.reader(content(response).decode().splitlines()))
+    assert response["Content-Disposition"].endswith(".csv")
+    assert rows[1:] == [
+        ["абрикос", "3", "г"],
+        ["абрикос", "3", "шт"],
+        ["банан", "2", "шт"],
+    ]
+
+
+@pytest.mark.django_db
+def test_json(user_client, user, cart):
+    response = user_client.get(DOWNLOAD_URL, {"format": "json"})
+
+    data = json.loads(content(response))
+    assert data["user"] == user.first_name
+    assert data["ingredients"][0] == {
+        "name": "абрикос",
+        "measurement_unit": "г",
+        "amount": 3,
+    }
+    assert len(data["ingredients"]) == 3
+
+
+@pytest.mark.django_db
+def test_pdf(user_client, cart):
+    pytest.importorskip("reportlab")
+
+    response = user_client.get(DOWNLOAD_URL, {"format": "pdf"})
+
+    assert response["Content-Type"] == "application/pdf"
+    assert content(response).startswith(b"%PDF")
+
+
+@pytest.mark.django_db
+def test_empty_cart(user_client):
+    assert user_client.get(DOWNLOAD_URL).status_code == 400
+
+
+@pytest.mark.django_db
+def test_cart_totals_follow_cart(user_client, user, cart):
+    first, second = cart
+
+    assert cart_totals(user) == {"абрикосг": 3, "абрикосшт": 3, "бананшт": 2}
+
+    assert user_client.post(CART_URL.format(first.id)).status_code == 400
+    assert user_client.delete(CART_URL.format(second.id)).status_code == 204
+    assert user_client.delete(CART_URL.format(second.id)).status_code == 400
+    assert cart_totals(user) == {"абрикосг": 1}
+
+
+@pytest.mark.django_db
+def test_cart_totals_follow_recipe_changes(
+    api_client, user, author, cart, ingredients
+):
+    first, second = cart
+    api_client.force_authenticate(author)
+
+    response = api_client.patch(
+        f"/api/recipes/{first.id}/",
+        {
+            "tags": [tag.id for tag in first.tags.all()],
+            "ingredients": [
+                {"id": ingredients[0].id, "amount": 5},
+                {"id": ingredients[4].id, "amount": 7},
+            ],
+        },
+        format="json",
+    )
+    assert response.status_code == 200
+    assert cart_totals(user) == {
+        "абрикосг": 7,
+        "абрикосшт": 3,
+        "бананшт": 2,
+        "сахарг": 7,
+    }
+
+    second.delete()
+    assert cart_totals(user) == {"абрикосг": 5, "сахарг": 7}
+
+
+@pytest.mark.django_db
+def test_rebuild_cart_totals(user, cart):
+    from recipes.models import CartIngredient
+
+    call_command("rebuild_cart_totals", "--check", stdout=StringIO())
+    expected = cart_totals(user)
+
+    CartIngredient.objects.filter(user=user).first().delete()
+    CartIngredient.objects.filter(user=user).update(amount=100)
+    with pytest.raises(CommandError):
+        call_command("rebuild_cart_totals", "--check", stdout=StringIO())
+
+    call_command("rebuild_cart_totals", stdout=StringIO())
+    assert cart_totals(user) == expected
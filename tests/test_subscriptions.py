@@ -0,0 +1,79 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+SUBSCRIPTIONS_URL = "/api/users/subscriptions/"
+
+
+@pytest.fixture
+def authors(user, make_user, make_recipe):
+    from users.models import Subscriptions
+
+    authors = [make_user() for _ in range(4)]
+    for idx, author in enumerate(authors):
+        for _ in range(idx + 1):
+            make_recipe(author)
+        Subscriptions.objects.create(user=user, author=author)
+    return authors
+
+
+@pytest.mark.django_db
+def test_recipes_limit(user_client, authors):
+    response = user_client.get(
+        SUBSCRIPTIONS_URL, {"limit": 10, "recipes_limit": 2}
+    )
+
+    assert response.status_code == 200
+    for author, data in zip(authors, response.json()["results"]):
+        expected = list(
+            author.recipes.order_by("-pub_date", "-pk").values_list(
+                "id", flat=True
+            )[:2]
+        )
+        assert [recipe["id"] for recipe in data["recipes"]] == expected
+        assert data["recipes_count"] == author.recipes.count()
+
+
+@pytest.mark.django_db
+def test_without_recipes_limit(user_client, authors):
+    response = user_client.get(SUBSCRIPTIONS_URL, {"limit": 10})
+
+    for author, data in zip(authors, response.json()["results"]):
+        assert len(data["recipes"]) == author.recipes.count()
+
+
+@pytest.mark.django_db
+def test_query_count_is_constant(user_client, authors):
+    def count_queries(limit: int) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(
+                SUBSCRIPTIONS_URL, {"limit": limit, "recipes_limit": 3}
+            )
+        assert len(response.json()["results"]) == limit
+        return len(context.captured_queries)
+
+    assert count_queries(1) == count_queries(4)
+
+
+@pytest.mark.django_db
+def test_subscribe_respects_recipes_limit(user_client, make_user, make_recipe):
+    author = make_user()
+    for _ in range(3):
+        make_recipe(author)
+
+    response = user_client.post(
+        f"/api/users/{author.id}/subscribe/?recipes_limit=1"
+    )
+
+    assert response.status_code == 201
+    assert len(response.json()["recipes"]) == 1
+    assert response.json()["recipes_count"] == 3
+
+
+@pytest.mark.django_db
+def test_invalid_recipes_limit(user_client, authors):
+    response = user_client.get(
+        SUBSCRIPTIONS_URL, {"limit": 10, "recipes_limit": "-1"}
+    )
+
+    assert response.status_code == 400
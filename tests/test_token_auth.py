@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+import pytest
+
+PASSWORD = "Pa$$w0rd_42"
+
+
+def token_queries(client, path="/api/users/me/"):
+    """Ответ и число запросов к таблице токенов."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path)
+    return response, sum("authtoken_token" in q["sql"] for q in queries)
+
+
+@pytest.fixture
+def token(user):
+    from rest_framework.authtoken.models import Token
+
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def client(api_client, token):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return api_client
+
+
+@pytest.mark.django_db
+def test_token_is_cached(client, settings, tmp_path):
+    from core import tokens
+
+    response, queries = token_queries(client)
+    assert response.status_code == 200
+    assert queries == 1
+
+    response, queries = token_queries(client)
+    assert response.status_code == 200
+    assert queries == 0
+
+    # Другой процесс: кэш Django в памяти процесса не используется.
+    settings.TOKEN_LOCAL_CACHE_TIMEOUT = 0
+    tokens._local.clear()
+    assert token_queries(client)[1] == 1
+
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": tmp_path / "cache",
+        }
+    }
+    assert token_queries(client)[1] == 1
+    assert token_queries(client)[1] == 0
+
+    client.post("/api/auth/token/logout/")
+    assert client.get("/api/users/me/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_logout_invalidates_token(client):
+    token_queries(client)
+
+    assert client.post("/api/auth/token/logout/").status_code == 204
+    assert client.get("/api/users/me/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_ban_and_password_change_invalidate_token(client, user):
+    token_queries(client)
+    response = client.post(
+        "/api/users/set_password/",
+        {"current_password": PASSWORD, "new_password": "N3w_Pa$$w0rd"},
+    )
+    assert response.status_code == 204
+    assert token_queries(client)[1] == 1
+
+    user.is_active = False
+    user.save()
+    assert client.get("/api/users/me/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_cached_user_counters_are_not_stale(client, user):
+    from core.tokens import get_token
+    from django.contrib.auth import get_user_model
+
+    token_queries(client)
+    get_user_model().objects.filter(pk=user.pk).update(recipes_count=7)
+
+    cached = get_token(client._credentials["HTTP_AUTHORIZATION"].split()[1])
+    cached.user.first_name = "Пётр"
+    cached.user.save()
+
+    user.refresh_from_db()
+    assert user.recipes_count == 7
+    assert user.first_name == "Пётр"
+
+
+@pytest.mark.django_db
+def test_token_expiry_and_cleanup(client, token, user, make_user, settings):
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    settings.TOKEN_TTL = 60
+    Token.objects.filter(pk=token.pk).update(
+        created=token.created - timedelta(seconds=120)
+    )
+    Token.objects.create(user=make_user())
+
+    response = client.get("/api/users/me/")
+    assert response.status_code == 401
+    assert "истёк" in response.json()["detail"]
+
+    client.credentials()
+    response = client.post(
+        "/api/auth/token/login/", {"email": user.email, "password": PASSWORD}
+    )
+    assert response.status_code == 200
+    assert response.json()["auth_token"] != token.key
+
+    call_command("cleanup_tokens")
+    assert Token.objects.count() == 2
+
+    Token.objects.update(created=token.created - timedelta(seconds=120))
+    call_command("cleanup_tokens")
+    assert not Token.objects.exists()